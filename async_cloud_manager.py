@@ -0,0 +1,1535 @@
+#!/usr/bin/env python3
+"""
+Асинхронный менеджер облачных хранилищ через GitHub API
+Те же операции, что и у GitHubCloudManager, на asyncio и aiohttp: все
+запросы идут через общий пул keep-alive соединений, а число одновременных
+запросов ограничено семафором, поэтому тысячи операций в работе не требуют
+по потоку на каждую. Формат резервных копий (дерево, манифест, блоки,
+пакеты, дельты) совместим с GitHubCloudManager
+"""
+
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import tempfile
+import time
+import zlib
+from datetime import datetime
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple, Union
+from urllib.parse import quote
+
+import aiohttp
+from colorama import Fore, Style
+from tqdm import tqdm
+
+import delta_encoding
+import snapshots
+from backup_format import (
+    CHUNK_INDEX_SUFFIX, DELTA_SUFFIX, STORAGE_SUFFIXES, UPLOAD_CHUNK_SIZE,
+    Base64JsonBody, PathFilter, add_plan_item, apply_file_attributes, git_blob_sha, git_file_mode,
+    hash_file, merge_manifest, part_file, reject_unsafe_paths, restore_plan_from_manifest,
+    strip_storage_suffix
+)
+from blob_cache import BlobCache
+from github_cloud_manager import (
+    DEFAULT_WORKERS, DOWNLOAD_CHUNK_SIZE, HTTP_CACHE_MAX_SIZE, HTTP_TIMEOUT,
+    MANIFEST_FORMAT, MANIFEST_NAME, PACK_DIR, PACK_INDEX_NAME, TREE_CHUNK_SIZE,
+    load_environment
+)
+from http_cache import ETagCache
+from metrics import Metrics, instrumented, timed_phase
+from repo_cache import REPO_FIELDS, RepoCache
+from scanner import HashCache, scan_files
+from scheduler import RateLimitState, backoff_delay
+
+# Время жизни простаивающего keep-alive соединения в пуле (секунды)
+KEEPALIVE_TIMEOUT = 30
+
+JSON_ACCEPT = "application/vnd.github+json"
+RAW_ACCEPT = "application/vnd.github.raw"
+
+
+class AsyncGitHubCloudManager:
+    """
+    Асинхронный менеджер облачных хранилищ через GitHub API
+
+    Используется как асинхронный контекстный менеджер (или с явным вызовом
+    close()), чтобы пул соединений закрывался вместе с менеджером.
+    """
+
+    def __init__(self, github_token: Optional[str] = None, max_concurrency: int = DEFAULT_WORKERS,
+                 cache_dir: Optional[str] = None, api_url: Optional[str] = None,
+                 blob_cache_size: Optional[int] = None, blob_cache_link: bool = False):
+        """
+        Инициализация менеджера (без сетевых запросов)
+
+        Args:
+            github_token: GitHub Personal Access Token (если None, берется из переменных окружения)
+            max_concurrency: Максимальное число одновременных запросов и соединений в пуле
+            cache_dir: Директория локальных кешей (по умолчанию CLOUD_BACKUP_CACHE_DIR
+                или CACHE_DIR)
+            api_url: Адрес GitHub REST API (по умолчанию GITHUB_API_URL или API_URL)
+            blob_cache_size: Размер кеша содержимого blob в байтах (по умолчанию
+                CLOUD_BACKUP_BLOB_CACHE_SIZE или BLOB_CACHE_MAX_SIZE; 0 - скачанное
+                содержимое не кешируется)
+            blob_cache_link: Восстанавливать файлы из кеша жесткими ссылками
+        """
+        environment = load_environment()
+        token = github_token or os.getenv('GITHUB_TOKEN')
+        if not token:
+            raise ValueError(
+                "GitHub token not found. Set GITHUB_TOKEN environment variable or pass it as argument"
+            )
+
+        self._token = token
+        self._api_url = (api_url or environment["api_url"]).rstrip('/')
+        self.max_concurrency = max(1, max_concurrency)
+        # Время операций и фаз, запросы по эндпоинтам, повторы и расход лимита
+        self.metrics = Metrics()
+        self._cache_dir = cache_dir or environment["cache_dir"]
+        self._hash_cache = HashCache(os.path.join(self._cache_dir, "hashes.sqlite"))
+        # Кеш содержимого blob общий с GitHubCloudManager и другими процессами
+        blob_cache_size = environment["blob_cache_size"] if blob_cache_size is None else blob_cache_size
+        self._blob_cache = None
+        if blob_cache_size > 0:
+            self._blob_cache = BlobCache(os.path.join(self._cache_dir, "blobs"), blob_cache_size, blob_cache_link)
+        # Кеш ответов для условных запросов общий с GitHubCloudManager
+        self._http_cache = ETagCache(os.path.join(self._cache_dir, "http"), HTTP_CACHE_MAX_SIZE)
+        # Сессия и семафор создаются в цикле событий при первом запросе
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._slots: Optional[asyncio.Condition] = None
+        # Найденные репозитории и вершины веток общие с GitHubCloudManager
+        self._repo_cache = RepoCache(os.path.join(self._cache_dir, "repos.json"))
+        self._repo_key: Optional[str] = None
+        self._head: Optional[Dict] = None
+        self.repo: Optional[Dict] = None
+
+        # Лимит API, общая пауза и параллельность AIMD - как у GitHubCloudManager
+        self._rate = RateLimitState(self.max_concurrency, metrics=self.metrics)
+
+    async def __aenter__(self) -> "AsyncGitHubCloudManager":
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        """Закрытие пула соединений и запись кешей"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._hash_cache.flush()
+        if self._blob_cache:
+            self._blob_cache.flush()
+
+    @instrumented("initialize_backup_repo")
+    async def initialize_backup_repo(self, repo_name: str, refresh: bool = False) -> bool:
+        """
+        Инициализация или получение репозитория для резервных копий
+
+        Репозиторий, найденный однажды, открывается по сохраненным сведениям
+        без запросов к API; имя в виде "owner/name" открывается без запроса
+        пользователя.
+
+        Args:
+            repo_name: Имя репозитория для резервных копий ("name" или "owner/name")
+            refresh: Найти репозиторий заново, не используя сохраненные сведения
+
+        Returns:
+            True если успешно инициализирован, False иначе
+        """
+        key = RepoCache.key(self._api_url, self._token, repo_name)
+        info = None if refresh else self._repo_cache.get(key)
+        if info:
+            self._open_repo(key, info)
+            print(f"{Fore.GREEN}✓ Репозиторий '{repo_name}' найден{Style.RESET_ALL}")
+            return True
+
+        owner, _, name = repo_name.rpartition("/")
+        login = None
+        try:
+            if not owner:
+                login = owner = (await self._request_json("GET", f"{self._api_url}/user"))["login"]
+            repo = await self._request_json("GET", f"{self._api_url}/repos/{owner}/{name}")
+            print(f"{Fore.GREEN}✓ Репозиторий '{repo_name}' найден{Style.RESET_ALL}")
+        except aiohttp.ClientResponseError as e:
+            if e.status != 404:
+                print(f"{Fore.RED}✗ Ошибка при получении репозитория: {e.message}{Style.RESET_ALL}")
+                return False
+            repo = None
+
+        if repo is None:
+            print(f"{Fore.YELLOW}! Репозиторий '{repo_name}' не найден, создаю...{Style.RESET_ALL}")
+            try:
+                if login is None:
+                    login = (await self._request_json("GET", f"{self._api_url}/user"))["login"]
+                url = f"{self._api_url}/user/repos" if owner == login else f"{self._api_url}/orgs/{owner}/repos"
+                repo = await self._request_json("POST", url, {
+                    "name": name,
+                    "description": "Cloud Backup System - GitHub Cloud Integration",
+                    "private": True,
+                    "auto_init": True
+                })
+                print(f"{Fore.GREEN}✓ Репозиторий '{repo_name}' успешно создан{Style.RESET_ALL}")
+            except aiohttp.ClientResponseError as e:
+                print(f"{Fore.RED}✗ Ошибка при создании репозитория: {e.message}{Style.RESET_ALL}")
+                return False
+
+        info = {field: repo.get(field) for field in REPO_FIELDS}
+        self._repo_cache.put(key, info)
+        self._open_repo(key, info)
+        return True
+
+    @instrumented("upload_file")
+    async def upload_file(self, local_path: str, cloud_path: str, message: str = None) -> Tuple[bool, str]:
+        """
+        Загрузка файла в облако (GitHub)
+
+        Args:
+            local_path: Путь к локальному файлу
+            cloud_path: Путь в репозитории GitHub
+            message: Сообщение коммита
+
+        Returns:
+            Кортеж (успех, сообщение)
+        """
+        if not self.repo:
+            return False, "Репозиторий не инициализирован"
+
+        if not os.path.exists(local_path):
+            return False, f"Локальный файл не найден: {local_path}"
+
+        try:
+            if os.path.getsize(local_path) > 100 * 1024 * 1024:  # 100MB
+                return False, "Файл слишком большой (>100MB)"
+
+            fields = {"message": message or f"Upload: {os.path.basename(local_path)}"}
+
+            # Проверяем существует ли файл: для обновления нужен его SHA
+            try:
+                fields["sha"] = (await self._request_json("GET", self._contents_url(cloud_path)))["sha"]
+            except aiohttp.ClientResponseError as e:
+                if e.status != 404:
+                    raise
+
+            result, _ = await self._upload_stream("PUT", self._contents_url(cloud_path), local_path, fields)
+            # Коммит API contents становится новой вершиной ветки
+            commit = result.get("commit") or {}
+            self._set_head(commit.get("sha"), (commit.get("tree") or {}).get("sha"))
+
+            if "sha" in fields:
+                return True, f"Файл обновлен: {cloud_path}"
+            return True, f"Файл загружен: {cloud_path}"
+
+        except Exception as e:
+            return False, f"Ошибка при загрузке: {str(e)}"
+
+    @instrumented("download_file")
+    async def download_file(self, cloud_path: str, local_path: str) -> Tuple[bool, str]:
+        """
+        Скачивание файла из облака (GitHub)
+
+        Args:
+            cloud_path: Путь файла в репозитории GitHub
+            local_path: Путь для сохранения локального файла
+
+        Returns:
+            Кортеж (успех, сообщение)
+        """
+        if not self.repo:
+            return False, "Репозиторий не инициализирован"
+
+        try:
+            if self._blob_cache:
+                # SHA файла берется из метаданных, содержимое - из кеша
+                blob_sha = (await self._request_json("GET", self._contents_url(cloud_path)))["sha"]
+                success, message = await self._download_blob(blob_sha, local_path)
+                self._blob_cache.flush()
+                return success, (f"Файл скачан: {local_path}" if success else message)
+
+            await self._stream_to_file(self._contents_url(cloud_path), local_path)
+            return True, f"Файл скачан: {local_path}"
+        except aiohttp.ClientResponseError as e:
+            if e.status == 404:
+                return False, f"Файл не найден в облаке: {cloud_path}"
+            return False, f"Ошибка при скачивании: {str(e)}"
+        except Exception as e:
+            return False, f"Ошибка при скачивании: {str(e)}"
+
+    @instrumented("backup_directory")
+    async def backup_directory(self, local_dir: str, cloud_dir: str = "backups",
+                               incremental: bool = False) -> Dict[str, any]:
+        """
+        Резервное копирование директории одним коммитом (Git Data API)
+
+        Blob-объекты создаются конкурентно, одинаковое содержимое загружается
+        один раз. Вместе с данными в коммит попадает манифест.
+
+        Args:
+            local_dir: Локальная директория для резервного копирования
+            cloud_dir: Директория в облаке
+            incremental: Загружать только файлы, отличающиеся от копии в облаке
+
+        Returns:
+            Словарь с информацией о резервной копии
+        """
+        if not self.repo:
+            return {"success": False, "message": "Репозиторий не инициализирован"}
+
+        if not os.path.isdir(local_dir):
+            return {"success": False, "message": f"Директория не найдена: {local_dir}"}
+
+        backup_info = {
+            "success": False,
+            "timestamp": datetime.now().isoformat(),
+            "source_dir": local_dir,
+            "cloud_dir": cloud_dir,
+            "files_uploaded": 0,
+            "files_skipped": 0,
+            "files_failed": 0,
+            "total_size": 0,
+            "details": []
+        }
+
+        print(f"\n{Fore.CYAN}Начинаю резервное копирование: {local_dir}{Style.RESET_ALL}")
+
+        loop = asyncio.get_running_loop()
+        with self.metrics.phase("scan"):
+            files_to_backup = await loop.run_in_executor(None, scan_files, local_dir)
+        if not files_to_backup:
+            backup_info["message"] = "Нет файлов для резервной копии"
+            return backup_info
+
+        try:
+            remote_files = await self._get_remote_tree(cloud_dir) if incremental else {}
+            manifest_item = remote_files.get(MANIFEST_NAME)
+            if incremental:
+                manifest = await self._load_manifest(cloud_dir, manifest_item["sha"]) if manifest_item else None
+            else:
+                manifest = await self._load_manifest(cloud_dir)
+            old_entries = manifest[1] if manifest else {}
+            # Файл, хранившийся блоками или дельтой, сохраняется целиком:
+            # прежнее представление удаляется по дереву копии
+            if not incremental and (manifest is None or any(
+                    "index" in entry or "delta" in entry for entry in old_entries.values())):
+                remote_files = await self._get_remote_tree(cloud_dir)
+        except aiohttp.ClientError as e:
+            backup_info["message"] = f"Ошибка при получении дерева резервной копии: {str(e)}"
+            return backup_info
+
+        # Одинаковое содержимое загружается один раз: остальные файлы ждут ту же задачу
+        uploads: Dict[str, asyncio.Future] = {}
+
+        async def backup_file(file_path: str) -> Tuple[int, Dict[str, any], Dict[str, Dict], Optional[Dict]]:
+            relative_path = os.path.relpath(file_path, os.path.dirname(local_dir))
+            tree_path = relative_path.replace(chr(92), '/')
+            stat = files_to_backup[file_path]
+            try:
+                if stat.st_size > 100 * 1024 * 1024:  # 100MB
+                    raise ValueError("Файл слишком большой (>100MB)")
+                mode = git_file_mode(file_path, stat)
+                blob_sha = await self._hash_file_cached(file_path, stat)
+                entry = {"path": tree_path, "size": stat.st_size, "mtime": stat.st_mtime,
+                         "mode": mode, "sha": blob_sha}
+
+                remote_item = remote_files.get(tree_path)
+                if remote_item and remote_item["sha"] == blob_sha and remote_item["mode"] == mode:
+                    return stat.st_size, {
+                        "file": relative_path,
+                        "size": stat.st_size,
+                        "status": "unchanged"
+                    }, {}, entry
+
+                if blob_sha not in uploads:
+                    uploads[blob_sha] = asyncio.ensure_future(self._create_blob(file_path))
+                await asyncio.shield(uploads[blob_sha])
+
+                elements = {f"{cloud_dir}/{tree_path}": {
+                    "path": f"{cloud_dir}/{tree_path}", "mode": mode, "type": "blob", "sha": blob_sha
+                }}
+                # Прежнее представление файла блоками или дельтой больше не нужно
+                for suffix in STORAGE_SUFFIXES:
+                    if f"{tree_path}{suffix}" in remote_files:
+                        index_path = f"{cloud_dir}/{tree_path}{suffix}"
+                        elements[index_path] = {"path": index_path, "mode": "100644", "type": "blob", "sha": None}
+                return stat.st_size, {
+                    "file": relative_path,
+                    "size": stat.st_size,
+                    "status": "success"
+                }, elements, entry
+            except Exception as e:
+                return stat.st_size, {
+                    "file": relative_path,
+                    "error": f"Ошибка при загрузке: {str(e)}",
+                    "status": "failed"
+                }, {}, None
+
+        results = await self._gather(backup_file, list(files_to_backup), "Загрузка файлов")
+
+        tree_elements = {}
+        manifest_entries = {}
+        for file_size, detail, elements, entry in results:
+            backup_info["total_size"] += file_size
+            backup_info["details"].append(detail)
+            if entry:
+                manifest_entries[entry["path"]] = entry
+            if detail["status"] == "success":
+                backup_info["files_uploaded"] += 1
+                tree_elements.update(elements)
+            elif detail["status"] == "unchanged":
+                backup_info["files_skipped"] += 1
+            else:
+                backup_info["files_failed"] += 1
+
+        # Манифест попадает в тот же коммит, что и данные
+        manifest_entries = merge_manifest(old_entries, manifest_entries, False)
+        try:
+            manifest_sha = None
+            if tree_elements or manifest_entries != old_entries:
+                manifest_sha = await self._save_backup_metadata(backup_info, cloud_dir, manifest_entries, tree_elements)
+            if tree_elements:
+                backup_info["commit"] = await self._commit_tree(
+                    list(tree_elements.values()),
+                    f"Backup: {os.path.basename(os.path.normpath(local_dir))} -> {cloud_dir}"
+                )
+                await self._record_snapshot(backup_info, cloud_dir, manifest_sha)
+        except aiohttp.ClientError as e:
+            # Без коммита ни один файл не попал в резервную копию
+            error = f"Ошибка при создании коммита: {str(e)}"
+            for detail in backup_info["details"]:
+                if detail["status"] == "success":
+                    detail.pop("size", None)
+                    detail["status"] = "failed"
+                    detail["error"] = error
+            backup_info["files_failed"] += backup_info["files_uploaded"]
+            backup_info["files_uploaded"] = 0
+        finally:
+            self._hash_cache.flush()
+
+        backup_info["success"] = backup_info["files_failed"] == 0
+        backup_info["message"] = f"Загружено {backup_info['files_uploaded']} файлов, ошибок: {backup_info['files_failed']}"
+        if incremental:
+            backup_info["message"] += f", без изменений: {backup_info['files_skipped']}"
+        return backup_info
+
+    @instrumented("restore_backup")
+    async def restore_backup(self, cloud_dir: str, local_restore_path: str,
+                             include: Optional[List[str]] = None, exclude: Optional[List[str]] = None,
+                             subtree: Optional[str] = None, snapshot: Optional[str] = None) -> Dict[str, any]:
+        """
+        Восстановление из резервной копии
+
+        Состав копии берется из манифеста (для копий без манифеста - из
+        дерева git), файлы скачиваются конкурентно. С include, exclude или
+        subtree восстанавливается часть копии, со snapshot - копия на момент
+        снимка, как в GitHubCloudManager.
+
+        Args:
+            cloud_dir: Директория в облаке содержащая резервную копию
+            local_restore_path: Локальный путь для восстановления
+            include: Маски восстанавливаемых файлов, например ["etc/*.conf"]
+            exclude: Маски файлов, которые не восстанавливаются
+            subtree: Поддерево копии, которое восстанавливается в local_restore_path
+            snapshot: Id снимка или SHA его коммита
+
+        Returns:
+            Словарь с результатами восстановления
+        """
+        if not self.repo:
+            return {"success": False, "message": "Репозиторий не инициализирован"}
+
+        restore_info = {
+            "success": False,
+            "timestamp": datetime.now().isoformat(),
+            "cloud_dir": cloud_dir,
+            "restore_path": local_restore_path,
+            "files_restored": 0,
+            "files_failed": 0,
+            "details": []
+        }
+        if self._blob_cache:
+            restore_info["files_from_cache"] = 0
+            files_copied = self._blob_cache.files_copied
+
+        print(f"\n{Fore.CYAN}Начинаю восстановление из: {cloud_dir}{Style.RESET_ALL}")
+
+        try:
+            # Снимок задает коммит, от которого читаются дерево и манифест
+            rev = None
+            manifest_sha = None
+            if snapshot:
+                entry = snapshots.find((await self._read_snapshots())[0], snapshot)
+                if entry is None:
+                    restore_info["message"] = f"Снимок не найден: {snapshot}"
+                    return restore_info
+                rev = entry["commit"]
+                if entry["cloud_dir"] == cloud_dir.strip('/'):
+                    manifest_sha = entry.get("manifest")
+                restore_info["snapshot"] = entry["id"]
+
+            if include or exclude or subtree:
+                # Права файлов берутся из дерева, время изменения есть только в манифесте
+                files_to_restore, packed_files = await self._restore_plan_selective(
+                    cloud_dir, PathFilter(include, exclude), subtree or "", rev
+                )
+                manifest_entries = {path: {"mode": item["mode"]} for path, item in files_to_restore.items()}
+                for members in packed_files.values():
+                    manifest_entries.update({path: {"mode": entry["mode"]} for path, entry in members.items()})
+            else:
+                manifest = await self._load_manifest(cloud_dir, manifest_sha, rev)
+                manifest_entries = manifest[1] if manifest else {}
+                if manifest:
+                    files_to_restore, packed_files = restore_plan_from_manifest(manifest_entries)
+                else:
+                    files_to_restore, packed_files = await self._restore_plan_from_tree(cloud_dir, rev)
+            reject_unsafe_paths(files_to_restore, packed_files, manifest_entries, restore_info)
+
+            if not files_to_restore and not packed_files:
+                restore_info["message"] = "Нет файлов для восстановления"
+                return restore_info
+
+            os.makedirs(local_restore_path, exist_ok=True)
+
+            async def restore_file(relative_path: str) -> Dict[str, Tuple[bool, str]]:
+                local_file_path = os.path.join(local_restore_path, *relative_path.split('/'))
+                item = files_to_restore[relative_path]
+                attributes = manifest_entries.get(relative_path)
+                if "conflict" in item:
+                    message = f"Файл хранится в копии в нескольких форматах: {', '.join(item['conflict'])}"
+                    return {relative_path: (False, message)}
+                if item["path"].endswith(CHUNK_INDEX_SUFFIX):
+                    return {relative_path: await self._download_chunked(item["sha"], local_file_path, attributes)}
+                if item["path"].endswith(DELTA_SUFFIX):
+                    return {relative_path: await self._download_delta(item["sha"], local_file_path, attributes)}
+                return {relative_path: await self._download_blob(item["sha"], local_file_path, attributes)}
+
+            async def restore_pack(pack_sha: str) -> Dict[str, Tuple[bool, str]]:
+                return await self._extract_pack(pack_sha, packed_files[pack_sha], local_restore_path)
+
+            results = {}
+            for part in await self._gather(restore_file, list(files_to_restore), "Скачивание файлов"):
+                results.update(part)
+            for part in await self._gather(restore_pack, list(packed_files), "Распаковка пакетов"):
+                results.update(part)
+
+            for relative_path in sorted(results):
+                success, message = results[relative_path]
+
+                # Права и время изменения восстанавливаются по манифесту
+                if success and relative_path in manifest_entries:
+                    apply_file_attributes(
+                        os.path.join(local_restore_path, *relative_path.split('/')),
+                        manifest_entries[relative_path]
+                    )
+
+                if success:
+                    restore_info["files_restored"] += 1
+                    restore_info["details"].append({
+                        "file": relative_path,
+                        "status": "success"
+                    })
+                else:
+                    restore_info["files_failed"] += 1
+                    restore_info["details"].append({
+                        "file": relative_path,
+                        "error": message,
+                        "status": "failed"
+                    })
+
+            restore_info["success"] = restore_info["files_failed"] == 0
+            restore_info["message"] = f"Восстановлено {restore_info['files_restored']} файлов, ошибок: {restore_info['files_failed']}"
+            if self._blob_cache:
+                restore_info["files_from_cache"] = self._blob_cache.files_copied - files_copied
+                restore_info["message"] += f", из локального кеша: {restore_info['files_from_cache']}"
+
+        except aiohttp.ClientResponseError as e:
+            restore_info["message"] = f"Директория не найдена в облаке: {cloud_dir}"
+        except Exception as e:
+            restore_info["message"] = f"Ошибка при восстановлении: {str(e)}"
+        finally:
+            if self._blob_cache:
+                self._blob_cache.flush()
+
+        return restore_info
+
+    @instrumented("list_snapshots")
+    async def list_snapshots(self, cloud_dir: Optional[str] = None,
+                             before: Optional[Union[str, datetime]] = None) -> List[Dict]:
+        """
+        Список снимков резервных копий (формат как у GitHubCloudManager)
+
+        Args:
+            cloud_dir: Только снимки этой директории копии
+            before: Только снимки, сделанные не позже этого момента
+                (datetime или строка ISO 8601)
+
+        Returns:
+            Список снимков от новых к старым
+        """
+        if not self.repo:
+            return []
+
+        try:
+            return snapshots.select((await self._read_snapshots())[0], cloud_dir, before)
+        except aiohttp.ClientError as e:
+            print(f"{Fore.RED}✗ Ошибка при чтении каталога снимков: {str(e)}{Style.RESET_ALL}")
+            return []
+
+    @instrumented("list_files")
+    async def list_files(self, cloud_path: str = "", recursive: bool = False) -> List[Dict]:
+        """
+        Получение списка файлов в облаке
+
+        Args:
+            cloud_path: Путь в облаке
+            recursive: Вернуть все файлы поддерева (один запрос к дереву git)
+
+        Returns:
+            Список файлов
+        """
+        if not self.repo:
+            return []
+
+        try:
+            if recursive:
+                prefix = f"{cloud_path.strip('/')}/" if cloud_path.strip('/') else ""
+                return [
+                    {
+                        "name": relative_path.rsplit('/', 1)[-1],
+                        "path": f"{prefix}{relative_path}",
+                        "type": "file",
+                        "size": item.get("size") or 0
+                    }
+                    for relative_path, item in sorted((await self._get_remote_tree(cloud_path)).items())
+                ]
+
+            contents = await self._request_json("GET", self._contents_url(cloud_path))
+            if not isinstance(contents, list):
+                contents = [contents]
+            return [
+                {"name": item["name"], "path": item["path"], "type": item["type"], "size": item.get("size", 0)}
+                for item in contents
+            ]
+        except aiohttp.ClientError as e:
+            print(f"{Fore.RED}✗ Ошибка при получении списка файлов: {str(e)}{Style.RESET_ALL}")
+            return []
+
+    def get_rate_budget(self) -> Dict[str, any]:
+        """
+        Остаток лимита API по последнему ответу и состояние планировщика
+
+        Returns:
+            Словарь с остатком лимита, временем сброса, текущей
+            параллельностью и числом запросов, повторов и ожиданий лимита
+        """
+        return self._rate.budget()
+
+    async def _gather(self, func: Callable[[str], Awaitable], items: List[str], desc: str) -> List:
+        """
+        Конкурентное выполнение корутины для элементов с прогресс-баром
+
+        Число одновременных запросов ограничивает семафор, поэтому задачи
+        создаются сразу для всех элементов.
+
+        Args:
+            func: Корутинная функция одного аргумента
+            items: Элементы для обработки
+            desc: Подпись прогресс-бара
+
+        Returns:
+            Результаты в порядке элементов
+        """
+        with tqdm(total=len(items), desc=desc, disable=not items) as progress:
+            async def run(item):
+                try:
+                    return await func(item)
+                finally:
+                    progress.update(1)
+
+            return await asyncio.gather(*(run(item) for item in items))
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        """Общая сессия с пулом keep-alive соединений (создается при первом запросе)"""
+        if self._session is None or self._session.closed:
+            self._slots = asyncio.Condition()
+            connector = aiohttp.TCPConnector(limit=self.max_concurrency, keepalive_timeout=KEEPALIVE_TIMEOUT)
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                headers={"Authorization": f"token {self._token}", "Accept": JSON_ACCEPT},
+                timeout=aiohttp.ClientTimeout(sock_connect=HTTP_TIMEOUT, sock_read=HTTP_TIMEOUT),
+                trace_configs=[self._trace_config()]
+            )
+        return self._session
+
+    def _trace_config(self) -> aiohttp.TraceConfig:
+        """Учет каждого запроса сессии в метриках"""
+        async def on_request_start(session, context, params):
+            context.started = time.perf_counter()
+
+        async def on_request_end(session, context, params):
+            response = params.response
+            self.metrics.record_request(
+                params.method, str(params.url), response.status, time.perf_counter() - context.started,
+                int(response.headers.get("Content-Length") or 0),
+                int(params.headers.get("Content-Length") or 0)
+            )
+
+        async def on_request_exception(session, context, params):
+            self.metrics.record_request(params.method, str(params.url), None,
+                                        time.perf_counter() - context.started)
+
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_request_start.append(on_request_start)
+        trace_config.on_request_end.append(on_request_end)
+        trace_config.on_request_exception.append(on_request_exception)
+        return trace_config
+
+    async def _call(self, func: Callable[..., Awaitable], *args) -> any:
+        """
+        Выполнение запроса с ограничением параллельности и повторами
+
+        Функция должна выполнять ровно один запрос и быть безопасной для
+        повторного вызова.
+
+        Args:
+            func: Корутинная функция, выполняющая запрос
+            *args: Аргументы функции
+
+        Returns:
+            Результат функции
+        """
+        session = self._get_session()
+        attempt = 0
+        while True:
+            await self._acquire()
+            success = False
+            try:
+                result = await func(session, *args)
+                success = True
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                error = e
+            finally:
+                await self._release(success)
+            if success:
+                return result
+
+            delay = self._retry_delay(error, attempt)
+            if delay is None:
+                raise error
+            attempt += 1
+            self._rate.record_retry(delay)
+            await asyncio.sleep(delay)
+
+    async def _acquire(self):
+        """Ожидание общей паузы, интервала и свободного слота (см. RateLimitState)"""
+        rate_wait = slot_wait = 0.0
+        async with self._slots:
+            while True:
+                now = time.monotonic()
+                wait = self._rate.wait_time()
+                if wait > 0:
+                    try:
+                        await asyncio.wait_for(self._slots.wait(), wait)
+                    except asyncio.TimeoutError:
+                        pass
+                    rate_wait += time.monotonic() - now
+                elif not self._rate.has_slot():
+                    await self._slots.wait()
+                    slot_wait += time.monotonic() - now
+                else:
+                    break
+            self._rate.start_request()
+
+        if rate_wait:
+            self.metrics.add_phase("rate_limit_wait", rate_wait)
+        if slot_wait:
+            self.metrics.add_phase("queue_wait", slot_wait)
+
+    async def _release(self, success: bool):
+        """Освобождение слота с пробуждением ожидающих запросов"""
+        async with self._slots:
+            self._rate.finish_request(success)
+            self._slots.notify_all()
+
+    def _retry_delay(self, error: Exception, attempt: int) -> Optional[float]:
+        """
+        Задержка перед повтором запроса
+
+        Args:
+            error: Ошибка запроса
+            attempt: Номер повтора (с нуля)
+
+        Returns:
+            Задержка в секундах или None, если ошибка не временная
+        """
+        if not isinstance(error, aiohttp.ClientResponseError):
+            # Обрыв соединения или таймаут
+            return backoff_delay(attempt) if attempt < self._rate.max_retries else None
+        return self._rate.retry_delay(error.status, error.headers or {}, error.message or "", attempt)
+
+    async def _check(self, response: aiohttp.ClientResponse):
+        """Учет лимита и ошибка для неуспешного ответа (с текстом ответа)"""
+        self._rate.observe(response.headers)
+        if response.status >= 400:
+            raise aiohttp.ClientResponseError(
+                response.request_info, response.history, status=response.status,
+                message=await response.text(), headers=response.headers
+            )
+
+    async def _request_json(self, method: str, url: str, payload: Optional[Dict] = None) -> any:
+        """
+        JSON-запрос к API
+
+        Args:
+            method: HTTP-метод
+            url: Адрес API
+            payload: Тело запроса
+
+        Returns:
+            Разобранный JSON ответа
+        """
+        async def request(session: aiohttp.ClientSession):
+            async with session.request(method, url, json=payload) as response:
+                await self._check(response)
+                return await response.json(content_type=None)
+
+        return await self._call(request)
+
+    async def _read_raw(self, url: str) -> bytes:
+        """Сырое содержимое по адресу API (для небольших объектов)"""
+        async def request(session: aiohttp.ClientSession) -> bytes:
+            async with session.get(url, headers={"Accept": RAW_ACCEPT}) as response:
+                await self._check(response)
+                return await response.read()
+
+        return await self._call(request)
+
+    async def _read_blob(self, blob_sha: str) -> bytes:
+        """Содержимое небольшого blob (индексы, манифест) с использованием кеша blob"""
+        if self._blob_cache:
+            cached = self._blob_cache.open(blob_sha)
+            if cached:
+                with cached:
+                    return cached.read()
+        data = await self._read_raw(f"{self.repo['url']}/git/blobs/{blob_sha}")
+        if self._blob_cache:
+            self._blob_cache.add_bytes(blob_sha, data)
+        return data
+
+    @timed_phase("download")
+    async def _stream_into(self, session: aiohttp.ClientSession, url: str, f, sha=None) -> int:
+        """
+        Потоковое скачивание сырого содержимого в открытый файл
+
+        Args:
+            session: Сессия aiohttp
+            url: Адрес API, отдающий содержимое
+            f: Файл, открытый на запись в двоичном режиме
+            sha: Объект хеша, который обновляется скачанными данными
+
+        Returns:
+            Число записанных байт
+        """
+        written = 0
+        async with session.get(url, headers={"Accept": RAW_ACCEPT}) as response:
+            await self._check(response)
+            async for chunk in response.content.iter_chunked(DOWNLOAD_CHUNK_SIZE):
+                f.write(chunk)
+                if sha is not None:
+                    sha.update(chunk)
+                written += len(chunk)
+        return written
+
+    async def _stream_to_file(self, url: str, local_path: str) -> int:
+        """Потоковое скачивание в файл; повтор начинается с чистого временного файла"""
+        async def download(session: aiohttp.ClientSession) -> int:
+            with part_file(local_path) as f:
+                return await self._stream_into(session, url, f)
+
+        return await self._call(download)
+
+    async def _download_blob(self, blob_sha: str, local_path: str,
+                                 attributes: Optional[Dict] = None) -> Tuple[bool, str]:
+        """
+        Скачивание blob по SHA в локальный файл
+
+        Args:
+            blob_sha: SHA blob-объекта
+            local_path: Путь для сохранения локального файла
+            attributes: Права и время изменения файла (запись манифеста); в режиме
+                жестких ссылок файл берется из кеша, только если они совпадают
+
+        Returns:
+            Кортеж (успех, сообщение)
+        """
+        try:
+            if self._blob_cache and self._blob_cache.copy_to(blob_sha, local_path, attributes):
+                return True, f"Файл восстановлен из кеша: {local_path}"
+            await self._stream_to_file(f"{self.repo['url']}/git/blobs/{blob_sha}", local_path)
+            if self._blob_cache:
+                # Объект кеша получает права и время файла, иначе на него
+                # нельзя будет ссылаться при следующих восстановлениях
+                if attributes:
+                    apply_file_attributes(local_path, attributes)
+                self._blob_cache.add_file(blob_sha, local_path)
+            return True, f"Файл скачан: {local_path}"
+        except aiohttp.ClientResponseError as e:
+            if e.status == 404:
+                return False, f"Blob не найден в облаке: {blob_sha}"
+            return False, f"Ошибка при скачивании: {str(e)}"
+        except Exception as e:
+            return False, f"Ошибка при скачивании: {str(e)}"
+
+    async def _download_chunked(self, index_sha: str, local_path: str,
+                                    attributes: Optional[Dict] = None) -> Tuple[bool, str]:
+        """
+        Сборка файла из блоков по индексу с потоковой записью на диск
+
+        Args:
+            index_sha: SHA blob с индексом блоков
+            local_path: Путь для сохранения локального файла
+            attributes: Права и время изменения файла (запись манифеста); в режиме
+                жестких ссылок файл берется из кеша, только если они совпадают
+
+        Returns:
+            Кортеж (успех, сообщение)
+        """
+        async def append_chunk(session: aiohttp.ClientSession, url: str, f, sha):
+            # При повторе файл обрезается до начала блока
+            start = f.tell()
+            chunk_sha = sha.copy()
+            try:
+                await self._stream_into(session, url, f, chunk_sha)
+            except BaseException:
+                f.seek(start)
+                f.truncate()
+                raise
+            return chunk_sha
+
+        try:
+            index = json.loads(await self._read_blob(index_sha))
+            # Собранный файл кешируется целиком под своим SHA
+            if self._blob_cache and self._blob_cache.copy_to(index["sha"], local_path, attributes):
+                return True, f"Файл восстановлен из кеша: {local_path}"
+
+            file_sha = hashlib.sha1(f"blob {index['size']}\0".encode('ascii'))
+            with part_file(local_path) as f:
+                for chunk_sha, chunk_size in index["chunks"]:
+                    file_sha = await self._call(
+                        append_chunk, f"{self.repo['url']}/git/blobs/{chunk_sha}", f, file_sha
+                    )
+                if file_sha.hexdigest() != index["sha"]:
+                    raise IOError("Контрольная сумма собранного файла не совпадает")
+            if self._blob_cache:
+                # Объект кеша получает права и время файла, иначе на него
+                # нельзя будет ссылаться при следующих восстановлениях
+                if attributes:
+                    apply_file_attributes(local_path, attributes)
+                self._blob_cache.add_file(index["sha"], local_path)
+
+            return True, f"Файл скачан: {local_path}"
+        except aiohttp.ClientResponseError as e:
+            if e.status == 404:
+                return False, f"Блок не найден в облаке: {e.request_info.url}"
+            return False, f"Ошибка при скачивании: {str(e)}"
+        except Exception as e:
+            return False, f"Ошибка при скачивании: {str(e)}"
+
+    async def _download_delta(self, object_sha: str, local_path: str,
+                                  attributes: Optional[Dict] = None) -> Tuple[bool, str]:
+        """
+        Сборка файла по цепочке объектов дельты
+
+        Объекты цепочки скачиваются от новой версии к старой, сборка версий
+        выполняется в пуле потоков, чтобы не блокировать цикл событий.
+
+        Args:
+            object_sha: SHA blob объекта дельты
+            local_path: Путь для сохранения локального файла
+            attributes: Права и время изменения файла (запись манифеста); в режиме
+                жестких ссылок файл берется из кеша, только если они совпадают
+
+        Returns:
+            Кортеж (успех, сообщение)
+        """
+        try:
+            os.makedirs(os.path.dirname(local_path) or ".", exist_ok=True)
+            with tempfile.TemporaryDirectory(prefix=".delta-", dir=os.path.dirname(local_path) or ".") as tmp_dir:
+                objects = []
+                base = None
+                while True:
+                    object_path = os.path.join(tmp_dir, object_sha)
+                    await self._stream_to_file(f"{self.repo['url']}/git/blobs/{object_sha}", object_path)
+                    with open(object_path, 'rb') as f:
+                        header = delta_encoding.read_header(f)
+                    if not objects:
+                        # Собранный файл кешируется целиком под своим SHA
+                        file_sha = header["sha"]
+                        if self._blob_cache and self._blob_cache.copy_to(file_sha, local_path, attributes):
+                            return True, f"Файл восстановлен из кеша: {local_path}"
+                    objects.append(object_path)
+                    if not header["base"]:
+                        break
+                    # Собранная прежняя версия может быть в локальном кеше
+                    base = self._blob_cache.open(header["base"]["sha"]) if self._blob_cache else None
+                    if base:
+                        break
+                    object_sha = header["base"]["object"]
+
+                def rebuild():
+                    with part_file(local_path) as f:
+                        delta_encoding.rebuild(objects[::-1], f, base)
+
+                with self.metrics.phase("delta_apply"):
+                    await asyncio.get_running_loop().run_in_executor(None, rebuild)
+            if self._blob_cache:
+                # Объект кеша получает права и время файла, иначе на него
+                # нельзя будет ссылаться при следующих восстановлениях
+                if attributes:
+                    apply_file_attributes(local_path, attributes)
+                self._blob_cache.add_file(file_sha, local_path)
+
+            return True, f"Файл скачан: {local_path}"
+        except aiohttp.ClientResponseError as e:
+            if e.status == 404:
+                return False, f"Объект дельты не найден в облаке: {e.request_info.url}"
+            return False, f"Ошибка при скачивании: {str(e)}"
+        except Exception as e:
+            return False, f"Ошибка при сборке файла: {str(e)}"
+
+    async def _extract_pack(self, pack_sha: str, members: Dict[str, Dict],
+                            local_root: str) -> Dict[str, Tuple[bool, str]]:
+        """
+        Распаковка файлов из пакета (пакет не больше PACK_TARGET_SIZE до сжатия)
+
+        Args:
+            pack_sha: SHA blob пакета
+            members: Записи индекса извлекаемых файлов {путь: запись}
+            local_root: Локальная директория восстановления
+
+        Returns:
+            Словарь {путь: (успех, сообщение)}
+        """
+        results = {}
+        if self._blob_cache:
+            # Если все файлы пакета уже в кеше, пакет не скачивается
+            for path, entry in members.items():
+                local_path = os.path.join(local_root, *path.split('/'))
+                if self._blob_cache.copy_to(entry["sha"], local_path, entry):
+                    results[path] = (True, f"Файл восстановлен из кеша: {local_path}")
+            if len(results) == len(members):
+                return results
+
+        try:
+            with self.metrics.phase("download"):
+                data = zlib.decompress(await self._read_raw(f"{self.repo['url']}/git/blobs/{pack_sha}"))
+        except Exception as e:
+            results.update({path: (False, f"Ошибка при скачивании пакета: {str(e)}")
+                            for path in members if path not in results})
+            return results
+
+        for path, entry in members.items():
+            if path in results:
+                continue
+            content = data[entry["offset"]:entry["offset"] + entry["size"]]
+            local_path = os.path.join(local_root, *path.split('/'))
+            if git_blob_sha(content) != entry["sha"]:
+                results[path] = (False, f"Контрольная сумма не совпадает: {path}")
+                continue
+            with part_file(local_path) as f:
+                f.write(content)
+            if self._blob_cache:
+                self._blob_cache.add_bytes(entry["sha"], content)
+            results[path] = (True, f"Файл скачан: {local_path}")
+        return results
+
+    @timed_phase("upload")
+    async def _upload_stream(self, method: str, url: str, source: Union[str, bytes],
+                             fields: Dict[str, str]) -> Tuple[Dict, str]:
+        """
+        JSON-запрос с содержимым файла в поле content, кодируемым по мере отправки
+
+        Файл читается блоками в пуле потоков, поэтому цикл событий не
+        блокируется чтением с диска.
+
+        Args:
+            method: HTTP-метод
+            url: Адрес API
+            source: Путь к файлу или содержимое в памяти
+            fields: Остальные поля JSON-объекта
+
+        Returns:
+            Кортеж (ответ API, SHA blob отправленного содержимого)
+        """
+        async def request(session: aiohttp.ClientSession) -> Tuple[Dict, str]:
+            # Тело открывается заново при каждом повторе
+            loop = asyncio.get_running_loop()
+            body = await loop.run_in_executor(None, Base64JsonBody, source, fields)
+
+            async def chunks() -> AsyncIterator[bytes]:
+                while True:
+                    data = await loop.run_in_executor(None, body.read, UPLOAD_CHUNK_SIZE * 4 // 3)
+                    if not data:
+                        break
+                    yield data
+
+            try:
+                async with session.request(method, url, data=chunks(), headers={
+                    "Content-Type": "application/json", "Content-Length": str(len(body))
+                }) as response:
+                    await self._check(response)
+                    return await response.json(content_type=None), body.blob_sha
+            finally:
+                body.close()
+
+        return await self._call(request)
+
+    async def _create_blob(self, source: Union[str, bytes]) -> str:
+        """
+        Создание blob-объекта с потоковой отправкой
+
+        Args:
+            source: Путь к локальному файлу или содержимое в памяти
+
+        Returns:
+            SHA созданного blob
+        """
+        blob, blob_sha = await self._upload_stream("POST", f"{self.repo['url']}/git/blobs",
+                                                   source, {"encoding": "base64"})
+        if blob["sha"] != blob_sha:
+            raise IOError(f"SHA загруженного blob не совпадает: {blob['sha']} != {blob_sha}")
+        return blob_sha
+
+    async def _hash_file_cached(self, file_path: str, stat: os.stat_result) -> str:
+        """SHA-1 blob-объекта git для файла; файл читается, только если его нет в кеше хешей"""
+        blob_sha = self._hash_cache.get(stat)
+        if blob_sha is None:
+            hashed_at = time.time()
+            with self.metrics.phase("hash"):
+                blob_sha = await asyncio.get_running_loop().run_in_executor(
+                    None, hash_file, file_path, stat.st_size
+                )
+            current = os.stat(file_path)
+            if (current.st_ino, current.st_size, current.st_mtime_ns) == (stat.st_ino, stat.st_size, stat.st_mtime_ns):
+                self._hash_cache.put(stat, blob_sha, hashed_at)
+        return blob_sha
+
+    @timed_phase("tree_load")
+    async def _get_remote_tree(self, cloud_dir: str, missing_ok: bool = True,
+                               rev: Optional[str] = None) -> Dict[str, Dict]:
+        """
+        Получение всех файлов директории в облаке одним рекурсивным запросом
+
+        Args:
+            cloud_dir: Директория в облаке
+            missing_ok: Вернуть пустой словарь, если директории нет
+            rev: Ревизия (SHA коммита, тег или ветка); по умолчанию - ветка по умолчанию
+
+        Returns:
+            Словарь {путь относительно cloud_dir: элемент дерева git}
+        """
+        tree_ish = quote(f"{rev or self.repo['default_branch']}:{cloud_dir.strip('/')}", safe="/:")
+        try:
+            tree = await self._request_json("GET", f"{self.repo['url']}/git/trees/{tree_ish}?recursive=1")
+        except aiohttp.ClientResponseError as e:
+            if missing_ok and e.status == 404:
+                return {}
+            raise
+        return await self._collect_tree_files(tree)
+
+    async def _collect_tree_files(self, tree: Dict, prefix: str = "") -> Dict[str, Dict]:
+        """Сбор файлов из рекурсивного дерева с дозагрузкой поддеревьев при усечении"""
+        if not tree.get("truncated"):
+            return {f"{prefix}{item['path']}": item for item in tree["tree"] if item["type"] == "blob"}
+
+        result = {}
+        top = await self._request_json("GET", f"{self.repo['url']}/git/trees/{tree['sha']}")
+        subtrees = [item for item in top["tree"] if item["type"] == "tree"]
+        result.update({f"{prefix}{item['path']}": item for item in top["tree"] if item["type"] == "blob"})
+        for item, subtree in zip(subtrees, await asyncio.gather(*(
+            self._request_json("GET", f"{self.repo['url']}/git/trees/{item['sha']}?recursive=1")
+            for item in subtrees
+        ))):
+            result.update(await self._collect_tree_files(subtree, f"{prefix}{item['path']}/"))
+        return result
+
+    async def _restore_plan_from_tree(self, cloud_dir: str,
+                                      rev: Optional[str] = None) -> Tuple[Dict[str, Dict], Dict[str, Dict]]:
+        """
+        План восстановления по дереву git (для копий без манифеста)
+
+        Args:
+            cloud_dir: Директория в облаке
+            rev: Ревизия копии (по умолчанию - ветка по умолчанию)
+
+        Returns:
+            Кортеж (отдельные файлы {путь: элемент дерева},
+            файлы в пакетах {SHA пакета: {путь: запись индекса}})
+        """
+        remote_files = await self._get_remote_tree(cloud_dir, missing_ok=False, rev=rev)
+        files_to_restore = {}
+        for path, item in remote_files.items():
+            if not path.startswith(f"{PACK_DIR}/") and path != MANIFEST_NAME:
+                add_plan_item(files_to_restore, strip_storage_suffix(path), item)
+
+        packed_files = {}
+        pack_index = remote_files.get(f"{PACK_DIR}/{PACK_INDEX_NAME}")
+        if pack_index:
+            index = json.loads(await self._read_blob(pack_index["sha"]))
+            for path, entry in index["files"].items():
+                if path not in files_to_restore:
+                    packed_files.setdefault(entry["pack"], {})[path] = entry
+        return files_to_restore, packed_files
+
+    async def _restore_plan_selective(self, cloud_dir: str, path_filter: PathFilter, subtree: str = "",
+                                      rev: Optional[str] = None) -> Tuple[Dict[str, Dict], Dict[str, Dict]]:
+        """
+        План восстановления части копии по деревьям git
+
+        Обход такой же, как в GitHubCloudManager._restore_plan_selective,
+        директории одного уровня запрашиваются конкурентно.
+
+        Args:
+            cloud_dir: Директория в облаке
+            path_filter: Отбор файлов по маскам
+            subtree: Поддерево копии; пути плана отсчитываются от него
+            rev: Ревизия копии (по умолчанию - ветка по умолчанию)
+
+        Returns:
+            Кортеж (отдельные файлы {путь: элемент с path, sha и mode},
+            файлы в пакетах {SHA пакета: {путь: запись индекса}})
+        """
+        subtree = subtree.strip('/')
+        root = "/".join(part for part in (cloud_dir.strip('/'), subtree) if part)
+        base = f"{subtree}/" if subtree else ""
+        files_to_restore = {}
+        pack_index_sha = None
+        start = path_filter.common_directory()
+        if path_filter.scan_mode(start) is None:
+            return {}, {}
+
+        def add(path: str, item: Dict):
+            nonlocal pack_index_sha
+            if not subtree and path == f"{PACK_DIR}/{PACK_INDEX_NAME}":
+                pack_index_sha = item["sha"]
+            if not subtree and (path == MANIFEST_NAME or path.startswith(f"{PACK_DIR}/")):
+                return
+            relative_path = strip_storage_suffix(path)
+            if path_filter(relative_path):
+                add_plan_item(files_to_restore, relative_path,
+                              {"path": path, "sha": item["sha"], "mode": item["mode"]})
+
+        def find_pack_index(listing: List[Dict]) -> Optional[str]:
+            return next((item["sha"] for item in listing if item["path"] == PACK_INDEX_NAME), None)
+
+        async def visit(directory: str, url: str) -> List[Tuple[str, str]]:
+            nonlocal pack_index_sha
+            prefix = f"{directory}/" if directory else ""
+            try:
+                if path_filter.scan_mode(directory) == "all":
+                    tree = await self._request_json("GET", f"{url}?recursive=1")
+                    for path, item in (await self._collect_tree_files(tree, prefix)).items():
+                        add(path, item)
+                    return []
+                listing = (await self._request_json("GET", url))["tree"]
+            except aiohttp.ClientResponseError as e:
+                # Директории из масок может не быть в копии
+                if not directory or e.status != 404:
+                    raise
+                return []
+
+            children = []
+            for item in listing:
+                path = f"{prefix}{item['path']}"
+                if item["type"] == "blob":
+                    add(path, item)
+                elif not subtree and path == PACK_DIR:
+                    packs = await self._request_json("GET", f"{self.repo['url']}/git/trees/{item['sha']}")
+                    pack_index_sha = find_pack_index(packs["tree"])
+                elif item["type"] == "tree" and path_filter.scan_mode(path):
+                    children.append((path, f"{self.repo['url']}/git/trees/{item['sha']}"))
+            return children
+
+        rev = rev or self.repo['default_branch']
+        tree_ish = quote(f"{rev}:{'/'.join(p for p in (root, start) if p)}", safe="/:")
+        pending = [(start, f"{self.repo['url']}/git/trees/{tree_ish}")]
+        while pending:
+            levels = await asyncio.gather(*(visit(directory, url) for directory, url in pending))
+            pending = [child for children in levels for child in children]
+
+        # Индекс пакетов лежит в корне копии, вне обойденных директорий
+        if subtree or start:
+            packs_ish = quote(f"{rev}:{cloud_dir.strip('/')}/{PACK_DIR}", safe="/:")
+            try:
+                packs = await self._request_json("GET", f"{self.repo['url']}/git/trees/{packs_ish}")
+                pack_index_sha = find_pack_index(packs["tree"])
+            except aiohttp.ClientResponseError as e:
+                if e.status != 404:
+                    raise
+
+        packed_files = {}
+        if pack_index_sha:
+            index = json.loads(await self._read_blob(pack_index_sha))
+            for path, entry in index["files"].items():
+                if not path.startswith(base):
+                    continue
+                relative_path = path[len(base):]
+                if relative_path not in files_to_restore and path_filter(relative_path):
+                    packed_files.setdefault(entry["pack"], {})[relative_path] = entry
+        return files_to_restore, packed_files
+
+    @timed_phase("manifest_load")
+    async def _load_manifest(self, cloud_dir: str, manifest_sha: Optional[str] = None,
+                             rev: Optional[str] = None) -> Optional[Tuple[Dict, Dict[str, Dict]]]:
+        """
+        Чтение манифеста резервной копии (потоково, построчно)
+
+        Args:
+            cloud_dir: Директория в облаке
+            manifest_sha: SHA blob манифеста, если уже известен
+            rev: Ревизия, в которой ищется манифест (по умолчанию - ветка по умолчанию)
+
+        Returns:
+            Кортеж (заголовок, {путь: запись файла}) или None, если манифеста нет
+        """
+        if manifest_sha is None:
+            url = self._contents_url(f"{cloud_dir.strip('/')}/{MANIFEST_NAME}")
+            if rev:
+                url += f"?ref={quote(rev)}"
+            try:
+                manifest_sha = (await self._request_json("GET", url))["sha"]
+            except aiohttp.ClientResponseError as e:
+                if e.status == 404:
+                    return None
+                raise
+
+        if self._blob_cache:
+            lines = (await self._read_blob(manifest_sha)).splitlines()
+            header = json.loads(lines[0] if lines else b"{}")
+            if header.get("format") != MANIFEST_FORMAT:
+                return None
+            entries = {}
+            for line in lines[1:]:
+                if line.strip():
+                    entry = json.loads(line)
+                    entries[entry["path"]] = entry
+            return header, entries
+
+        async def fetch(session: aiohttp.ClientSession) -> Optional[Tuple[Dict, Dict[str, Dict]]]:
+            url = f"{self.repo['url']}/git/blobs/{manifest_sha}"
+            async with session.get(url, headers={"Accept": RAW_ACCEPT}) as response:
+                await self._check(response)
+                header = json.loads(await response.content.readline() or b"{}")
+                if header.get("format") != MANIFEST_FORMAT:
+                    return None
+                entries = {}
+                async for line in response.content:
+                    if line.strip():
+                        entry = json.loads(line)
+                        entries[entry["path"]] = entry
+                return header, entries
+
+        return await self._call(fetch)
+
+    @timed_phase("manifest_save")
+    async def _save_backup_metadata(self, backup_info: Dict, cloud_dir: str, entries: Dict[str, Dict],
+                                    tree_elements: Dict[str, Dict]) -> str:
+        """
+        Сохранение манифеста резервной копии (формат как у GitHubCloudManager)
+
+        Args:
+            backup_info: Информация о резервной копии
+            cloud_dir: Директория в облаке
+            entries: Записи файлов {путь относительно cloud_dir: запись}
+            tree_elements: Элементы дерева коммита, дополняются на месте
+
+        Returns:
+            SHA blob манифеста
+        """
+        header = {
+            "format": MANIFEST_FORMAT,
+            "backup_dir": cloud_dir,
+            "timestamp": backup_info["timestamp"],
+            "source_dir": backup_info["source_dir"],
+            "files_count": len(entries),
+            "total_size": sum(entry["size"] for entry in entries.values()),
+            "status": "success" if backup_info["files_failed"] == 0 else "partial"
+        }
+        lines = [header] + [entries[path] for path in sorted(entries)]
+        content = "".join(json.dumps(line, ensure_ascii=False, separators=(",", ":")) + "\n" for line in lines)
+
+        manifest_path = f"{cloud_dir}/{MANIFEST_NAME}"
+        manifest_sha = await self._create_blob(content.encode('utf-8'))
+        tree_elements[manifest_path] = {
+            "path": manifest_path,
+            "mode": "100644",
+            "type": "blob",
+            "sha": manifest_sha
+        }
+        backup_info["manifest"] = manifest_path
+        return manifest_sha
+
+    @timed_phase("commit")
+    async def _commit_tree(self, tree_elements: List[Dict], message: str) -> str:
+        """
+        Создание одного коммита с изменениями поверх текущей ветки по умолчанию
+
+        Args:
+            tree_elements: Элементы дерева (path, mode, type, sha; sha=None удаляет путь)
+            message: Сообщение коммита
+
+        Returns:
+            SHA созданного коммита
+        """
+        ref_url = f"{self.repo['url']}/git/refs/heads/{quote(self.repo['default_branch'])}"
+
+        # Сохраненная вершина может устареть, если ветку продвинул другой
+        # клиент: тогда ветка не перематывается (422) и коммит повторяется
+        # поверх актуальной вершины
+        for attempt in range(2):
+            head_sha, tree_sha = await self._branch_head(refresh=attempt > 0)
+
+            # Большие деревья создаются частями, каждая поверх предыдущей
+            for i in range(0, len(tree_elements), TREE_CHUNK_SIZE):
+                tree = await self._request_json("POST", f"{self.repo['url']}/git/trees", {
+                    "base_tree": tree_sha,
+                    "tree": tree_elements[i:i + TREE_CHUNK_SIZE]
+                })
+                tree_sha = tree["sha"]
+
+            commit = await self._request_json("POST", f"{self.repo['url']}/git/commits", {
+                "message": message,
+                "tree": tree_sha,
+                "parents": [head_sha]
+            })
+            try:
+                await self._request_json("PATCH", ref_url, {"sha": commit["sha"], "force": False})
+            except aiohttp.ClientResponseError as e:
+                if e.status != 422 or attempt:
+                    raise
+                continue
+            self._set_head(commit["sha"], tree_sha)
+            return commit["sha"]
+
+    async def _read_snapshots(self) -> Tuple[List[Dict], Optional[bytes]]:
+        """
+        Чтение каталога снимков одним условным запросом
+
+        Кеш ответов тот же, что у GitHubCloudManager._read_snapshots:
+        неизменившийся каталог (ответ 304) не расходует лимит API.
+
+        Returns:
+            Кортеж (записи каталога, содержимое каталога или None, если
+            каталога еще нет)
+        """
+        url = f"{self._contents_url(snapshots.CATALOG_NAME)}?ref={quote(snapshots.SNAPSHOT_BRANCH)}"
+        cached = self._http_cache.get(url)
+        headers = {"Accept": RAW_ACCEPT}
+        if cached:
+            headers["If-None-Match"] = cached["etag"]
+
+        async def request(session: aiohttp.ClientSession) -> Optional[bytes]:
+            async with session.get(url, headers=headers) as response:
+                if cached and response.status == 304:
+                    self._rate.observe(response.headers)
+                    return cached["body"].encode('utf-8')
+                if response.status == 404:
+                    self._rate.observe(response.headers)
+                    return None
+                await self._check(response)
+                content = await response.read()
+                if response.headers.get("ETag"):
+                    self._http_cache.put(url, response.headers["ETag"], content.decode('utf-8'))
+                return content
+
+        content = await self._call(request)
+        return (snapshots.parse_catalog(content) if content else []), content
+
+    async def _record_snapshot(self, backup_info: Dict, cloud_dir: str, manifest_sha: Optional[str]):
+        """
+        Закрепление коммита копии тегом и запись снимка в каталог
+
+        Ошибка записи снимка не отменяет резервную копию.
+
+        Args:
+            backup_info: Информация о резервной копии; дополняется id снимка
+            cloud_dir: Директория в облаке
+            manifest_sha: SHA blob манифеста копии
+        """
+        if not self._head:
+            return
+        entry = snapshots.make_entry(backup_info, cloud_dir, self._head["commit"], self._head["tree"], manifest_sha)
+        message = f"Snapshot {entry['id']}: {entry['cloud_dir']}"
+        try:
+            await self._request_json("POST", f"{self.repo['url']}/git/refs", {
+                "ref": f"refs/tags/{snapshots.TAG_PREFIX}{entry['id']}",
+                "sha": entry["commit"]
+            })
+            # Если каталог одновременно изменил другой клиент, запись повторяется
+            for attempt in range(3):
+                _, content = await self._read_snapshots()
+                data = snapshots.append_entry(content or b"", entry)
+                try:
+                    if content is None:
+                        # Первый снимок: ветка каталога создается без общей истории с копиями
+                        tree = await self._request_json("POST", f"{self.repo['url']}/git/trees", {
+                            "tree": [{"path": snapshots.CATALOG_NAME, "mode": "100644", "type": "blob",
+                                      "content": data.decode('utf-8')}]
+                        })
+                        commit = await self._request_json("POST", f"{self.repo['url']}/git/commits", {
+                            "message": message,
+                            "tree": tree["sha"],
+                            "parents": []
+                        })
+                        await self._request_json("POST", f"{self.repo['url']}/git/refs", {
+                            "ref": f"refs/heads/{snapshots.SNAPSHOT_BRANCH}",
+                            "sha": commit["sha"]
+                        })
+                    else:
+                        await self._request_json("PUT", self._contents_url(snapshots.CATALOG_NAME), {
+                            "message": message,
+                            "content": base64.b64encode(data).decode('ascii'),
+                            "sha": git_blob_sha(content),
+                            "branch": snapshots.SNAPSHOT_BRANCH
+                        })
+                    break
+                except aiohttp.ClientResponseError as e:
+                    if e.status not in (409, 422) or attempt == 2:
+                        raise
+            backup_info["snapshot"] = entry["id"]
+        except aiohttp.ClientError as e:
+            print(f"{Fore.YELLOW}! Снимок не записан в каталог: {str(e)}{Style.RESET_ALL}")
+
+    def _open_repo(self, key: str, info: Dict):
+        """Открытие репозитория по сведениям из RepoCache"""
+        self.repo = info
+        self._repo_key = key
+        self._head = info.get("head")
+
+    async def _branch_head(self, refresh: bool = False) -> Tuple[str, str]:
+        """
+        Вершина ветки по умолчанию
+
+        Args:
+            refresh: Запросить вершину, даже если она известна
+
+        Returns:
+            Кортеж (SHA коммита, SHA его дерева)
+        """
+        if refresh or not self._head:
+            branch = quote(self.repo['default_branch'])
+            ref = await self._request_json("GET", f"{self.repo['url']}/git/ref/heads/{branch}")
+            commit_sha = ref["object"]["sha"]
+            commit = await self._request_json("GET", f"{self.repo['url']}/git/commits/{commit_sha}")
+            self._set_head(commit_sha, commit["tree"]["sha"])
+        return self._head["commit"], self._head["tree"]
+
+    def _set_head(self, commit_sha: Optional[str], tree_sha: Optional[str] = None):
+        """Запоминание вершины ветки по умолчанию (None - вершина неизвестна)"""
+        self._head = {"commit": commit_sha, "tree": tree_sha} if commit_sha else None
+        self._repo_cache.set_head(self._repo_key, self._head)
+
+    def _contents_url(self, cloud_path: str) -> str:
+        """Адрес API contents для пути в репозитории"""
+        return f"{self.repo['url']}/contents/{quote(cloud_path.strip('/'))}"
@@ -0,0 +1,383 @@
+#!/usr/bin/env python3
+"""
+Формат резервных копий, общий для GitHubCloudManager и AsyncGitHubCloudManager
+Способы хранения файлов в дереве копии, SHA blob-объектов git, манифест и
+план восстановления, отбор файлов по маскам и запись восстановленных файлов.
+Модуль не обращается к сети
+"""
+
+import base64
+import hashlib
+import io
+import json
+import os
+import shutil
+from contextlib import contextmanager
+from fnmatch import fnmatchcase
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple, Union
+
+from blob_cache import attributes_match
+
+# Размер блока чтения при хешировании файлов
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# Размер блока чтения при потоковой загрузке (кратен 3 для base64 без дополнения)
+UPLOAD_CHUNK_SIZE = 3 * 64 * 1024
+
+# Суффикс индекса блоков, который хранится вместо самого файла
+CHUNK_INDEX_SUFFIX = ".chunkindex"
+
+# Суффикс объекта дельты, который хранится вместо самого файла
+DELTA_SUFFIX = ".delta"
+
+# Суффиксы путей, которыми файл представлен в дереве копии
+STORAGE_SUFFIXES = (CHUNK_INDEX_SUFFIX, DELTA_SUFFIX)
+
+
+class PathFilter:
+    """
+    Отбор файлов копии по маскам для частичного восстановления
+
+    Маски в синтаксисе fnmatch (*, ?, [...]) сравниваются с путем файла
+    относительно корня восстановления с учетом регистра; '*' совпадает и с
+    '/'. Файл отбирается, если подходит хотя бы под одну маску include (или
+    include не заданы) и не подходит ни под одну маску exclude.
+    """
+
+    def __init__(self, include: Optional[List[str]] = None, exclude: Optional[List[str]] = None):
+        """
+        Args:
+            include: Маски включаемых файлов (None - все файлы)
+            exclude: Маски исключаемых файлов
+        """
+        self.include = [pattern.strip('/') for pattern in include or ["*"]]
+        self.exclude = [pattern.strip('/') for pattern in exclude or []]
+        # Часть маски до первого спецсимвола - путь, который известен заранее
+        self._literals = []
+        for pattern in self.include:
+            special = [pattern.index(c) for c in "*?[" if c in pattern]
+            self._literals.append(pattern[:min(special)] if special else pattern)
+
+    def __call__(self, path: str) -> bool:
+        return (any(fnmatchcase(path, pattern) for pattern in self.include)
+                and not any(fnmatchcase(path, pattern) for pattern in self.exclude))
+
+    def common_directory(self) -> str:
+        """Ближайшая общая директория всех масок include ("" - корень)"""
+        directories = [literal.rpartition("/")[0] for literal in self._literals]
+        common = os.path.commonprefix(directories)
+        while common and not all(d == common or d.startswith(f"{common}/") for d in directories):
+            common = common.rpartition("/")[0]
+        return common
+
+    def scan_mode(self, directory: str) -> Optional[str]:
+        """
+        Как обходить директорию
+
+        Args:
+            directory: Путь директории относительно корня ("" - корень)
+
+        Returns:
+            "all" - подходящие файлы могут быть на любой глубине (дерево
+            запрашивается целиком), "list" - нужна часть элементов (дерево
+            запрашивается без рекурсии), None - подходящих файлов нет
+        """
+        prefix = f"{directory}/" if directory else ""
+        # Маска вида "dir/*" исключает все содержимое директории
+        if any(pattern.endswith("*") and fnmatchcase(prefix, pattern) for pattern in self.exclude):
+            return None
+        if any(prefix.startswith(literal) for literal in self._literals):
+            return "all"
+        if any(literal.startswith(prefix) for literal in self._literals):
+            return "list"
+        return None
+
+
+class Base64JsonBody:
+    """
+    Тело JSON-запроса, в котором поле content кодируется в base64 по мере отправки
+
+    Файл читается блоками, поэтому в памяти одновременно находится только
+    текущий блок, а не весь файл и его base64-копия. Длина тела известна
+    заранее, запрос уходит с обычным Content-Length.
+    """
+
+    def __init__(self, source: Union[str, bytes], fields: Dict[str, str]):
+        """
+        Args:
+            source: Путь к загружаемому файлу или содержимое в памяти
+            fields: Остальные поля JSON-объекта
+        """
+        self._file = open(source, 'rb') if isinstance(source, str) else io.BytesIO(source)
+        self._size = self._file.seek(0, os.SEEK_END)
+        self._file.seek(0)
+        self._read = 0
+        self._sha = hashlib.sha1(f"blob {self._size}\0".encode('ascii'))
+
+        opening = json.dumps(fields)[:-1] + (", " if fields else "") + '"content": "'
+        self._buffer = opening.encode('ascii')
+        self._length = len(self._buffer) + 4 * ((self._size + 2) // 3) + 2
+        self._done = False
+
+    def __len__(self) -> int:
+        return self._length
+
+    @property
+    def blob_sha(self) -> str:
+        """SHA-1 blob-объекта git для отправленного содержимого"""
+        return self._sha.hexdigest()
+
+    def read(self, size: int = -1) -> bytes:
+        while not self._done and (size < 0 or len(self._buffer) < size):
+            chunk = self._file.read(UPLOAD_CHUNK_SIZE)
+            if chunk:
+                self._read += len(chunk)
+                self._sha.update(chunk)
+                self._buffer += base64.b64encode(chunk)
+            else:
+                self.close()
+                if self._read != self._size:
+                    raise IOError("Файл изменился во время загрузки")
+                self._buffer += b'"}'
+                self._done = True
+
+        if size < 0:
+            size = len(self._buffer)
+        data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+    def close(self):
+        self._file.close()
+
+
+def git_blob_sha(content: bytes) -> str:
+    """
+    Вычисление SHA-1 blob-объекта git для содержимого в памяти
+
+    Args:
+        content: Содержимое
+
+    Returns:
+        SHA blob в шестнадцатеричном виде
+    """
+    header = f"blob {len(content)}\0".encode('ascii')
+    return hashlib.sha1(header + content).hexdigest()
+
+
+def hash_file(file_path: str, size: Optional[int] = None) -> str:
+    """
+    Потоковое вычисление SHA-1 blob-объекта git для локального файла
+
+    Args:
+        file_path: Путь к локальному файлу
+        size: Размер файла, если уже известен
+
+    Returns:
+        SHA blob в шестнадцатеричном виде
+    """
+    if size is None:
+        size = os.path.getsize(file_path)
+    sha = hashlib.sha1(f"blob {size}\0".encode('ascii'))
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def try_hash_file(file_path: str) -> Optional[str]:
+    """SHA-1 blob-объекта git для файла или None, если файл не читается"""
+    try:
+        return hash_file(file_path)
+    except OSError:
+        return None
+
+
+def git_file_mode(file_path: str, stat: Optional[os.stat_result] = None) -> str:
+    """
+    Режим файла для дерева git
+
+    Args:
+        file_path: Путь к локальному файлу
+        stat: Результат stat файла, если уже известен
+
+    Returns:
+        "100755" для исполняемых файлов, иначе "100644"
+    """
+    stat = stat or os.stat(file_path)
+    return "100755" if stat.st_mode & 0o111 else "100644"
+
+
+def strip_storage_suffix(path: str) -> str:
+    """Путь файла без суффикса индекса блоков или объекта дельты"""
+    for suffix in STORAGE_SUFFIXES:
+        if path.endswith(suffix):
+            return path[:-len(suffix)]
+    return path
+
+
+def merge_manifest(old_entries: Dict[str, Dict], entries: Dict[str, Dict],
+                   packed: bool) -> Dict[str, Dict]:
+    """
+    Записи нового манифеста поверх прежнего
+
+    Из прежнего манифеста остаются файлы, которые не были загружены в
+    этот раз (их прежняя версия осталась в облаке). Записи о пакетах
+    остаются, только если пакеты не пересобирались.
+
+    Args:
+        old_entries: Записи прежнего манифеста
+        entries: Записи файлов текущей копии
+        packed: Пакеты пересобирались в этой копии
+
+    Returns:
+        Записи нового манифеста
+    """
+    merged = {path: entry for path, entry in old_entries.items()
+              if not (packed and "pack" in entry)}
+    merged.update(entries)
+    return merged
+
+
+def restore_plan_from_manifest(entries: Dict[str, Dict]) -> Tuple[Dict[str, Dict], Dict[str, Dict]]:
+    """
+    План восстановления по манифесту
+
+    Args:
+        entries: Записи манифеста
+
+    Returns:
+        Кортеж (отдельные файлы {путь: элемент с path и sha},
+        файлы в пакетах {SHA пакета: {путь: запись}})
+    """
+    files_to_restore = {}
+    packed_files = {}
+    for path, entry in entries.items():
+        if "pack" in entry:
+            packed_files.setdefault(entry["pack"], {})[path] = entry
+        elif "index" in entry:
+            files_to_restore[path] = {"path": f"{path}{CHUNK_INDEX_SUFFIX}", "sha": entry["index"]}
+        elif "delta" in entry:
+            files_to_restore[path] = {"path": f"{path}{DELTA_SUFFIX}", "sha": entry["delta"]}
+        else:
+            files_to_restore[path] = {"path": path, "sha": entry["sha"]}
+    return files_to_restore, packed_files
+
+
+def add_plan_item(files_to_restore: Dict[str, Dict], relative_path: str, item: Dict):
+    """
+    Добавление файла из дерева git в план восстановления
+
+    Суффиксы форматов хранения отбрасываются, поэтому "foo", "foo.chunkindex"
+    и "foo.delta" попадают на один путь. Без манифеста нельзя узнать,
+    какое представление актуально, поэтому при совпадении в плане
+    остается элемент с полем conflict (список путей в дереве), и файл
+    не восстанавливается.
+
+    Args:
+        files_to_restore: Отдельные файлы плана, изменяются на месте
+        relative_path: Путь файла без суффикса формата хранения
+        item: Элемент дерева с path и sha
+    """
+    existing = files_to_restore.get(relative_path)
+    if existing is None:
+        files_to_restore[relative_path] = item
+        return
+    paths = existing.get("conflict", [existing["path"]]) + [item["path"]]
+    files_to_restore[relative_path] = dict(item, conflict=sorted(paths))
+
+
+def reject_unsafe_paths(files_to_restore: Dict[str, Dict], packed_files: Dict[str, Dict],
+                        manifest_entries: Dict[str, Dict], restore_info: Dict):
+    """
+    Исключение из плана восстановления путей, выходящих за директорию восстановления
+
+    В деревьях git не бывает компонентов "..", но пути из манифеста и
+    индекса пакетов - обычный JSON: поврежденный или подмененный файл
+    мог бы записать файл вне local_restore_path. Такие пути не
+    восстанавливаются и учитываются как ошибки.
+
+    Args:
+        files_to_restore: Отдельные файлы плана, изменяются на месте
+        packed_files: Файлы в пакетах плана, изменяются на месте
+        manifest_entries: Записи манифеста, изменяются на месте
+        restore_info: Результаты восстановления, дополняются ошибками
+    """
+    # Разделители путей ОС, кроме '/' (например, '\\' в Windows)
+    foreign_separators = [sep for sep in (os.sep, os.altsep) if sep and sep != "/"]
+
+    def unsafe(path: str) -> bool:
+        if os.path.isabs(path) or os.path.splitdrive(path)[0]:
+            return True
+        return any(part in ("", ".", "..") or any(sep in part for sep in foreign_separators)
+                   for part in path.split('/'))
+
+    rejected = {path for path in files_to_restore if unsafe(path)}
+    for members in packed_files.values():
+        rejected.update(path for path in members if unsafe(path))
+    for path in sorted(rejected):
+        files_to_restore.pop(path, None)
+        manifest_entries.pop(path, None)
+        for members in packed_files.values():
+            members.pop(path, None)
+        restore_info["files_failed"] += 1
+        restore_info["details"].append({
+            "file": path,
+            "error": "Недопустимый путь в копии",
+            "status": "failed"
+        })
+    for pack_sha in [pack_sha for pack_sha, members in packed_files.items() if not members]:
+        del packed_files[pack_sha]
+
+
+@contextmanager
+def part_file(local_path: str) -> Iterator[BinaryIO]:
+    """
+    Запись во временный файл с переименованием в целевой после успеха
+
+    Обрыв или ошибка не оставляют на месте целевого файла частичное содержимое.
+
+    Args:
+        local_path: Путь для сохранения локального файла
+
+    Returns:
+        Временный файл, открытый на запись
+    """
+    os.makedirs(os.path.dirname(local_path) or ".", exist_ok=True)
+    tmp_path = f"{local_path}.part"
+    try:
+        with open(tmp_path, 'wb') as f:
+            yield f
+        os.replace(tmp_path, local_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def apply_file_attributes(local_path: str, entry: Dict):
+    """
+    Восстановление прав на выполнение и времени изменения файла
+
+    Права и время изменения общие для всех жестких ссылок на файл, поэтому
+    файл со ссылками (восстановленный из кеша blob в режиме link), которому
+    нужны другие права или время, сначала заменяется своей копией.
+
+    Args:
+        local_path: Путь к восстановленному файлу
+        entry: Запись манифеста
+    """
+    try:
+        stat = os.stat(local_path)
+        if stat.st_nlink > 1 and not attributes_match(stat, entry):
+            tmp_path = f"{local_path}.part"
+            shutil.copyfile(local_path, tmp_path)
+            os.replace(tmp_path, local_path)
+        mode = os.stat(local_path).st_mode
+        if entry.get("mode") == "100755":
+            os.chmod(local_path, mode | 0o111)
+        elif entry.get("mode") == "100644" and mode & 0o111:
+            os.chmod(local_path, mode & ~0o111)
+        if "mtime" in entry:
+            os.utime(local_path, (entry["mtime"], entry["mtime"]))
+    except OSError:
+        pass
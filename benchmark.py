@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+Воспроизводимые замеры резервного копирования и восстановления
+Замеры выполняются на локальном fake-сервере GitHub (fake_github.py) с
+заданной задержкой и лимитом запросов, поэтому не зависят от сети и не
+расходуют лимит настоящего аккаунта. Синтетические наборы данных
+генерируются детерминированно из seed.
+
+Каждая операция запускается в отдельном процессе, чтобы пиковое
+потребление памяти (RSS) относилось только к ней.
+
+Пример:
+    python benchmark.py --scale 0.1 --latency 0.02 --json results.json
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import queue
+import random
+import resource
+import shutil
+import sys
+import tempfile
+import time
+import traceback
+from typing import Dict, List, Optional
+
+from colorama import Fore, Style, init
+
+from fake_github import FakeGitHubServer
+
+init(autoreset=True)
+
+REPO_NAME = "benchmark"
+
+# Ограничение времени одного сценария по умолчанию (секунды)
+SCENARIO_TIMEOUT = 3600.0
+
+# Как часто проверяется, жив ли процесс замера (секунды)
+POLL_INTERVAL = 1.0
+
+# Наборы данных: число файлов при scale=1.0 и диапазон размеров файлов
+DATASETS = {
+    "small_files": {"files": 10000, "min_size": 100, "max_size": 4 * 1024, "depth": 2},
+    "large_files": {"files": 4, "min_size": 32 * 1024 * 1024, "max_size": 64 * 1024 * 1024, "depth": 1},
+    "deep_tree": {"files": 2000, "min_size": 1024, "max_size": 64 * 1024, "depth": 12}
+}
+
+# Сценарии: (название, операция, параметры)
+SCENARIOS = [
+    ("backup", "backup", {}),
+    ("backup_packed", "backup", {"packed": True, "chunked": True}),
+    ("backup_incremental", "backup", {"incremental": True}),
+    ("restore", "restore", {}),
+    ("restore_sync", "restore", {"sync": True})
+]
+
+
+def generate_dataset(root: str, files: int, min_size: int, max_size: int, depth: int, seed: int = 0) -> int:
+    """
+    Генерация синтетического набора файлов
+
+    Args:
+        root: Корневая директория набора
+        files: Число файлов
+        min_size: Минимальный размер файла в байтах
+        max_size: Максимальный размер файла в байтах
+        depth: Глубина вложенности директорий
+        seed: Начальное значение генератора
+
+    Returns:
+        Общий размер файлов в байтах
+    """
+    rng = random.Random(seed)
+    total_size = 0
+    for index in range(files):
+        parts = [f"d{rng.randrange(8)}" for _ in range(rng.randint(1, depth))]
+        directory = os.path.join(root, *parts)
+        os.makedirs(directory, exist_ok=True)
+        size = rng.randint(min_size, max_size)
+        with open(os.path.join(directory, f"file_{index}.bin"), 'wb') as f:
+            # Половина содержимого случайна, половина - повторяющийся текст:
+            # так данные похожи на реальные и сжимаются частично
+            noise = rng.randbytes(size // 2)
+            f.write(noise + (b"benchmark " * (size // 20 + 1))[:size - len(noise)])
+        total_size += size
+    return total_size
+
+
+def peak_rss_mb() -> float:
+    """Пиковый RSS текущего процесса в мегабайтах"""
+    # В Linux ru_maxrss наследуется от родителя через fork/exec,
+    # поэтому берется VmHWM адресного пространства самого процесса
+    try:
+        with open("/proc/self/status", 'r', encoding='ascii') as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _run_operation(api_url: str, cache_dir: str, operation: str, local_dir: str,
+                   target: str, options: Dict, results: multiprocessing.Queue):
+    """Выполнение операции в дочернем процессе"""
+    # Вывод менеджера (прогресс, сообщения) не смешивается с отчетом
+    sys.stdout = open(os.devnull, 'w')
+    sys.stderr = open(os.devnull, 'w')
+    started = time.perf_counter()
+    try:
+        from github_cloud_manager import GitHubCloudManager
+
+        manager = GitHubCloudManager("benchmark", cache_dir=cache_dir, api_url=api_url)
+        manager.initialize_backup_repo(REPO_NAME)
+        started = time.perf_counter()
+        if operation == "backup":
+            result = manager.backup_directory(local_dir, target, **options)
+        else:
+            result = manager.restore_backup(target, local_dir, **options)
+    except Exception as e:
+        # Вывод процесса отключен, поэтому ошибка передается в отчет
+        frame = traceback.extract_tb(e.__traceback__)[-1]
+        result = {
+            "success": False,
+            "message": f"{type(e).__name__}: {e} ({os.path.basename(frame.filename)}:{frame.lineno})"
+        }
+    elapsed = time.perf_counter() - started
+    results.put({
+        "success": result["success"],
+        "message": result["message"],
+        "seconds": elapsed,
+        "peak_rss_mb": peak_rss_mb()
+    })
+
+
+def _wait_result(process: multiprocessing.Process, results: multiprocessing.Queue,
+                 timeout: Optional[float]) -> Dict:
+    """
+    Ожидание результата дочернего процесса
+
+    Если процесс завершился без результата (например, был убит) или не
+    уложился в timeout, возвращается результат с ошибкой.
+
+    Returns:
+        Словарь с success, message, seconds и peak_rss_mb
+    """
+    started = time.monotonic()
+    while True:
+        try:
+            return results.get(timeout=POLL_INTERVAL)
+        except queue.Empty:
+            pass
+        if process.exitcode is not None:
+            # Результат мог попасть в очередь перед самым завершением процесса
+            try:
+                return results.get(timeout=POLL_INTERVAL)
+            except queue.Empty:
+                message = f"Процесс замера завершился без результата (код {process.exitcode})"
+                break
+        if timeout is not None and time.monotonic() - started > timeout:
+            process.terminate()
+            message = f"Превышено время замера: {timeout:.0f} с"
+            break
+    return {"success": False, "message": message, "seconds": time.monotonic() - started, "peak_rss_mb": 0.0}
+
+
+def run_scenario(server: FakeGitHubServer, cache_dir: str, operation: str,
+                 local_dir: str, target: str, options: Dict,
+                 timeout: Optional[float] = SCENARIO_TIMEOUT) -> Dict:
+    """
+    Замер одной операции в отдельном процессе
+
+    Args:
+        timeout: Ограничение времени операции в секундах (None - без ограничения)
+
+    Returns:
+        Словарь с временем, пиковым RSS и числом запросов к API
+    """
+    server.reset_stats()
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    process = context.Process(
+        target=_run_operation,
+        args=(server.url, cache_dir, operation, local_dir, target, options, results)
+    )
+    process.start()
+    try:
+        result = _wait_result(process, results, timeout)
+    finally:
+        process.join()
+    # Запросы инициализации (пользователь, репозиторий) в замер не входят
+    calls = {endpoint: count for endpoint, count in server.stats()["calls"].items()
+             if endpoint not in ("GET /user", "GET /repos/{repo}", "304")}
+    result["api_calls"] = sum(calls.values())
+    result["calls"] = calls
+    return result
+
+
+def run_benchmarks(scale: float, latency: float, rate_limit: int, datasets: List[str], seed: int = 0,
+                   timeout: Optional[float] = SCENARIO_TIMEOUT) -> List[Dict]:
+    """
+    Замеры всех сценариев на всех наборах данных
+
+    Args:
+        scale: Множитель числа файлов в наборах
+        latency: Задержка ответа fake-сервера в секундах
+        rate_limit: Лимит запросов fake-сервера
+        datasets: Названия наборов данных
+        seed: Начальное значение генератора
+        timeout: Ограничение времени одного сценария в секундах
+
+    Returns:
+        Список результатов
+    """
+    results = []
+    work_dir = tempfile.mkdtemp(prefix="cloud-backup-bench-")
+    try:
+        with FakeGitHubServer(latency=latency, rate_limit=rate_limit) as server:
+            for name in datasets:
+                spec = DATASETS[name]
+                source = os.path.join(work_dir, "source", name)
+                files = max(1, int(spec["files"] * scale))
+                total_size = generate_dataset(source, files, spec["min_size"], spec["max_size"], spec["depth"], seed)
+                print(f"{Fore.CYAN}{name}: {files} файлов, {total_size / 1024 / 1024:.1f} MB{Style.RESET_ALL}")
+
+                # Свежий кеш на каждый набор: первая копия хеширует все файлы
+                cache_dir = os.path.join(work_dir, "cache", name)
+                restore_dir = os.path.join(work_dir, "restore", name)
+                for scenario, operation, options in SCENARIOS:
+                    target = f"backups/{name}"
+                    if operation == "backup" and options.get("packed"):
+                        target += "_packed"
+                    local_dir = source if operation == "backup" else restore_dir
+                    if operation == "restore" and not options.get("sync"):
+                        shutil.rmtree(restore_dir, ignore_errors=True)
+                    result = run_scenario(server, cache_dir, operation, local_dir, target, options, timeout)
+                    seconds = max(result["seconds"], 1e-9)
+                    result.update({
+                        "dataset": name,
+                        "scenario": scenario,
+                        "files": files,
+                        "bytes": total_size,
+                        "files_per_second": files / seconds,
+                        "mb_per_second": total_size / 1024 / 1024 / seconds,
+                        "api_calls_per_file": result["api_calls"] / files
+                    })
+                    results.append(result)
+                    print_result(result)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return results
+
+
+def print_result(result: Dict):
+    """Печать строки результата"""
+    color = Fore.GREEN if result["success"] else Fore.RED
+    print(f"{color}  {result['scenario']:<20} {result['seconds']:8.2f} s "
+          f"{result['files_per_second']:9.1f} файл/с {result['mb_per_second']:8.2f} MB/s "
+          f"{result['api_calls_per_file']:6.3f} запр/файл {result['peak_rss_mb']:7.1f} MB RSS{Style.RESET_ALL}")
+    if not result["success"]:
+        print(f"{Fore.RED}    {result['message']}{Style.RESET_ALL}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Замеры резервного копирования на fake-сервере GitHub")
+    parser.add_argument("--scale", type=float, default=0.1, help="множитель числа файлов в наборах")
+    parser.add_argument("--latency", type=float, default=0.02, help="задержка ответа сервера в секундах")
+    parser.add_argument("--rate-limit", type=int, default=1_000_000, help="лимит запросов сервера")
+    parser.add_argument("--dataset", action="append", choices=sorted(DATASETS),
+                        help="набор данных (по умолчанию все)")
+    parser.add_argument("--seed", type=int, default=0, help="начальное значение генератора")
+    parser.add_argument("--timeout", type=float, default=SCENARIO_TIMEOUT,
+                        help="ограничение времени одного сценария в секундах")
+    parser.add_argument("--json", help="файл для сохранения результатов")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.scale, args.latency, args.rate_limit, args.dataset or list(DATASETS), args.seed,
+                             args.timeout)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+        print(f"{Fore.GREEN}✓ Результаты сохранены: {args.json}{Style.RESET_ALL}")
+
+
+if __name__ == "__main__":
+    main()
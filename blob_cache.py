@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+Локальный кеш содержимого blob-объектов по SHA
+Blob-объекты git неизменяемы, поэтому скачанное однажды содержимое можно
+переиспользовать при любом следующем восстановлении той же или другой
+копии: файл берется с диска жесткой ссылкой или копированием, без запросов
+к API. Размер кеша ограничен, при переполнении удаляются давно не
+использованные объекты (LRU). Кеш можно использовать из нескольких
+процессов одновременно
+"""
+
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from typing import BinaryIO, Dict, Optional, Tuple
+
+# Ограничение размера кеша по умолчанию
+DEFAULT_MAX_SIZE = 1024 * 1024 * 1024
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS blobs (
+    sha TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS blobs_last_used ON blobs (last_used);
+"""
+
+
+class BlobCache:
+    """
+    Кеш содержимого blob-объектов с вытеснением LRU
+
+    Каждый объект - отдельный файл, имя которого - SHA blob. Файл
+    появляется атомарным переименованием, поэтому другие процессы не видят
+    частично записанных объектов. Размеры и время последнего использования
+    хранятся в SQLite (общем для всех процессов) и записываются пакетно в
+    flush(). Безопасен для использования из нескольких потоков.
+
+    В режиме link файлы восстанавливаются жесткими ссылками на объекты
+    кеша (сами объекты в кеш всегда копируются): это быстрее и не занимает
+    места, но восстановленный из кеша файл и объект кеша - один и тот же файл. Все восстановленные файлы с одинаковым
+    содержимым (например, пустые __init__.py) делят одну копию на диске,
+    поэтому их нельзя изменять на месте (запись с заменой файла, как в
+    большинстве редакторов, безопасна). Права и время изменения у ссылок
+    тоже общие, поэтому ссылка создается, только если они у объекта кеша
+    уже такие, как нужно файлу; иначе файл копируется.
+    """
+
+    def __init__(self, directory: str, max_size: int = DEFAULT_MAX_SIZE, link: bool = False):
+        """
+        Открытие (или создание) кеша
+
+        Args:
+            directory: Директория кеша (создается при необходимости)
+            max_size: Максимальный суммарный размер объектов в байтах
+            link: Восстанавливать файлы жесткими ссылками вместо копирования
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.max_size = max_size
+        self.link = link
+        self._lock = threading.Lock()
+        # Другие процессы могут держать блокировку базы во время flush()
+        self._db = sqlite3.connect(os.path.join(directory, "index.sqlite"), timeout=60,
+                                   check_same_thread=False)
+        self._db.executescript(_SCHEMA)
+        self._pending: Dict[str, Tuple[int, float]] = {}
+        self._pending_size = 0
+        self.hits = 0
+        self.misses = 0
+        self.files_copied = 0
+
+    def open(self, blob_sha: str) -> Optional[BinaryIO]:
+        """
+        Открытие объекта на чтение
+
+        Args:
+            blob_sha: SHA blob
+
+        Returns:
+            Файл, открытый в двоичном режиме, или None, если объекта нет в кеше
+        """
+        try:
+            f = open(self._path(blob_sha), 'rb')
+        except OSError:
+            self._record(blob_sha, None)
+            return None
+        self._record(blob_sha, os.fstat(f.fileno()).st_size)
+        return f
+
+    def copy_to(self, blob_sha: str, local_path: str, attributes: Optional[Dict] = None) -> bool:
+        """
+        Восстановление объекта в файл (жесткой ссылкой или копированием)
+
+        Целевой файл заменяется атомарно через временный файл.
+
+        Args:
+            blob_sha: SHA blob
+            local_path: Путь для сохранения локального файла
+            attributes: Права (mode) и время изменения (mtime) файла из
+                манифеста; жесткая ссылка создается, только если они
+                совпадают с объектом кеша
+
+        Returns:
+            True, если объект был в кеше и файл восстановлен
+        """
+        source = self._path(blob_sha)
+        os.makedirs(os.path.dirname(local_path) or ".", exist_ok=True)
+        tmp_path = f"{local_path}.part"
+        try:
+            if os.path.lexists(tmp_path):
+                os.remove(tmp_path)
+            self._place(source, tmp_path, attributes)
+            size = os.stat(tmp_path).st_size
+            os.replace(tmp_path, local_path)
+        except OSError:
+            self._record(blob_sha, None)
+            return False
+        finally:
+            # Если целевой файл уже был ссылкой на тот же объект,
+            # rename ничего не делает и временный файл остается
+            if os.path.lexists(tmp_path):
+                os.remove(tmp_path)
+        self._record(blob_sha, size)
+        with self._lock:
+            self.files_copied += 1
+        return True
+
+    def add_file(self, blob_sha: str, file_path: str):
+        """
+        Добавление объекта из локального файла с этим содержимым
+
+        Файл всегда копируется (вместе с правами и временем изменения), даже
+        в режиме link: восстановленный файл может быть изменен на месте
+        (база SQLite, дописываемый журнал), и объект кеша не должен меняться
+        вместе с ним.
+
+        Args:
+            blob_sha: SHA blob
+            file_path: Путь к файлу с содержимым blob
+        """
+        try:
+            size = os.path.getsize(file_path)
+        except OSError:
+            return
+        self._add(blob_sha, size, lambda tmp_path: shutil.copy2(file_path, tmp_path))
+
+    def add_bytes(self, blob_sha: str, data: bytes):
+        """
+        Добавление объекта из содержимого в памяти
+
+        Args:
+            blob_sha: SHA blob
+            data: Содержимое blob
+        """
+        def write(tmp_path: str):
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+
+        self._add(blob_sha, len(data), write)
+
+    def flush(self):
+        """Запись накопленных изменений в базу и вытеснение при переполнении"""
+        with self._lock:
+            pending = self._pending
+            self._pending = {}
+            self._pending_size = 0
+        if not pending:
+            return
+
+        with self._lock, self._db:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO blobs (sha, size, last_used) VALUES (?, ?, ?)",
+                [(sha, size, last_used) for sha, (size, last_used) in pending.items()]
+            )
+            # Другие процессы тоже пишут в кеш, поэтому размер считается по базе
+            total_size = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()[0]
+            if total_size <= self.max_size:
+                return
+
+            # Удаление давно не использованных объектов до 3/4 ограничения размера
+            evicted = []
+            for sha, size in self._db.execute("SELECT sha, size FROM blobs ORDER BY last_used"):
+                if total_size <= self.max_size * 3 // 4:
+                    break
+                evicted.append((sha,))
+                total_size -= size
+            for (sha,) in evicted:
+                try:
+                    os.remove(self._path(sha))
+                except OSError:
+                    pass
+            self._db.executemany("DELETE FROM blobs WHERE sha = ?", evicted)
+
+    def close(self):
+        """Запись накопленных изменений и закрытие базы"""
+        self.flush()
+        self._db.close()
+
+    def _path(self, blob_sha: str) -> str:
+        """Путь файла объекта по SHA"""
+        return os.path.join(self.directory, blob_sha[:2], blob_sha[2:])
+
+    def _place(self, source: str, destination: str, attributes: Optional[Dict] = None):
+        """Жесткая ссылка (в режиме link, если совпадают права и время) или копия файла"""
+        if self.link and (not attributes or attributes_match(os.stat(source), attributes)):
+            try:
+                os.link(source, destination)
+                return
+            except FileNotFoundError:
+                raise
+            except OSError:
+                # Другая файловая система или превышено число ссылок
+                pass
+        shutil.copyfile(source, destination)
+
+    def _add(self, blob_sha: str, size: int, write):
+        """Атомарная запись объекта функцией write(временный путь)"""
+        if size > self.max_size:
+            return
+        path = self._path(blob_sha)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            try:
+                write(tmp_path)
+                os.replace(tmp_path, path)
+            except OSError:
+                if os.path.lexists(tmp_path):
+                    os.remove(tmp_path)
+                return
+        with self._lock:
+            if blob_sha not in self._pending:
+                self._pending_size += size
+            self._pending[blob_sha] = (size, time.time())
+            overflow = self._pending_size > self.max_size // 4
+        # Во время долгого восстановления кеш не должен надолго превышать ограничение
+        if overflow:
+            self.flush()
+
+    def _record(self, blob_sha: str, size: Optional[int]):
+        """Учет попадания (с обновлением времени использования) или промаха"""
+        with self._lock:
+            if size is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._pending[blob_sha] = (size, time.time())
+
+
+def attributes_match(stat: os.stat_result, attributes: Dict) -> bool:
+    """
+    Совпадают ли права на выполнение и время изменения файла с записью манифеста
+
+    Args:
+        stat: Результат os.stat файла
+        attributes: Запись манифеста (mode, mtime)
+
+    Returns:
+        True, если восстановление прав и времени не изменит файл
+    """
+    executable = stat.st_mode & 0o111
+    if attributes.get("mode") == "100755" and executable != 0o111:
+        return False
+    if attributes.get("mode") == "100644" and executable:
+        return False
+    return "mtime" not in attributes or attributes["mtime"] == stat.st_mtime
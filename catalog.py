@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+Локальный каталог резервных копий в SQLite
+Каталог хранит путь, размер, SHA blob и коммит каждого файла репозитория,
+поэтому просмотр, поиск по маске и поиск копий, содержащих файл,
+выполняются без обращения к сети. Обновление инкрементальное: деревья git
+сравниваются по SHA, и запрашиваются только изменившиеся поддеревья
+"""
+
+import os
+import sqlite3
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS trees (
+    path TEXT PRIMARY KEY,
+    sha TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    sha TEXT NOT NULL,
+    mode TEXT NOT NULL,
+    commit_sha TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS files_sha ON files (sha);
+"""
+
+# Получение дерева git: (SHA дерева, рекурсивно) -> ответ API дерева
+TreeFetcher = Callable[[str, bool], Dict]
+
+
+class BackupCatalog:
+    """
+    Каталог файлов репозитория резервных копий на момент последнего коммита
+
+    Дерево обходится так же, как git diff-tree: поддерево, SHA которого не
+    изменился с прошлого обновления, пропускается целиком, новое поддерево
+    загружается одним рекурсивным запросом.
+    """
+
+    def __init__(self, db_path: str):
+        """
+        Открытие (или создание) каталога
+
+        Args:
+            db_path: Путь к файлу базы SQLite
+        """
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.executescript(_SCHEMA)
+
+    @property
+    def commit(self) -> Optional[str]:
+        """SHA последнего проиндексированного коммита"""
+        row = self._db.execute("SELECT value FROM meta WHERE key = 'commit'").fetchone()
+        return row[0] if row else None
+
+    def refresh(self, commit_sha: str, tree_sha: str, fetch_tree: TreeFetcher) -> Dict[str, int]:
+        """
+        Инкрементальное обновление каталога до указанного коммита
+
+        Args:
+            commit_sha: SHA коммита
+            tree_sha: SHA корневого дерева коммита
+            fetch_tree: Функция получения дерева git
+
+        Returns:
+            Статистика: число запрошенных деревьев, добавленных/измененных и удаленных файлов
+        """
+        stats = {"trees_fetched": 0, "files_updated": 0, "files_removed": 0}
+        if commit_sha == self.commit:
+            return stats
+
+        with self._lock, self._db:
+            self._sync_tree("", tree_sha, commit_sha, fetch_tree, stats)
+            self._db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('commit', ?)", (commit_sha,))
+        return stats
+
+    def list_files(self, prefix: str = "") -> List[Dict]:
+        """
+        Файлы под указанной директорией
+
+        Args:
+            prefix: Директория в облаке (пустая строка - весь репозиторий)
+
+        Returns:
+            Список файлов в порядке путей
+        """
+        prefix = prefix.strip('/')
+        if not prefix:
+            return self._query("SELECT * FROM files ORDER BY path")
+        return self._query("SELECT * FROM files WHERE path GLOB ? ORDER BY path",
+                           (f"{_escape_glob(prefix)}/*",))
+
+    def list_dir(self, path: str = "") -> Tuple[List[str], List[Dict]]:
+        """
+        Содержимое одного уровня директории
+
+        Args:
+            path: Директория в облаке (пустая строка - корень репозитория)
+
+        Returns:
+            Кортеж (пути поддиректорий, файлы) в порядке путей
+        """
+        path = path.strip('/')
+        prefix = f"{path}/" if path else ""
+        pattern = f"{_escape_glob(prefix)}*"
+        with self._lock:
+            dirs = [child for (child,) in self._db.execute(
+                "SELECT path FROM trees WHERE path GLOB ? ORDER BY path", (pattern,)
+            ) if child != path and '/' not in child[len(prefix):]]
+        files = [item for item in self._query("SELECT * FROM files WHERE path GLOB ? ORDER BY path", (pattern,))
+                 if '/' not in item["path"][len(prefix):]]
+        return dirs, files
+
+    def search(self, pattern: str) -> List[Dict]:
+        """
+        Поиск файлов по маске пути
+
+        Args:
+            pattern: Маска в синтаксисе GLOB (*, ?, [...]); '*' совпадает и с '/'
+
+        Returns:
+            Список найденных файлов в порядке путей
+        """
+        return self._query("SELECT * FROM files WHERE path GLOB ? ORDER BY path", (pattern,))
+
+    def find_by_sha(self, blob_sha: str) -> List[Dict]:
+        """
+        Файлы с указанным содержимым
+
+        Args:
+            blob_sha: SHA blob-объекта git
+
+        Returns:
+            Список файлов в порядке путей
+        """
+        return self._query("SELECT * FROM files WHERE sha = ? ORDER BY path", (blob_sha,))
+
+    def find_by_suffix(self, relative_path: str) -> List[Dict]:
+        """
+        Файлы, путь которых заканчивается указанным относительным путем
+
+        Args:
+            relative_path: Путь файла внутри резервной копии
+
+        Returns:
+            Список файлов в порядке путей
+        """
+        relative_path = relative_path.strip('/')
+        return self._query("SELECT * FROM files WHERE path = ? OR path GLOB ? ORDER BY path",
+                           (relative_path, f"*/{_escape_glob(relative_path)}"))
+
+    def close(self):
+        """Закрытие базы"""
+        self._db.close()
+
+    def _query(self, sql: str, params: tuple = ()) -> List[Dict]:
+        """Выполнение запроса к таблице files"""
+        with self._lock:
+            rows = self._db.execute(sql, params).fetchall()
+        return [
+            {"path": path, "size": size, "sha": sha, "mode": mode, "commit": commit_sha}
+            for path, size, sha, mode, commit_sha in rows
+        ]
+
+    def _sync_tree(self, path: str, tree_sha: str, commit_sha: str,
+                   fetch_tree: TreeFetcher, stats: Dict[str, int]):
+        """
+        Приведение записей поддерева к дереву с указанным SHA
+
+        Args:
+            path: Путь поддерева ("" - корень)
+            tree_sha: SHA дерева
+            commit_sha: SHA индексируемого коммита
+            fetch_tree: Функция получения дерева git
+            stats: Статистика, обновляется на месте
+        """
+        row = self._db.execute("SELECT sha FROM trees WHERE path = ?", (path,)).fetchone()
+        if row and row[0] == tree_sha:
+            return
+        prefix = f"{path}/" if path else ""
+
+        # Новое поддерево загружается целиком одним запросом
+        if not row:
+            tree = fetch_tree(tree_sha, True)
+            stats["trees_fetched"] += 1
+            if not tree.get("truncated"):
+                self._remove_subtree(path, stats)
+                for item in tree["tree"]:
+                    self._store_item(f"{prefix}{item['path']}", item, commit_sha, stats)
+                self._db.execute("INSERT OR REPLACE INTO trees (path, sha) VALUES (?, ?)", (path, tree_sha))
+                return
+
+        tree = fetch_tree(tree_sha, False)
+        stats["trees_fetched"] += 1
+        entries = {f"{prefix}{item['path']}": item for item in tree["tree"]}
+
+        # Удаляем то, чего больше нет на этом уровне
+        for child in self._children(path):
+            if child not in entries:
+                self._remove_subtree(child, stats)
+
+        for child, item in entries.items():
+            if item["type"] == "tree":
+                self._db.execute("DELETE FROM files WHERE path = ?", (child,))
+                self._sync_tree(child, item["sha"], commit_sha, fetch_tree, stats)
+            elif item["type"] == "blob":
+                self._remove_subtree(child, stats, files=False)
+                self._store_item(child, item, commit_sha, stats)
+        self._db.execute("INSERT OR REPLACE INTO trees (path, sha) VALUES (?, ?)", (path, tree_sha))
+
+    def _store_item(self, path: str, item: Dict, commit_sha: str, stats: Dict[str, int]):
+        """Запись элемента дерева: файла (если он изменился) или SHA поддерева"""
+        if item["type"] == "tree":
+            self._db.execute("INSERT OR REPLACE INTO trees (path, sha) VALUES (?, ?)", (path, item["sha"]))
+            return
+        if item["type"] != "blob":
+            return
+        row = self._db.execute("SELECT sha, mode FROM files WHERE path = ?", (path,)).fetchone()
+        if row == (item["sha"], item["mode"]):
+            return
+        self._db.execute(
+            "INSERT OR REPLACE INTO files (path, size, sha, mode, commit_sha) VALUES (?, ?, ?, ?, ?)",
+            (path, item.get("size") or 0, item["sha"], item["mode"], commit_sha)
+        )
+        stats["files_updated"] += 1
+
+    def _children(self, path: str) -> List[str]:
+        """Прямые потомки поддерева в каталоге (файлы и поддеревья)"""
+        prefix = f"{path}/" if path else ""
+        pattern = f"{_escape_glob(prefix)}*"
+        children = set()
+        for table in ("files", "trees"):
+            for (child,) in self._db.execute(f"SELECT path FROM {table} WHERE path GLOB ?", (pattern,)):
+                if child != path:
+                    children.add(prefix + child[len(prefix):].split('/', 1)[0])
+        return sorted(children)
+
+    def _remove_subtree(self, path: str, stats: Dict[str, int], files: bool = True):
+        """Удаление поддерева (и файла с тем же путем, если files=True)"""
+        pattern = f"{_escape_glob(path)}/*" if path else "*"
+        removed = self._db.execute("DELETE FROM files WHERE path GLOB ?", (pattern,)).rowcount
+        self._db.execute("DELETE FROM trees WHERE path = ? OR path GLOB ?", (path, pattern))
+        if files:
+            removed += self._db.execute("DELETE FROM files WHERE path = ?", (path,)).rowcount
+        stats["files_removed"] += removed
+
+
+def _escape_glob(text: str) -> str:
+    """Экранирование спецсимволов GLOB в литеральной части шаблона"""
+    return "".join(f"[{char}]" if char in "*?[" else char for char in text)
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Разбиение файлов на блоки по содержимому (content-defined chunking)
+Границы блоков зависят только от данных, поэтому вставка или изменение
+в середине файла меняет лишь соседние блоки, а остальные остаются прежними
+"""
+
+import re
+import zlib
+from itertools import islice
+from typing import BinaryIO, Iterator
+
+# Границы размера блока
+MIN_CHUNK_SIZE = 256 * 1024
+MAX_CHUNK_SIZE = 4 * 1024 * 1024
+
+# Размер окна, по которому вычисляется хеш кандидата на границу
+WINDOW_SIZE = 32
+
+# Байт-якорь: границей может стать только позиция сразу после него
+# (для серии подряд идущих якорей - только после последнего). Поиск
+# выполняется регулярным выражением на скорости C, хеш окна считается
+# только в найденных позициях, а не для каждого байта файла
+ANCHOR = b"\n"
+_CANDIDATE = re.compile(re.escape(ANCHOR) + b"(?!" + re.escape(ANCHOR) + b")")
+
+# Кандидат становится границей, если младшие биты хеша окна нулевые
+# (в среднем каждый 4096-й якорь, ~1MB для случайных данных)
+BOUNDARY_MASK = (1 << 12) - 1
+
+# Предел проверяемых кандидатов в одном блоке (во столько раз больше
+# ожидаемого числа). Для периодических данных хеш окна повторяется и
+# граница не находится - тогда блок режется по максимальному размеру,
+# не перебирая все якоря
+MAX_CANDIDATES_FACTOR = 16
+
+
+def find_boundary(data: bytes, min_size: int = MIN_CHUNK_SIZE,
+                  max_size: int = MAX_CHUNK_SIZE, mask: int = BOUNDARY_MASK) -> int:
+    """
+    Поиск конца первого блока в буфере
+
+    Args:
+        data: Буфер, начинающийся с начала блока
+        min_size: Минимальный размер блока
+        max_size: Максимальный размер блока
+        mask: Маска хеша окна (граница - в среднем каждый mask + 1 якорь)
+
+    Returns:
+        Длина первого блока
+    """
+    limit = min(len(data), max_size)
+    if limit <= min_size:
+        return limit
+
+    view = memoryview(data)
+    candidates = _CANDIDATE.finditer(data, max(min_size, WINDOW_SIZE), limit)
+    for match in islice(candidates, MAX_CANDIDATES_FACTOR * (mask + 1)):
+        end = match.end()
+        if not zlib.crc32(view[end - WINDOW_SIZE:end]) & mask:
+            return end
+
+    return limit
+
+
+def iter_chunks(f: BinaryIO, min_size: int = MIN_CHUNK_SIZE,
+                max_size: int = MAX_CHUNK_SIZE, mask: int = BOUNDARY_MASK) -> Iterator[bytes]:
+    """
+    Потоковое разбиение файла на блоки
+
+    В памяти находится не больше двух максимальных блоков независимо от
+    размера файла.
+
+    Args:
+        f: Файл, открытый в двоичном режиме
+        min_size: Минимальный размер блока
+        max_size: Максимальный размер блока
+        mask: Маска хеша окна, задающая средний размер блока
+
+    Returns:
+        Итератор блоков в порядке следования в файле
+    """
+    buffer = b""
+    while True:
+        while len(buffer) < max_size:
+            data = f.read(max_size)
+            if not data:
+                break
+            buffer += data
+
+        if not buffer:
+            return
+
+        cut = find_boundary(buffer, min_size, max_size, mask)
+        yield buffer[:cut]
+        buffer = buffer[cut:]
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Дельта-кодирование версий файла между резервными копиями
+Новая версия файла разбивается на мелкие блоки по содержимому (chunking.py)
+и сравнивается с подписью прежней версии - списком хешей и размеров ее
+блоков. Совпавшие блоки записываются ссылкой на смещение в прежней версии,
+остальные - данными. Подпись хранится в заголовке объекта дельты, поэтому
+для следующей копии прежняя версия не скачивается
+
+Объект дельты - строка JSON-заголовка (формат, размер и SHA результата,
+глубина цепочки, ссылка на базовый объект, операции, подпись), за которой
+следуют данные вставок в порядке операций. Объект глубины 0 не ссылается
+на базу и содержит файл целиком
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from typing import BinaryIO, Dict, List, Optional
+
+import chunking
+
+FORMAT = "delta-v1"
+
+# Границы размера блока: мельче, чем при хранении блоками, чтобы небольшое
+# изменение файла затрагивало мало данных
+MIN_BLOCK_SIZE = 4 * 1024
+MAX_BLOCK_SIZE = 64 * 1024
+
+# Граница - в среднем каждый 16-й якорь (~8KB для случайных данных)
+BOUNDARY_MASK = (1 << 4) - 1
+
+# Размер хеша блока в подписи (байт)
+BLOCK_HASH_SIZE = 16
+
+# Размер буфера при копировании данных
+COPY_BUFFER_SIZE = 1024 * 1024
+
+
+def block_hash(block: bytes) -> str:
+    """Хеш блока для подписи"""
+    return hashlib.blake2b(block, digest_size=BLOCK_HASH_SIZE).hexdigest()
+
+
+def encode(src: BinaryIO, out: BinaryIO, base: Optional[Dict] = None,
+           base_object: Optional[str] = None) -> Dict:
+    """
+    Запись объекта дельты файла относительно прежней версии
+
+    Args:
+        src: Файл новой версии, открытый в двоичном режиме
+        out: Файл, в который записывается объект дельты
+        base: Заголовок объекта прежней версии или None - записать файл целиком
+        base_object: SHA blob объекта прежней версии
+
+    Returns:
+        Заголовок записанного объекта
+    """
+    size = os.fstat(src.fileno()).st_size
+    file_sha = hashlib.sha1(f"blob {size}\0".encode('ascii'))
+
+    # Первое вхождение каждого блока прежней версии
+    base_blocks = {}
+    offset = 0
+    for digest, block_size in (base["signature"] if base else []):
+        base_blocks.setdefault(digest, (offset, block_size))
+        offset += block_size
+
+    # Операции [смещение в прежней версии, длина]; смещение -1 - вставка
+    # данных. Соседние операции одного вида объединяются
+    ops = []
+    signature = []
+    total = 0
+    with tempfile.SpooledTemporaryFile(max_size=COPY_BUFFER_SIZE) as inserts:
+        for block in chunking.iter_chunks(src, MIN_BLOCK_SIZE, MAX_BLOCK_SIZE, BOUNDARY_MASK):
+            file_sha.update(block)
+            digest = block_hash(block)
+            signature.append([digest, len(block)])
+            total += len(block)
+
+            match = base_blocks.get(digest)
+            if match and match[1] == len(block):
+                offset = match[0]
+            else:
+                offset = -1
+                inserts.write(block)
+
+            if ops and (ops[-1][0] == offset == -1
+                        or offset >= 0 and ops[-1][0] >= 0 and sum(ops[-1]) == offset):
+                ops[-1][1] += len(block)
+            else:
+                ops.append([offset, len(block)])
+
+        if total != size:
+            raise IOError("Файл изменился во время загрузки")
+
+        header = {
+            "format": FORMAT,
+            "size": size,
+            "sha": file_sha.hexdigest(),
+            "depth": base["depth"] + 1 if base else 0,
+            "base": {"object": base_object, "sha": base["sha"]} if base else None,
+            "inserted": sum(length for offset, length in ops if offset < 0),
+            "ops": ops,
+            "signature": signature
+        }
+        out.write(json.dumps(header, separators=(",", ":")).encode('ascii') + b"\n")
+        inserts.seek(0)
+        shutil.copyfileobj(inserts, out, COPY_BUFFER_SIZE)
+    return header
+
+
+def parse_header(line: bytes) -> Dict:
+    """
+    Разбор строки заголовка объекта дельты
+
+    Args:
+        line: Первая строка объекта
+
+    Returns:
+        Заголовок объекта
+    """
+    header = json.loads(line)
+    if header.get("format") != FORMAT:
+        raise ValueError(f"Неизвестный формат объекта дельты: {header.get('format')}")
+    return header
+
+
+def read_header(f: BinaryIO) -> Dict:
+    """
+    Чтение заголовка объекта дельты; файл остается на начале данных
+
+    Args:
+        f: Объект дельты, открытый в двоичном режиме
+
+    Returns:
+        Заголовок объекта
+    """
+    return parse_header(f.readline())
+
+
+def apply(header: Dict, data: BinaryIO, base: Optional[BinaryIO], out: BinaryIO):
+    """
+    Сборка версии файла по объекту дельты с проверкой SHA результата
+
+    Args:
+        header: Заголовок объекта
+        data: Объект дельты, позиция - начало данных вставок
+        base: Собранная прежняя версия (None для объекта глубины 0)
+        out: Файл, в который записывается результат
+    """
+    file_sha = hashlib.sha1(f"blob {header['size']}\0".encode('ascii'))
+    for offset, length in header["ops"]:
+        if offset < 0:
+            source = data
+        else:
+            source = base
+            source.seek(offset)
+        while length:
+            block = source.read(min(length, COPY_BUFFER_SIZE))
+            if not block:
+                raise IOError("Объект дельты или прежняя версия файла повреждены")
+            out.write(block)
+            file_sha.update(block)
+            length -= len(block)
+
+    if file_sha.hexdigest() != header["sha"]:
+        raise IOError("Контрольная сумма собранного файла не совпадает")
+
+
+def rebuild(objects: List[str], out: BinaryIO, base: Optional[BinaryIO] = None):
+    """
+    Сборка файла по цепочке объектов дельты
+
+    Промежуточные версии записываются во временные файлы рядом с объектами
+    и удаляются сразу после сборки следующей версии.
+
+    Args:
+        objects: Пути к объектам цепочки от самого старого к новому
+        out: Файл, в который записывается последняя версия
+        base: Собранная версия, на которую ссылается самый старый объект
+            (None, если это объект глубины 0); закрывается после сборки
+    """
+    try:
+        for number, object_path in enumerate(objects):
+            if number == len(objects) - 1:
+                target = out
+            else:
+                target = tempfile.TemporaryFile(dir=os.path.dirname(object_path))
+            with open(object_path, 'rb') as data:
+                apply(read_header(data), data, base, target)
+            if base:
+                base.close()
+            base = target if target is not out else None
+    finally:
+        if base:
+            base.close()
@@ -0,0 +1,590 @@
+#!/usr/bin/env python3
+"""
+Локальная замена GitHub API для проверки и замеров без сети
+Сервер реализует эндпоинты, которые использует менеджер: /user, создание и
+получение репозитория, contents, Git Data API (blobs, trees, commits, refs)
+и /rate_limit. Объекты хранятся в памяти и адресуются по SHA так же, как в
+git. Задержка ответа и лимит запросов настраиваются.
+
+Запуск отдельным процессом:
+    python fake_github.py --port 8765 --latency 0.05
+    GITHUB_TOKEN=test GITHUB_API_URL=http://127.0.0.1:8765 python main.py
+"""
+
+import argparse
+import base64
+import hashlib
+import json
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterator, List, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlparse
+
+# Элемент дерева: (режим, тип, SHA)
+TreeEntry = Tuple[str, str, str]
+
+DEFAULT_BRANCH = "main"
+
+
+def _object_sha(kind: str, data: bytes) -> str:
+    """SHA-1 объекта git"""
+    return hashlib.sha1(f"{kind} {len(data)}\0".encode('ascii') + data).hexdigest()
+
+
+class FakeGitHubStore:
+    """Репозитории, объекты git, лимит и статистика запросов fake-сервера"""
+
+    def __init__(self, login: str, rate_limit: int, rate_window: float):
+        """
+        Args:
+            login: Логин пользователя токена
+            rate_limit: Число запросов за окно
+            rate_window: Длительность окна лимита в секундах
+        """
+        self.login = login
+        self.lock = threading.RLock()
+        self.objects: Dict[str, Tuple[str, object]] = {}
+        self.refs: Dict[Tuple[str, str], str] = {}
+        self.repos = set()
+        self.rate_limit = rate_limit
+        self.rate_window = rate_window
+        self.rate_reset = time.time() + rate_window
+        self.rate_used = 0
+        self.calls = Counter()
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.faults: List[Tuple[str, int, Dict[str, str]]] = []
+
+    def take_rate(self) -> bool:
+        """Учет запроса в лимите; False, если лимит исчерпан"""
+        now = time.time()
+        if now >= self.rate_reset:
+            self.rate_reset = now + self.rate_window
+            self.rate_used = 0
+        if self.rate_used >= self.rate_limit:
+            return False
+        self.rate_used += 1
+        return True
+
+    def rate_headers(self) -> Dict[str, str]:
+        """Заголовки X-RateLimit-* по текущему состоянию лимита"""
+        return {
+            "X-RateLimit-Limit": str(self.rate_limit),
+            "X-RateLimit-Remaining": str(max(0, self.rate_limit - self.rate_used)),
+            "X-RateLimit-Reset": str(int(self.rate_reset)),
+            "X-RateLimit-Used": str(self.rate_used)
+        }
+
+    def put_blob(self, data: bytes) -> str:
+        sha = _object_sha("blob", data)
+        self.objects[sha] = ("blob", data)
+        return sha
+
+    def put_tree(self, entries: Dict[str, TreeEntry]) -> str:
+        # SHA дерева вычисляется по тем же правилам, что и в git
+        raw = b""
+        for name in sorted(entries, key=lambda n: n + "/" if entries[n][1] == "tree" else n):
+            mode, _, sha = entries[name]
+            raw += f"{mode.lstrip('0')} {name}".encode('utf-8') + b"\0" + bytes.fromhex(sha)
+        sha = _object_sha("tree", raw)
+        self.objects[sha] = ("tree", dict(entries))
+        return sha
+
+    def put_commit(self, tree: str, parents: List[str], message: str) -> str:
+        commit = {"tree": tree, "parents": parents, "message": message,
+                  "date": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())}
+        sha = _object_sha("commit", json.dumps(commit, sort_keys=True).encode('utf-8'))
+        self.objects[sha] = ("commit", commit)
+        return sha
+
+    def resolve_rev(self, full_name: str, rev: str) -> str:
+        """SHA коммита по имени ветки, тега или SHA коммита (KeyError, если не найден)"""
+        for ref in (f"refs/heads/{rev}", f"refs/tags/{rev}"):
+            if (full_name, ref) in self.refs:
+                return self.refs[(full_name, ref)]
+        if self.objects.get(rev, ("",))[0] == "commit":
+            return rev
+        raise KeyError(rev)
+
+    def is_ancestor(self, ancestor: str, commit: str) -> bool:
+        """Является ли ancestor предком commit (или самим commit)"""
+        pending = [commit]
+        seen = set()
+        while pending:
+            sha = pending.pop()
+            if sha == ancestor:
+                return True
+            if sha in seen or sha not in self.objects:
+                continue
+            seen.add(sha)
+            pending.extend(self.objects[sha][1].get("parents", []))
+        return False
+
+    def tree_set(self, tree_sha: Optional[str], path: str, value: Optional[TreeEntry]) -> Optional[str]:
+        """
+        Дерево с замененным (value=None - удаленным) элементом по пути
+
+        Returns:
+            SHA нового дерева или None, если дерево стало пустым
+        """
+        entries = dict(self.objects[tree_sha][1]) if tree_sha else {}
+        head, _, rest = path.partition("/")
+        if rest:
+            sub = entries.get(head)
+            new_sub = self.tree_set(sub[2] if sub and sub[1] == "tree" else None, rest, value)
+            if new_sub is None:
+                entries.pop(head, None)
+            else:
+                entries[head] = ("040000", "tree", new_sub)
+        elif value is None:
+            entries.pop(head, None)
+        else:
+            entries[head] = value
+        return self.put_tree(entries) if entries else None
+
+    def resolve(self, tree_sha: str, path: str) -> Optional[TreeEntry]:
+        """Элемент дерева по пути (пустой путь - само дерево)"""
+        current = ("040000", "tree", tree_sha)
+        for part in filter(None, path.strip("/").split("/")):
+            if current[1] != "tree":
+                return None
+            current = self.objects[current[2]][1].get(part)
+            if current is None:
+                return None
+        return current
+
+    def walk(self, tree_sha: str, prefix: str = "") -> Iterator[Tuple[str, str, str, str]]:
+        """Рекурсивный обход дерева: (путь, режим, тип, SHA)"""
+        for name, (mode, kind, sha) in sorted(self.objects[tree_sha][1].items()):
+            yield prefix + name, mode, kind, sha
+            if kind == "tree":
+                yield from self.walk(sha, f"{prefix}{name}/")
+
+
+class FakeGitHubHandler(BaseHTTPRequestHandler):
+    """Обработчик запросов fake-сервера (HTTP/1.1 с keep-alive)"""
+
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    store: FakeGitHubStore = None
+    base_url = ""
+    latency = 0.0
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self._route("GET")
+
+    def do_POST(self):
+        self._route("POST")
+
+    def do_PATCH(self):
+        self._route("PATCH")
+
+    def do_PUT(self):
+        self._route("PUT")
+
+    def do_DELETE(self):
+        self._route("DELETE")
+
+    def _send(self, status: int, obj=None, raw: Optional[bytes] = None, headers: Optional[Dict[str, str]] = None):
+        body = raw if raw is not None else (json.dumps(obj).encode('utf-8') if obj is not None else b"")
+        headers = dict(headers or {})
+        store = self.store
+        if self.command == "GET" and status == 200:
+            # Условные запросы: ответ 304 не расходует лимит, как и в GitHub
+            etag = '"%s"' % hashlib.md5(body).hexdigest()
+            headers["ETag"] = etag
+            if self.headers.get("If-None-Match") == etag:
+                status, body = 304, b""
+                with store.lock:
+                    store.calls["304"] += 1
+                    store.rate_used = max(0, store.rate_used - 1)
+        self.send_response(status)
+        self.send_header("Content-Type", "application/octet-stream" if raw is not None else "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        with store.lock:
+            rate_headers = store.rate_headers()
+            store.bytes_out += len(body)
+        for key, value in {**rate_headers, **headers}.items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_body(self) -> bytes:
+        if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+            data = b""
+            while True:
+                size = int(self.rfile.readline().strip(), 16)
+                if size == 0:
+                    self.rfile.readline()
+                    break
+                data += self.rfile.read(size)
+                self.rfile.readline()
+        else:
+            data = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        with self.store.lock:
+            self.store.bytes_in += len(data)
+        return data
+
+    def _json_body(self) -> Dict:
+        return json.loads(self._body or b"{}")
+
+    def _route(self, verb: str):
+        self._body = self._read_body() if verb != "GET" else b""
+        if self.latency:
+            time.sleep(self.latency)
+
+        url = urlparse(self.path)
+        path = unquote(url.path)
+        store = self.store
+        if path.startswith("/_fake/"):
+            return self._control(verb, path)
+
+        endpoint = f"{verb} " + re.sub(r"^/repos/[^/]+/[^/]+", "/repos/{repo}", path)
+        endpoint = re.sub(r"/git/(blobs|trees|commits)/.+$", r"/git/\1/{sha}", endpoint)
+        endpoint = re.sub(r"/contents/.+$", "/contents/{path}", endpoint)
+        with store.lock:
+            store.calls[endpoint] += 1
+            fault = next((f for f in store.faults if f[0] in path), None)
+            if fault:
+                store.faults.remove(fault)
+            limited = not store.take_rate()
+        if fault:
+            message = "You have exceeded a secondary rate limit" if fault[1] in (403, 429) else "Server Error"
+            return self._send(fault[1], {"message": message}, headers=fault[2])
+        if limited:
+            return self._send(403, {"message": "API rate limit exceeded"})
+
+        with store.lock:
+            try:
+                return self._dispatch(verb, path, parse_qs(url.query))
+            except KeyError:
+                return self._send(404, {"message": "Not Found"})
+
+    def _control(self, verb: str, path: str):
+        """Служебные эндпоинты для замеров из другого процесса"""
+        store = self.store
+        with store.lock:
+            if path == "/_fake/stats" and verb == "GET":
+                return self._send(200, {"calls": dict(store.calls), "bytes_in": store.bytes_in,
+                                        "bytes_out": store.bytes_out, "rate_used": store.rate_used})
+            if path == "/_fake/reset" and verb == "POST":
+                store.calls.clear()
+                store.bytes_in = store.bytes_out = 0
+                return self._send(200, {})
+        return self._send(404, {"message": "Not Found"})
+
+    def _dispatch(self, verb: str, path: str, query: Dict[str, List[str]]):
+        store = self.store
+        if path == "/user" and verb == "GET":
+            return self._send(200, {"login": store.login, "url": f"{self.base_url}/users/{store.login}"})
+        if path == "/rate_limit":
+            core = {"limit": store.rate_limit, "remaining": max(0, store.rate_limit - store.rate_used),
+                    "reset": int(store.rate_reset), "used": store.rate_used}
+            return self._send(200, {"resources": {"core": core}, "rate": core})
+        if path == "/user/repos" and verb == "POST":
+            full_name = f"{store.login}/{self._json_body()['name']}"
+            if full_name in store.repos:
+                return self._send(422, {"message": "name already exists on this account"})
+            tree = store.put_tree({"README.md": ("100644", "blob", store.put_blob(b"# Backups\n"))})
+            store.refs[(full_name, f"refs/heads/{DEFAULT_BRANCH}")] = store.put_commit(tree, [], "Initial commit")
+            store.repos.add(full_name)
+            return self._send(201, self._repo_json(full_name))
+
+        match = re.match(r"^/repos/([^/]+/[^/]+)(.*)$", path)
+        if not match or match.group(1) not in store.repos:
+            return self._send(404, {"message": "Not Found"})
+        full_name, rest = match.groups()
+        repo_url = f"{self.base_url}/repos/{full_name}"
+
+        if rest == "":
+            return self._send(200, self._repo_json(full_name))
+        if rest.startswith("/git/ref"):
+            return self._refs(verb, full_name, rest, repo_url)
+        if rest.startswith("/git/blobs"):
+            return self._blobs(verb, rest, repo_url)
+        if rest.startswith("/git/trees"):
+            return self._trees(verb, full_name, rest, query, repo_url)
+        if rest == "/git/commits" and verb == "POST":
+            data = self._json_body()
+            sha = store.put_commit(data["tree"], data["parents"], data["message"])
+            return self._send(201, self._commit_json(repo_url, sha))
+        if rest.startswith("/git/commits/") and verb == "GET":
+            return self._send(200, self._commit_json(repo_url, rest.rsplit("/", 1)[1]))
+        if rest.startswith("/contents"):
+            return self._contents(verb, full_name, rest[len("/contents"):].strip("/"), query, repo_url)
+        return self._send(404, {"message": "Not Found"})
+
+    def _refs(self, verb: str, full_name: str, rest: str, repo_url: str):
+        store = self.store
+        if verb == "POST" and rest == "/git/refs":
+            data = self._json_body()
+            if (full_name, data["ref"]) in store.refs:
+                return self._send(422, {"message": "Reference already exists"})
+            store.refs[(full_name, data["ref"])] = data["sha"]
+            ref = data["ref"]
+        else:
+            ref = "refs/" + rest.split("/", 3)[3] if rest.count("/") >= 3 else ""
+            if (full_name, ref) not in store.refs:
+                return self._send(404, {"message": "Not Found"})
+            if verb == "PATCH":
+                data = self._json_body()
+                if not data.get("force") and not store.is_ancestor(store.refs[(full_name, ref)], data["sha"]):
+                    return self._send(422, {"message": "Update is not a fast forward"})
+                store.refs[(full_name, ref)] = data["sha"]
+            elif verb == "DELETE":
+                del store.refs[(full_name, ref)]
+                return self._send(204)
+        sha = store.refs[(full_name, ref)]
+        return self._send(200 if verb != "POST" else 201, {
+            "ref": ref, "url": f"{repo_url}/git/{ref}",
+            "object": {"sha": sha, "type": "commit", "url": f"{repo_url}/git/commits/{sha}"}
+        })
+
+    def _blobs(self, verb: str, rest: str, repo_url: str):
+        store = self.store
+        if verb == "POST":
+            data = self._json_body()
+            content = (base64.b64decode(data["content"]) if data.get("encoding") == "base64"
+                       else data["content"].encode('utf-8'))
+            sha = store.put_blob(content)
+            return self._send(201, {"sha": sha, "url": f"{repo_url}/git/blobs/{sha}"})
+        sha = rest.rsplit("/", 1)[1]
+        kind, content = store.objects[sha]
+        if kind != "blob":
+            return self._send(404, {"message": "Not Found"})
+        if "raw" in (self.headers.get("Accept") or ""):
+            return self._send(200, raw=content)
+        return self._send(200, {"sha": sha, "size": len(content), "encoding": "base64",
+                                "content": base64.b64encode(content).decode('ascii'),
+                                "url": f"{repo_url}/git/blobs/{sha}"})
+
+    def _trees(self, verb: str, full_name: str, rest: str, query: Dict[str, List[str]], repo_url: str):
+        store = self.store
+        if verb == "POST":
+            data = self._json_body()
+            tree = data.get("base_tree")
+            for element in data["tree"]:
+                if element.get("sha", "") is None:
+                    tree = store.tree_set(tree, element["path"], None)
+                else:
+                    sha = element.get("sha") or store.put_blob(element["content"].encode('utf-8'))
+                    tree = store.tree_set(tree, element["path"], (element["mode"], element["type"], sha))
+            return self._send(201, self._tree_json(repo_url, tree or store.put_tree({}), False))
+
+        sha = rest.split("/", 3)[3]
+        if ":" in sha:
+            # Выражение "<ревизия>:<путь>" (ветка, тег или SHA коммита)
+            rev, _, path = sha.partition(":")
+            commit = store.resolve_rev(full_name, rev)
+            entry = store.resolve(store.objects[commit][1]["tree"], path)
+            if entry is None:
+                return self._send(404, {"message": "Not Found"})
+            sha = entry[2]
+        elif (full_name, f"refs/heads/{sha}") in store.refs:
+            sha = store.objects[store.refs[(full_name, f"refs/heads/{sha}")]][1]["tree"]
+        if store.objects.get(sha, ("",))[0] != "tree":
+            return self._send(404, {"message": "Not Found"})
+        recursive = query.get("recursive", ["0"])[0] not in ("0", "false")
+        return self._send(200, self._tree_json(repo_url, sha, recursive))
+
+    def _contents(self, verb: str, full_name: str, path: str, query: Dict[str, List[str]], repo_url: str):
+        store = self.store
+        data = self._json_body() if verb != "GET" else {}
+        # Чтение - из любой ревизии (?ref=), изменение - в ветку из тела запроса
+        rev = query.get("ref", [data.get("branch") or DEFAULT_BRANCH])[0]
+        ref = f"refs/heads/{rev}"
+        head = store.resolve_rev(full_name, rev) if verb == "GET" else store.refs[(full_name, ref)]
+        root = store.objects[head][1]["tree"]
+        entry = store.resolve(root, path)
+
+        if verb == "GET":
+            if entry is None:
+                return self._send(404, {"message": "Not Found"})
+            if entry[1] == "tree":
+                return self._send(200, [
+                    self._content_json(repo_url, f"{path}/{name}".strip("/"), kind, sha, False)
+                    for name, (mode, kind, sha) in sorted(store.objects[entry[2]][1].items())
+                ])
+            if "raw" in (self.headers.get("Accept") or ""):
+                return self._send(200, raw=store.objects[entry[2]][1])
+            return self._send(200, self._content_json(repo_url, path, "blob", entry[2], True))
+
+        if verb == "PUT":
+            if entry is not None and data.get("sha") != entry[2]:
+                return self._send(409 if "sha" in data else 422, {"message": "sha wasn't supplied or does not match"})
+            sha = store.put_blob(base64.b64decode(data["content"]))
+            tree = store.tree_set(root, path, ("100644", "blob", sha))
+            status = 201 if entry is None else 200
+        elif verb == "DELETE":
+            if entry is None:
+                return self._send(404, {"message": "Not Found"})
+            tree = store.tree_set(root, path, None) or store.put_tree({})
+            sha, status = None, 200
+        else:
+            return self._send(404, {"message": "Not Found"})
+        commit = store.put_commit(tree, [head], data["message"])
+        store.refs[(full_name, ref)] = commit
+        content = self._content_json(repo_url, path, "blob", sha, False) if sha else None
+        return self._send(status, {"content": content, "commit": self._commit_json(repo_url, commit)})
+
+    def _repo_json(self, full_name: str) -> Dict:
+        owner, name = full_name.split("/")
+        return {
+            "id": abs(hash(full_name)) % 10 ** 9, "name": name, "full_name": full_name,
+            "url": f"{self.base_url}/repos/{full_name}", "html_url": f"{self.base_url}/{full_name}",
+            "default_branch": DEFAULT_BRANCH, "private": True, "description": "Fake repository",
+            "created_at": "2024-01-01T00:00:00Z", "updated_at": "2024-01-01T00:00:00Z",
+            "size": 0, "language": None,
+            "owner": {"login": owner, "url": f"{self.base_url}/users/{owner}"}
+        }
+
+    def _tree_json(self, repo_url: str, sha: str, recursive: bool) -> Dict:
+        store = self.store
+        if recursive:
+            items = list(store.walk(sha))
+        else:
+            items = [(name, mode, kind, item_sha) for name, (mode, kind, item_sha) in sorted(store.objects[sha][1].items())]
+        tree = []
+        for path, mode, kind, item_sha in items:
+            element = {"path": path, "mode": mode, "type": kind, "sha": item_sha,
+                       "url": f"{repo_url}/git/{kind}s/{item_sha}"}
+            if kind == "blob":
+                element["size"] = len(store.objects[item_sha][1])
+            tree.append(element)
+        return {"sha": sha, "url": f"{repo_url}/git/trees/{sha}", "tree": tree, "truncated": False}
+
+    def _commit_json(self, repo_url: str, sha: str) -> Dict:
+        commit = self.store.objects[sha][1]
+        person = {"name": "Fake", "email": "fake@example.com", "date": commit["date"]}
+        return {
+            "sha": sha, "url": f"{repo_url}/git/commits/{sha}", "message": commit["message"],
+            "tree": {"sha": commit["tree"], "url": f"{repo_url}/git/trees/{commit['tree']}"},
+            "parents": [{"sha": parent, "url": f"{repo_url}/git/commits/{parent}"} for parent in commit["parents"]],
+            "author": person, "committer": person
+        }
+
+    def _content_json(self, repo_url: str, path: str, kind: str, sha: str, with_content: bool) -> Dict:
+        item = {"name": path.rsplit("/", 1)[-1], "path": path, "sha": sha,
+                "type": "dir" if kind == "tree" else "file", "size": 0,
+                "url": f"{repo_url}/contents/{path}", "git_url": f"{repo_url}/git/{kind}s/{sha}"}
+        if kind == "blob":
+            content = self.store.objects[sha][1]
+            item["size"] = len(content)
+            if with_content:
+                item["encoding"] = "base64"
+                item["content"] = base64.b64encode(content).decode('ascii')
+        return item
+
+
+class _HTTPServer(ThreadingHTTPServer):
+    """HTTP-сервер, не печатающий разрывы соединений клиентом"""
+
+    def handle_error(self, request, client_address):
+        # Клиент может закрыть соединение, не дочитав ответ (например,
+        # после заголовка объекта дельты) - это не ошибка сервера
+        if isinstance(sys.exc_info()[1], ConnectionError):
+            return
+        super().handle_error(request, client_address)
+
+
+class FakeGitHubServer:
+    """
+    Fake-сервер GitHub API в фоновом потоке
+
+    Пример:
+        with FakeGitHubServer(latency=0.02) as server:
+            manager = GitHubCloudManager("test", api_url=server.url)
+    """
+
+    def __init__(self, latency: float = 0.0, rate_limit: int = 5000, rate_window: float = 3600.0,
+                 host: str = "127.0.0.1", port: int = 0, login: str = "tester"):
+        """
+        Args:
+            latency: Задержка перед каждым ответом в секундах
+            rate_limit: Число запросов за окно лимита
+            rate_window: Длительность окна лимита в секундах
+            host: Адрес для прослушивания
+            port: Порт (0 - любой свободный)
+            login: Логин пользователя токена
+        """
+        self.store = FakeGitHubStore(login, rate_limit, rate_window)
+        handler = type("Handler", (FakeGitHubHandler,), {"store": self.store, "latency": latency})
+        self._server = _HTTPServer((host, port), handler)
+        self._server.daemon_threads = True
+        self.url = f"http://{host}:{self._server.server_address[1]}"
+        handler.base_url = self.url
+        self._thread: Optional[threading.Thread] = None
+
+    def __enter__(self) -> "FakeGitHubServer":
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def start(self) -> "FakeGitHubServer":
+        """Запуск сервера в фоновом потоке"""
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        """Запуск сервера в текущем потоке"""
+        self._server.serve_forever()
+
+    def stop(self):
+        """Остановка сервера"""
+        self._server.shutdown()
+        self._server.server_close()
+
+    def stats(self) -> Dict:
+        """Число запросов по эндпоинтам и переданные байты"""
+        with self.store.lock:
+            return {"calls": dict(self.store.calls), "bytes_in": self.store.bytes_in,
+                    "bytes_out": self.store.bytes_out, "rate_used": self.store.rate_used}
+
+    def reset_stats(self):
+        """Обнуление статистики запросов"""
+        with self.store.lock:
+            self.store.calls.clear()
+            self.store.bytes_in = self.store.bytes_out = 0
+
+    def add_fault(self, status: int, path: str = "", headers: Optional[Dict[str, str]] = None, count: int = 1):
+        """
+        Ответ с ошибкой на следующие запросы, путь которых содержит path
+
+        Args:
+            status: Статус ответа (например, 502 или 429)
+            path: Фрагмент пути запроса
+            headers: Дополнительные заголовки (например, Retry-After)
+            count: Число таких ответов
+        """
+        with self.store.lock:
+            self.store.faults.extend([(path, status, dict(headers or {}))] * count)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Локальная замена GitHub API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="задержка ответа в секундах")
+    parser.add_argument("--rate-limit", type=int, default=5000, help="запросов за окно")
+    parser.add_argument("--rate-window", type=float, default=3600.0, help="окно лимита в секундах")
+    args = parser.parse_args()
+
+    server = FakeGitHubServer(args.latency, args.rate_limit, args.rate_window, args.host, args.port)
+    print(f"Fake GitHub API: {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -4,76 +4,320 @@ GitHub Cloud Manager - интеграция с облачными сервиса
 Модуль для управления файлами через GitHub API
 """
 
+from __future__ import annotations
+
+import importlib.util
 import os
 import json
-import base64
+import sys
+import tempfile
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
-from typing import List, Dict, Optional, Tuple
+from typing import BinaryIO, Callable, Iterable, Iterator, List, Dict, Optional, Tuple, Union
 from pathlib import Path
-from github import Github, GithubException, InputGitTreeElement
-from dotenv import load_dotenv
+from urllib.parse import quote
 from colorama import Fore, Style, init
-from tqdm import tqdm
 import hashlib
+import chunking
+import delta_encoding
+import snapshots
+from backup_format import (
+    CHUNK_INDEX_SUFFIX, DELTA_SUFFIX, STORAGE_SUFFIXES,
+    Base64JsonBody, PathFilter, add_plan_item, apply_file_attributes, git_blob_sha, git_file_mode,
+    hash_file, merge_manifest, part_file, reject_unsafe_paths, restore_plan_from_manifest,
+    strip_storage_suffix, try_hash_file
+)
+from blob_cache import BlobCache
+from catalog import BackupCatalog
+from http_cache import ETagCache
+from journal import BackupJournal
+from metrics import Metrics, instrumented, timed_phase
+from repo_cache import RepoCache
+from scanner import HashCache, scan_files
+from scheduler import RequestScheduler
+
+
+def _lazy_import(name: str):
+    """
+    Модуль, который загружается при первом обращении к его атрибутам
+    
+    PyGithub, requests и tqdm импортируются сотни миллисекунд, а короткие
+    команды (список копий из каталога, запуск без изменений) их не используют.
+    
+    Args:
+        name: Имя модуля
+        
+    Returns:
+        Объект модуля
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
+
+
+github = _lazy_import("github")
+requests = _lazy_import("requests")
+tqdm = _lazy_import("tqdm")
+
+# Адрес GitHub REST API по умолчанию (переопределяется GITHUB_API_URL,
+# например для GitHub Enterprise или локального fake_github.py)
+API_URL = "https://api.github.com"
+
+# Максимальное число элементов в одном запросе создания дерева (Git Data API)
+TREE_CHUNK_SIZE = 1000
+
+# Число параллельных потоков для сетевых операций по умолчанию
+DEFAULT_WORKERS = 16
+
+# Размер блока при потоковом скачивании файлов
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+# Таймаут HTTP-запросов, выполняемых напрямую (без PyGithub), в секундах
+HTTP_TIMEOUT = 60
+
+# Директория локальных кешей по умолчанию (переопределяется CLOUD_BACKUP_CACHE_DIR)
+CACHE_DIR = "~/.cache/cloud-backup"
+
+# Ограничение размера кеша ответов API с ETag
+HTTP_CACHE_MAX_SIZE = 64 * 1024 * 1024
+
+# Ограничение размера локального кеша содержимого blob по умолчанию
+# (переопределяется CLOUD_BACKUP_BLOB_CACHE_SIZE; 0 - кеш отключен)
+BLOB_CACHE_MAX_SIZE = 0
+
+# Файлы больше этого размера в режиме chunked хранятся блоками
+CHUNKING_THRESHOLD = 16 * 1024 * 1024
+
+# Общее для всех копий хранилище блоков (адресация по SHA blob)
+CHUNK_STORE_DIR = ".chunks"
+
+# Файлы больше этого размера в режиме delta хранятся дельтой относительно
+# версии в предыдущей копии
+DELTA_THRESHOLD = 1024 * 1024
+
+# Максимальная длина цепочки дельт: следующая версия хранится целиком
+DELTA_MAX_DEPTH = 10
+
+# Файлы меньше этого размера в режиме packed упаковываются в общие пакеты
+PACK_FILE_THRESHOLD = 4 * 1024
+
+# Целевой размер пакета до сжатия
+PACK_TARGET_SIZE = 4 * 1024 * 1024
+
+# Директория пакетов и индекса внутри резервной копии
+PACK_DIR = ".packs"
+PACK_INDEX_NAME = "index.json"
+
+# Манифест резервной копии (JSON Lines): заголовок и по строке на файл
+MANIFEST_NAME = "manifest.jsonl"
+MANIFEST_FORMAT = "manifest-v1"
+
+
+_environment = None
+
+
+def load_environment() -> Dict[str, any]:
+    """
+    Загрузка переменных окружения из .env и инициализация цветного вывода
+    
+    Выполняется один раз при создании первого менеджера, а не при импорте
+    модуля, поэтому импорт не читает файлы и не меняет sys.stdout.
+    
+    Returns:
+        Настройки из окружения: api_url, cache_dir, blob_cache_size
+    """
+    global _environment
+    if _environment is None:
+        from dotenv import load_dotenv
+        
+        load_dotenv()
+        init(autoreset=True)
+        _environment = {
+            "api_url": os.getenv("GITHUB_API_URL", API_URL),
+            "cache_dir": os.path.expanduser(os.getenv("CLOUD_BACKUP_CACHE_DIR", CACHE_DIR)),
+            "blob_cache_size": int(os.getenv("CLOUD_BACKUP_BLOB_CACHE_SIZE", str(BLOB_CACHE_MAX_SIZE)))
+        }
+    return _environment
 
-# Инициализация colorama для цветного вывода
-init(autoreset=True)
 
-# Загрузка переменных окружения
-load_dotenv()
+class _LazyRepo:
+    """
+    Репозиторий по сохраненным сведениям без запроса к API
+    
+    Поля из RepoCache (id, full_name, url, default_branch и т.д.) доступны
+    сразу, остальные атрибуты и методы берутся из объекта репозитория
+    PyGithub, который создается при первом обращении к ним.
+    """
+    
+    def __init__(self, info: Dict, factory: Callable[[], any]):
+        """
+        Args:
+            info: Сведения о репозитории (поля REPO_FIELDS)
+            factory: Функция, создающая объект репозитория PyGithub
+        """
+        self._repo = None
+        self._factory = factory
+        self.info = info
+        self.id = info["id"]
+        self.name = info["name"]
+        self.full_name = info["full_name"]
+        self.url = info["url"]
+        self.html_url = info["html_url"]
+        self.default_branch = info["default_branch"]
+        self.private = info["private"]
+    
+    def __getattr__(self, name: str):
+        if name.startswith("__") or name in ("_repo", "_factory"):
+            raise AttributeError(name)
+        if self._repo is None:
+            self._repo = self._factory()
+        return getattr(self._repo, name)
 
 
 class GitHubCloudManager:
     """Класс для управления облачными хранилищами через GitHub API"""
 
-    def __init__(self, github_token: Optional[str] = None):
+    def __init__(self, github_token: Optional[str] = None, max_concurrency: int = DEFAULT_WORKERS,
+                 cache_dir: Optional[str] = None, api_url: Optional[str] = None,
+                 blob_cache_size: Optional[int] = None, blob_cache_link: bool = False):
         """
         Инициализация менеджера GitHub
         
         Args:
             github_token: GitHub Personal Access Token (если None, берется из переменных окружения)
+            max_concurrency: Максимальное число одновременных запросов к API
+            cache_dir: Директория локальных кешей (по умолчанию CLOUD_BACKUP_CACHE_DIR
+                или CACHE_DIR)
+            api_url: Адрес GitHub REST API (по умолчанию GITHUB_API_URL или API_URL)
+            blob_cache_size: Размер кеша содержимого blob в байтах (по умолчанию
+                CLOUD_BACKUP_BLOB_CACHE_SIZE или BLOB_CACHE_MAX_SIZE; 0 - скачанное
+                содержимое не кешируется)
+            blob_cache_link: Восстанавливать файлы из кеша жесткими ссылками
         """
+        environment = load_environment()
         token = github_token or os.getenv('GITHUB_TOKEN')
         if not token:
             raise ValueError(
                 "GitHub token not found. Set GITHUB_TOKEN environment variable or pass it as argument"
             )
         
-        self.github = Github(token)
-        self.user = self.github.get_user()
+        self._token = token
+        self._api_url = (api_url or environment["api_url"]).rstrip('/')
+        # Время операций и фаз, запросы по эндпоинтам, повторы и расход лимита
+        self.metrics = Metrics()
+        self._request_hook_warned = False
+        # Общий планировщик всех запросов: лимиты, параллельность и повторы
+        self._scheduler = RequestScheduler(max_concurrency, metrics=self.metrics)
+        # Ответы метаданных перепроверяются через If-None-Match
+        self._cache_dir = cache_dir or environment["cache_dir"]
+        self._http_cache = ETagCache(os.path.join(self._cache_dir, "http"), HTTP_CACHE_MAX_SIZE)
+        self._catalog = None
+        # SHA неизменившихся файлов берутся из кеша по результатам stat
+        self._hash_cache = HashCache(os.path.join(self._cache_dir, "hashes.sqlite"))
+        # Скачанные blob-объекты переиспользуются при следующих восстановлениях
+        blob_cache_size = environment["blob_cache_size"] if blob_cache_size is None else blob_cache_size
+        self._blob_cache = None
+        if blob_cache_size > 0:
+            self._blob_cache = BlobCache(os.path.join(self._cache_dir, "blobs"), blob_cache_size, blob_cache_link)
+        # Найденные репозитории и вершины веток: запуск обходится без поиска
+        self._repo_cache = RepoCache(os.path.join(self._cache_dir, "repos.json"))
+        self._repo_key = None
+        self._head = None
+        # Клиент PyGithub создается при первом запросе через него
+        self._github = None
+        self._client_lock = threading.Lock()
         self.repo = None
         self.backup_metadata = {}
+        # Клиенты рабочих потоков: соединение PyGithub не потокобезопасно
+        self._local = threading.local()
         
-    def initialize_backup_repo(self, repo_name: str) -> bool:
+    @property
+    def github(self) -> github.Github:
+        """Клиент PyGithub (создается при первом обращении)"""
+        if self._github is None:
+            with self._client_lock:
+                if self._github is None:
+                    self._github = self._create_client()
+        return self._github
+    
+    @property
+    def user(self) -> github.AuthenticatedUser.AuthenticatedUser:
+        """Пользователь токена (запрашивается только при обращении к его полям)"""
+        return self.github.get_user()
+    
+    @instrumented("initialize_backup_repo")
+    def initialize_backup_repo(self, repo_name: str, refresh: bool = False) -> bool:
         """
         Инициализация или получение репозитория для резервных копий
         
+        Репозиторий, найденный однажды, открывается по сохраненным сведениям
+        без запросов к API. Имя в виде "owner/name" открывается без запроса
+        пользователя; пользователь запрашивается только для имени без
+        владельца и при создании репозитория.
+        
         Args:
-            repo_name: Имя репозитория для резервных копий
+            repo_name: Имя репозитория для резервных копий ("name" или "owner/name")
+            refresh: Найти репозиторий заново, не используя сохраненные сведения
             
         Returns:
             True если успешно инициализирован, False иначе
         """
+        key = RepoCache.key(self._api_url, self._token, repo_name)
+        info = None if refresh else self._repo_cache.get(key)
+        if info:
+            self._open_repo(key, info)
+            print(f"{Fore.GREEN}✓ Репозиторий '{repo_name}' найден{Style.RESET_ALL}")
+            return True
+        
+        owner, _, name = repo_name.rpartition("/")
         try:
             # Попытаемся получить существующий репозиторий
-            self.repo = self.user.get_repo(repo_name)
+            if owner:
+                repo = self._scheduler.call(self.github.get_repo, repo_name)
+            else:
+                repo = self._scheduler.call(self.user.get_repo, name)
             print(f"{Fore.GREEN}✓ Репозиторий '{repo_name}' найден{Style.RESET_ALL}")
-            return True
-        except GithubException:
+        except github.GithubException:
             print(f"{Fore.YELLOW}! Репозиторий '{repo_name}' не найден, создаю...{Style.RESET_ALL}")
             try:
-                self.repo = self.user.create_repo(
-                    name=repo_name,
+                account = self.user
+                if owner and owner != self._scheduler.call(getattr, account, "login"):
+                    account = self._scheduler.call(self.github.get_organization, owner)
+                repo = self._scheduler.call(
+                    account.create_repo,
+                    name=name,
                     description="Cloud Backup System - GitHub Cloud Integration",
                     private=True,
                     auto_init=True
                 )
                 print(f"{Fore.GREEN}✓ Репозиторий '{repo_name}' успешно создан{Style.RESET_ALL}")
-                return True
-            except GithubException as e:
+            except github.GithubException as e:
                 print(f"{Fore.RED}✗ Ошибка при создании репозитория: {str(e)}{Style.RESET_ALL}")
                 return False
+        
+        info = {
+            "id": repo.id,
+            "name": repo.name,
+            "full_name": repo.full_name,
+            "url": repo.url,
+            "html_url": repo.html_url,
+            "default_branch": repo.default_branch,
+            "private": repo.private
+        }
+        self._repo_cache.put(key, info)
+        self._open_repo(key, info, repo)
+        return True
     
+    @instrumented("upload_file")
     def upload_file(self, local_path: str, cloud_path: str, message: str = None) -> Tuple[bool, str]:
         """
         Загрузка файла в облако (GitHub)
@@ -93,38 +337,40 @@ class GitHubCloudManager:
             return False, f"Локальный файл не найден: {local_path}"
         
         try:
-            with open(local_path, 'rb') as f:
-                content = f.read()
-            
-            file_size = len(content)
+            file_size = os.path.getsize(local_path)
             if file_size > 100 * 1024 * 1024:  # 100MB
                 return False, "Файл слишком большой (>100MB)"
             
             commit_message = message or f"Upload: {os.path.basename(local_path)}"
+            fields = {"message": commit_message}
             
-            # Проверяем существует ли файл
+            # Проверяем существует ли файл: для обновления нужен его SHA
             try:
-                existing_file = self.repo.get_contents(cloud_path)
-                # Если файл существует, обновляем его
-                self.repo.update_file(
-                    path=cloud_path,
-                    message=commit_message,
-                    content=content,
-                    sha=existing_file.sha
-                )
+                fields["sha"] = self._get_json(self._contents_url(cloud_path))["sha"]
+            except requests.HTTPError as e:
+                if e.response is None or e.response.status_code != 404:
+                    raise
+            
+            # Содержимое кодируется в base64 по мере отправки
+            result = self._scheduler.call(
+                self._upload_stream,
+                "PUT",
+                self._contents_url(cloud_path),
+                local_path,
+                fields
+            )
+            # Коммит API contents становится новой вершиной ветки
+            commit = result.get("commit") or {}
+            self._set_head(commit.get("sha"), (commit.get("tree") or {}).get("sha"))
+            
+            if "sha" in fields:
                 return True, f"Файл обновлен: {cloud_path}"
-            except GithubException:
-                # Если файл не существует, создаем его
-                self.repo.create_file(
-                    path=cloud_path,
-                    message=commit_message,
-                    content=content
-                )
-                return True, f"Файл загружен: {cloud_path}"
+            return True, f"Файл загружен: {cloud_path}"
                 
         except Exception as e:
             return False, f"Ошибка при загрузке: {str(e)}"
     
+    @instrumented("download_file")
     def download_file(self, cloud_path: str, local_path: str) -> Tuple[bool, str]:
         """
         Скачивание файла из облака (GitHub)
@@ -140,29 +386,57 @@ class GitHubCloudManager:
             return False, "Репозиторий не инициализирован"
         
         try:
-            file_content = self.repo.get_contents(cloud_path)
-            content = file_content.decoded_content
-            
-            # Создаем директории если их нет
-            os.makedirs(os.path.dirname(local_path), exist_ok=True)
-            
-            with open(local_path, 'wb') as f:
-                f.write(content)
+            if self._blob_cache:
+                # SHA файла берется из метаданных с перепроверкой по ETag
+                # (ответ 304 не расходует лимит), содержимое - из кеша
+                blob_sha = self._get_json(self._contents_url(cloud_path))["sha"]
+                success, message = self._download_blob(blob_sha, local_path)
+                self._blob_cache.flush()
+                return success, (f"Файл скачан: {local_path}" if success else message)
             
+            # Содержимое запрашивается в сыром виде и пишется на диск блоками,
+            # поэтому память не зависит от размера файла (до 100MB)
+            self._stream_to_file(self._contents_url(cloud_path), local_path)
             return True, f"Файл скачан: {local_path}"
             
-        except GithubException as e:
-            return False, f"Файл не найден в облаке: {cloud_path}"
+        except requests.HTTPError as e:
+            if e.response is not None and e.response.status_code == 404:
+                return False, f"Файл не найден в облаке: {cloud_path}"
+            return False, f"Ошибка при скачивании: {str(e)}"
         except Exception as e:
             return False, f"Ошибка при скачивании: {str(e)}"
     
-    def backup_directory(self, local_dir: str, cloud_dir: str = "backups") -> Dict[str, any]:
+    @instrumented("backup_directory")
+    def backup_directory(self, local_dir: str, cloud_dir: str = "backups",
+                         batched: bool = True, incremental: bool = False,
+                         workers: int = DEFAULT_WORKERS, chunked: bool = False,
+                         packed: bool = False, delta: bool = False,
+                         delta_base: Optional[str] = None) -> Dict[str, any]:
         """
         Резервное копирование директории
         
         Args:
             local_dir: Локальная директория для резервной копии
             cloud_dir: Директория в облаке для хранения резервной копии
+            batched: Загрузить все файлы одним коммитом через Git Data API
+                (blob на каждый уникальный файл + одно дерево и один коммит).
+                Если False, каждый файл загружается отдельным коммитом
+            incremental: Загружать только изменившиеся файлы. SHA локальных
+                файлов сравниваются с деревом уже существующей копии,
+                которое получается одним рекурсивным запросом (включает batched)
+            workers: Число параллельных потоков загрузки (в режиме batched)
+            chunked: Хранить файлы больше CHUNKING_THRESHOLD блоками переменной
+                длины в общем хранилище блоков с индексом на каждый файл.
+                Загружаются только новые блоки, ограничение 100MB снимается
+                (включает batched)
+            packed: Упаковывать файлы меньше PACK_FILE_THRESHOLD в сжатые пакеты
+                с индексом путей, вместо отдельного запроса на каждый файл
+                (включает batched)
+            delta: Хранить изменившиеся файлы больше DELTA_THRESHOLD дельтой
+                относительно их версии в предыдущей копии; каждая
+                DELTA_MAX_DEPTH + 1-я версия хранится целиком (включает batched)
+            delta_base: Директория предыдущей копии для delta (по умолчанию -
+                прежнее содержимое cloud_dir; включает delta)
             
         Returns:
             Словарь с результатами резервной копии
@@ -179,6 +453,7 @@ class GitHubCloudManager:
             "source_dir": local_dir,
             "cloud_dir": cloud_dir,
             "files_uploaded": 0,
+            "files_skipped": 0,
             "files_failed": 0,
             "total_size": 0,
             "details": []
@@ -186,23 +461,37 @@ class GitHubCloudManager:
         
         print(f"\n{Fore.CYAN}Начинаю резервное копирование: {local_dir}{Style.RESET_ALL}")
         
-        # Сканируем все файлы в директории
-        files_to_backup = []
-        for root, dirs, files in os.walk(local_dir):
-            for file in files:
-                file_path = os.path.join(root, file)
-                files_to_backup.append(file_path)
+        # Сканируем все файлы в директории; результаты stat используются дальше
+        with self.metrics.phase("scan"):
+            files_to_backup = scan_files(local_dir)
         
         if not files_to_backup:
             backup_info["message"] = "Нет файлов для резервной копии"
             return backup_info
         
+        delta = delta or delta_base is not None
+        if batched or incremental or chunked or packed or delta:
+            # Журнал позволяет продолжить прерванную копию: загруженные blob
+            # и созданные части дерева повторно не отправляются
+            journal = self._open_journal(local_dir, cloud_dir)
+            try:
+                self._backup_batched(files_to_backup, local_dir, cloud_dir, backup_info,
+                                     incremental, workers, chunked, packed, journal,
+                                     delta, delta_base)
+            finally:
+                journal.close()
+                self._hash_cache.flush()
+            return backup_info
+        
+        manifest_entries = {}
+        
         # Загружаем файлы с прогресс-баром
-        for file_path in tqdm(files_to_backup, desc="Загрузка файлов"):
+        for file_path in tqdm.tqdm(files_to_backup, desc="Загрузка файлов"):
             relative_path = os.path.relpath(file_path, os.path.dirname(local_dir))
             cloud_path = f"{cloud_dir}/{relative_path.replace(chr(92), '/')}"
             
-            file_size = os.path.getsize(file_path)
+            stat = files_to_backup[file_path]
+            file_size = stat.st_size
             backup_info["total_size"] += file_size
             
             success, message = self.upload_file(
@@ -218,6 +507,10 @@ class GitHubCloudManager:
                     "size": file_size,
                     "status": "success"
                 })
+                tree_path = relative_path.replace(chr(92), '/')
+                manifest_entries[tree_path] = self._manifest_entry(
+                    file_path, tree_path, stat, sha=self._hash_file_cached(file_path, stat)
+                )
             else:
                 backup_info["files_failed"] += 1
                 backup_info["details"].append({
@@ -229,18 +522,57 @@ class GitHubCloudManager:
         backup_info["success"] = backup_info["files_failed"] == 0
         backup_info["message"] = f"Загружено {backup_info['files_uploaded']} файлов, ошибок: {backup_info['files_failed']}"
         
-        # Сохраняем метаданные резервной копии
-        self._save_backup_metadata(backup_info, cloud_dir)
+        # Сохраняем манифест: при покоммитной загрузке - отдельным коммитом
+        try:
+            manifest = self._load_manifest(cloud_dir)
+            old_entries = manifest[1] if manifest else {}
+            elements = {}
+            manifest_sha = self._save_backup_metadata(
+                backup_info, cloud_dir, merge_manifest(old_entries, manifest_entries, []), elements
+            )
+            backup_info["commit"] = self._commit_tree(list(elements.values()), f"Update backup metadata: {cloud_dir}")
+        except Exception as e:
+            print(f"{Fore.YELLOW}! Манифест не сохранен: {str(e)}{Style.RESET_ALL}")
+        else:
+            self._record_snapshot(backup_info, cloud_dir, manifest_sha)
+        self._hash_cache.flush()
         
         return backup_info
     
-    def restore_backup(self, cloud_dir: str, local_restore_path: str) -> Dict[str, any]:
+    @instrumented("restore_backup")
+    def restore_backup(self, cloud_dir: str, local_restore_path: str,
+                       workers: int = DEFAULT_WORKERS, sync: bool = False,
+                       delete_extra: bool = False, include: Optional[List[str]] = None,
+                       exclude: Optional[List[str]] = None, subtree: Optional[str] = None,
+                       snapshot: Optional[str] = None) -> Dict[str, any]:
         """
         Восстановление из резервной копии
         
+        В режиме sync восстановление выполняется поверх существующей
+        директории: локальные файлы хешируются (с использованием кеша хешей)
+        и скачиваются только отсутствующие и отличающиеся файлы.
+        
+        С include, exclude или subtree восстанавливается часть копии: нужные
+        пути находятся по деревьям git без скачивания манифеста, запрашиваются
+        только директории, где могут быть подходящие файлы. Права файлов
+        берутся из дерева, время изменения не восстанавливается (оно есть
+        только в манифесте).
+        
+        Со snapshot копия восстанавливается в том виде, в каком она была в
+        снимке (см. list_snapshots): дерево и манифест берутся прямо из
+        коммита снимка, история ветки не просматривается.
+        
         Args:
             cloud_dir: Директория в облаке содержащая резервную копию
             local_restore_path: Локальный путь для восстановления
+            workers: Число параллельных потоков скачивания
+            sync: Не скачивать файлы, совпадающие с локальными
+            delete_extra: В режиме sync удалять локальные файлы, которых нет в
+                копии (при частичном восстановлении - только подходящие под маски)
+            include: Маски восстанавливаемых файлов, например ["etc/*.conf"]
+            exclude: Маски файлов, которые не восстанавливаются
+            subtree: Поддерево копии, которое восстанавливается в local_restore_path
+            snapshot: Id снимка или SHA его коммита
             
         Returns:
             Словарь с результатами восстановления
@@ -257,26 +589,99 @@ class GitHubCloudManager:
             "files_failed": 0,
             "details": []
         }
+        if sync:
+            restore_info["files_unchanged"] = 0
+            restore_info["files_deleted"] = 0
+        if self._blob_cache:
+            restore_info["files_from_cache"] = 0
+            files_copied = self._blob_cache.files_copied
         
         print(f"\n{Fore.CYAN}Начинаю восстановление из: {cloud_dir}{Style.RESET_ALL}")
         
         try:
-            # Получаем список файлов в облаке
-            contents = self.repo.get_contents(cloud_dir)
-            files_to_restore = self._get_all_files(contents)
+            # Снимок задает коммит, от которого читаются дерево и манифест
+            rev = None
+            manifest_sha = None
+            if snapshot:
+                entry = snapshots.find(self._read_snapshots()[0], snapshot)
+                if entry is None:
+                    restore_info["message"] = f"Снимок не найден: {snapshot}"
+                    return restore_info
+                rev = entry["commit"]
+                if entry["cloud_dir"] == cloud_dir.strip('/'):
+                    manifest_sha = entry.get("manifest")
+                restore_info["snapshot"] = entry["id"]
             
-            if not files_to_restore:
+            # Состав копии берется из манифеста; для копий без манифеста -
+            # из дерева git одним рекурсивным запросом
+            path_filter = None
+            manifest = None
+            if include or exclude or subtree:
+                path_filter = PathFilter(include, exclude)
+                files_to_restore, packed_files = self._restore_plan_selective(cloud_dir, path_filter,
+                                                                              subtree or "", rev)
+                manifest_entries = {path: {"mode": item["mode"]} for path, item in files_to_restore.items()}
+                for members in packed_files.values():
+                    manifest_entries.update({path: {"mode": entry["mode"]} for path, entry in members.items()})
+            else:
+                manifest = self._load_manifest(cloud_dir, manifest_sha, rev)
+                manifest_entries = manifest[1] if manifest else {}
+                if manifest:
+                    files_to_restore, packed_files = restore_plan_from_manifest(manifest_entries)
+                else:
+                    files_to_restore, packed_files = self._restore_plan_from_tree(cloud_dir, rev)
+            reject_unsafe_paths(files_to_restore, packed_files, manifest_entries, restore_info)
+            
+            if not files_to_restore and not packed_files:
                 restore_info["message"] = "Нет файлов для восстановления"
                 return restore_info
             
             os.makedirs(local_restore_path, exist_ok=True)
             
-            # Скачиваем файлы с прогресс-баром
-            for file_obj in tqdm(files_to_restore, desc="Скачивание файлов"):
-                relative_path = file_obj.path.replace(f"{cloud_dir}/", "")
-                local_file_path = os.path.join(local_restore_path, relative_path.replace('/', chr(92)))
+            if sync:
+                if manifest:
+                    expected = {path: (entry["sha"], entry["mode"]) for path, entry in manifest_entries.items()}
+                else:
+                    expected = self._plan_file_shas(files_to_restore, packed_files)
+                self._sync_restore_plan(local_restore_path, expected, manifest_entries,
+                                        files_to_restore, packed_files, restore_info, delete_extra,
+                                        path_filter)
+            
+            def restore_file(relative_path: str) -> Tuple[bool, str]:
+                local_file_path = os.path.join(local_restore_path, *relative_path.split('/'))
+                item = files_to_restore[relative_path]
+                attributes = manifest_entries.get(relative_path)
+                if "conflict" in item:
+                    return False, f"Файл хранится в копии в нескольких форматах: {', '.join(item['conflict'])}"
+                if item["path"].endswith(CHUNK_INDEX_SUFFIX):
+                    return self._download_chunked(item["sha"], local_file_path, attributes)
+                if item["path"].endswith(DELTA_SUFFIX):
+                    return self._download_delta(item["sha"], local_file_path, attributes)
+                return self._download_blob(item["sha"], local_file_path, attributes)
+            
+            # Скачиваем файлы параллельно, результаты собираем в порядке путей
+            results = dict(self._run_parallel(
+                restore_file, files_to_restore, workers, "Скачивание файлов"
+            ))
+            
+            def restore_pack(pack_sha: str) -> Dict[str, Tuple[bool, str]]:
+                return self._extract_pack(pack_sha, packed_files[pack_sha], local_restore_path)
+            
+            for _, pack_results in self._run_parallel(
+                restore_pack, packed_files, workers, "Распаковка пакетов"
+            ):
+                results.update(pack_results)
+            
+            for relative_path in sorted(results):
+                success, message = results[relative_path]
                 
-                success, message = self.download_file(file_obj.path, local_file_path)
+                # Права и время изменения восстанавливаются по манифесту
+                if success and relative_path in manifest_entries:
+                    with self.metrics.phase("attributes"):
+                        apply_file_attributes(
+                            os.path.join(local_restore_path, *relative_path.split('/')),
+                            manifest_entries[relative_path]
+                        )
                 
                 if success:
                     restore_info["files_restored"] += 1
@@ -294,20 +699,113 @@ class GitHubCloudManager:
             
             restore_info["success"] = restore_info["files_failed"] == 0
             restore_info["message"] = f"Восстановлено {restore_info['files_restored']} файлов, ошибок: {restore_info['files_failed']}"
+            if sync:
+                restore_info["message"] += (f", без изменений: {restore_info['files_unchanged']}"
+                                            f", удалено: {restore_info['files_deleted']}")
+            if self._blob_cache:
+                restore_info["files_from_cache"] = self._blob_cache.files_copied - files_copied
+                restore_info["message"] += f", из локального кеша: {restore_info['files_from_cache']}"
             
-        except GithubException as e:
+        except (github.GithubException, requests.HTTPError) as e:
             restore_info["message"] = f"Директория не найдена в облаке: {cloud_dir}"
         except Exception as e:
             restore_info["message"] = f"Ошибка при восстановлении: {str(e)}"
+        finally:
+            if self._blob_cache:
+                self._blob_cache.flush()
         
         return restore_info
     
-    def list_backups(self, base_dir: str = "backups") -> List[Dict]:
+    @instrumented("verify_backup")
+    def verify_backup(self, local_dir: str, cloud_dir: str = "backups",
+                      workers: Optional[int] = None) -> Dict[str, any]:
+        """
+        Проверка целостности резервной копии без скачивания содержимого
+        
+        Локальные файлы хешируются в пуле процессов в SHA blob-объектов git
+        и сравниваются с SHA из манифеста (или дерева git для копий без
+        манифеста). По сети передаются только метаданные.
+        
+        Args:
+            local_dir: Локальная директория, с которой сравнивается копия
+            cloud_dir: Директория резервной копии в облаке
+            workers: Число процессов хеширования (по умолчанию - число ядер)
+            
+        Returns:
+            Словарь с результатами: missing - локальные файлы, которых нет в
+            копии; extra - файлы копии, которых нет локально; changed - файлы
+            с отличающимся содержимым или правами; errors - непрочитанные файлы
+        """
+        if not self.repo:
+            return {"success": False, "message": "Репозиторий не инициализирован"}
+        
+        if not os.path.isdir(local_dir):
+            return {"success": False, "message": f"Директория не найдена: {local_dir}"}
+        
+        verify_info = {
+            "success": False,
+            "local_dir": local_dir,
+            "cloud_dir": cloud_dir,
+            "files_checked": 0,
+            "files_matched": 0,
+            "missing": [],
+            "extra": [],
+            "changed": [],
+            "errors": []
+        }
+        
+        print(f"\n{Fore.CYAN}Проверяю резервную копию: {cloud_dir}{Style.RESET_ALL}")
+        
+        try:
+            remote = self._remote_file_shas(cloud_dir)
+        except (github.GithubException, requests.HTTPError) as e:
+            verify_info["message"] = f"Директория не найдена в облаке: {cloud_dir}"
+            return verify_info
+        except Exception as e:
+            verify_info["message"] = f"Ошибка при получении резервной копии: {str(e)}"
+            return verify_info
+        
+        local_files = {}
+        with self.metrics.phase("scan"):
+            file_stats = scan_files(local_dir)
+        for file_path in file_stats:
+            relative_path = os.path.relpath(file_path, os.path.dirname(local_dir))
+            local_files[relative_path.replace(chr(92), '/')] = file_path
+        
+        paths = sorted(local_files)
+        hashes = self._hash_local_files(local_files, file_stats, workers)
+        
+        for path in paths:
+            blob_sha = hashes[path]
+            verify_info["files_checked"] += 1
+            if path not in remote:
+                verify_info["missing"].append(path)
+            elif blob_sha is None:
+                verify_info["errors"].append(path)
+            elif (blob_sha, git_file_mode(local_files[path], file_stats[local_files[path]])) != remote[path]:
+                verify_info["changed"].append(path)
+            else:
+                verify_info["files_matched"] += 1
+        verify_info["extra"] = sorted(set(remote) - set(local_files))
+        
+        verify_info["success"] = not (verify_info["missing"] or verify_info["extra"]
+                                      or verify_info["changed"] or verify_info["errors"])
+        verify_info["message"] = (
+            f"Проверено {verify_info['files_checked']} файлов: совпадает {verify_info['files_matched']}, "
+            f"изменено {len(verify_info['changed'])}, нет в копии {len(verify_info['missing'])}, "
+            f"лишних в копии {len(verify_info['extra'])}, ошибок чтения {len(verify_info['errors'])}"
+        )
+        return verify_info
+    
+    @instrumented("list_backups")
+    def list_backups(self, base_dir: str = "backups", offline: bool = False) -> List[Dict]:
         """
         Получение списка доступных резервных копий
         
         Args:
             base_dir: Базовая директория для поиска резервных копий
+            offline: Взять список из локального каталога без обращения к сети
+                (актуален на момент последнего refresh_catalog)
             
         Returns:
             Список резервных копий
@@ -315,31 +813,71 @@ class GitHubCloudManager:
         if not self.repo:
             return []
         
+        if offline:
+            dirs, _ = self.catalog.list_dir(base_dir)
+            created = self._backup_created(offline=True)
+            return [{"name": path.rsplit('/', 1)[-1], "path": path, "created": created.get(path, "Unknown")}
+                    for path in dirs]
+        
         try:
-            contents = self.repo.get_contents(base_dir)
+            contents = self._get_json(self._contents_url(base_dir))
             
             if not isinstance(contents, list):
                 contents = [contents]
             
+            created = self._backup_created()
+            
             backups = []
             for item in contents:
-                if item.type == "dir":
+                if item["type"] == "dir":
                     backups.append({
-                        "name": item.name,
-                        "path": item.path,
-                        "created": item.created_at.isoformat() if hasattr(item, 'created_at') else "Unknown"
+                        "name": item["name"],
+                        "path": item["path"],
+                        "created": created.get(item["path"], "Unknown")
                     })
             
             return backups
-        except GithubException:
+        except (github.GithubException, requests.HTTPError):
+            return []
+    
+    @instrumented("list_snapshots")
+    def list_snapshots(self, cloud_dir: Optional[str] = None,
+                       before: Optional[Union[str, datetime]] = None) -> List[Dict]:
+        """
+        Список снимков резервных копий
+        
+        Снимок записывается при каждом коммите резервной копии; весь каталог
+        читается одним запросом. Снимок передается в restore_backup(snapshot=...).
+        
+        Args:
+            cloud_dir: Только снимки этой директории копии
+            before: Только снимки, сделанные не позже этого момента
+                (datetime или строка ISO 8601, например "2024-01-16T18:00")
+            
+        Returns:
+            Список снимков от новых к старым (id, timestamp, cloud_dir,
+            source_dir, commit, tree, manifest и итоги копии)
+        """
+        if not self.repo:
+            return []
+        
+        try:
+            return snapshots.select(self._read_snapshots()[0], cloud_dir, before)
+        except requests.HTTPError as e:
+            print(f"{Fore.RED}✗ Ошибка при чтении каталога снимков: {str(e)}{Style.RESET_ALL}")
             return []
     
-    def list_files(self, cloud_path: str = "") -> List[Dict]:
+    @instrumented("list_files")
+    def list_files(self, cloud_path: str = "", recursive: bool = False,
+                   offline: bool = False) -> List[Dict]:
         """
         Получение списка файлов в облаке
         
         Args:
             cloud_path: Путь в облаке
+            recursive: Вернуть все файлы поддерева (один запрос к дереву git)
+            offline: Взять список из локального каталога без обращения к сети
+                (актуален на момент последнего refresh_catalog)
             
         Returns:
             Список файлов
@@ -347,11 +885,34 @@ class GitHubCloudManager:
         if not self.repo:
             return []
         
-        try:
-            if cloud_path:
-                contents = self.repo.get_contents(cloud_path)
+        if offline:
+            if recursive:
+                files = self.catalog.list_files(cloud_path)
+                dirs = []
             else:
-                contents = self.repo.get_contents("")
+                dirs, files = self.catalog.list_dir(cloud_path)
+            return [
+                {"name": path.rsplit('/', 1)[-1], "path": path, "type": "dir", "size": 0}
+                for path in dirs
+            ] + [
+                {"name": item["path"].rsplit('/', 1)[-1], "path": item["path"], "type": "file", "size": item["size"]}
+                for item in files
+            ]
+        
+        try:
+            if recursive:
+                prefix = f"{cloud_path.strip('/')}/" if cloud_path.strip('/') else ""
+                return [
+                    {
+                        "name": relative_path.rsplit('/', 1)[-1],
+                        "path": f"{prefix}{relative_path}",
+                        "type": "file",
+                        "size": item.get("size") or 0
+                    }
+                    for relative_path, item in sorted(self._get_remote_tree(cloud_path).items())
+                ]
+            
+            contents = self._get_json(self._contents_url(cloud_path))
             
             if not isinstance(contents, list):
                 contents = [contents]
@@ -359,17 +920,113 @@ class GitHubCloudManager:
             files = []
             for item in contents:
                 files.append({
-                    "name": item.name,
-                    "path": item.path,
-                    "type": item.type,
-                    "size": item.size if hasattr(item, 'size') else 0
+                    "name": item["name"],
+                    "path": item["path"],
+                    "type": item["type"],
+                    "size": item.get("size", 0)
                 })
             
             return files
-        except GithubException as e:
+        except (github.GithubException, requests.HTTPError) as e:
             print(f"{Fore.RED}✗ Ошибка при получении списка файлов: {str(e)}{Style.RESET_ALL}")
             return []
     
+    @property
+    def catalog(self) -> BackupCatalog:
+        """Локальный каталог файлов репозитория (SQLite), открывается при первом обращении"""
+        if self._catalog is None:
+            db_name = f"{self.repo.full_name.replace('/', '__')}.sqlite"
+            self._catalog = BackupCatalog(os.path.join(self._cache_dir, "catalog", db_name))
+        return self._catalog
+    
+    @instrumented("refresh_catalog")
+    def refresh_catalog(self) -> Dict[str, any]:
+        """
+        Инкрементальное обновление локального каталога до текущего коммита
+        
+        Если ветка не изменилась, выполняется один условный запрос (ответ 304
+        не расходует лимит). Иначе запрашиваются только поддеревья, SHA
+        которых изменился с последнего обновления.
+        
+        Returns:
+            Словарь с результатом обновления и статистикой
+        """
+        result = {"success": False, "commit": None, "trees_fetched": 0,
+                  "files_updated": 0, "files_removed": 0}
+        if not self.repo:
+            result["message"] = "Репозиторий не инициализирован"
+            return result
+        
+        try:
+            ref = self._get_json(f"{self.repo.url}/git/ref/heads/{quote(self.repo.default_branch)}")
+            commit_sha = ref["object"]["sha"]
+            tree_sha = None
+            if commit_sha != self.catalog.commit:
+                tree_sha = self._get_json(f"{self.repo.url}/git/commits/{commit_sha}")["tree"]["sha"]
+            
+            def fetch_tree(sha: str, recursive: bool) -> Dict:
+                # Деревья сохраняются в самом каталоге, в кеше ответов они не нужны
+                suffix = "?recursive=1" if recursive else ""
+                return self._get_json(f"{self.repo.url}/git/trees/{sha}{suffix}", cache=False)
+            
+            result.update(self.catalog.refresh(commit_sha, tree_sha, fetch_tree))
+            # Каталог снимков сохраняется в кеше ответов для list_backups(offline=True)
+            self._backup_created()
+            result["success"] = True
+            result["commit"] = commit_sha
+            result["message"] = (f"Каталог обновлен до {commit_sha[:7]}: изменено {result['files_updated']}, "
+                                 f"удалено {result['files_removed']}")
+        except (github.GithubException, requests.RequestException) as e:
+            result["message"] = f"Ошибка при обновлении каталога: {str(e)}"
+        return result
+    
+    def search_files(self, pattern: str) -> List[Dict]:
+        """
+        Поиск файлов по маске пути в локальном каталоге (без обращения к сети)
+        
+        Args:
+            pattern: Маска пути, например "backups/*/config/*.json"
+            
+        Returns:
+            Список файлов (path, size, sha, mode, commit)
+        """
+        if not self.repo:
+            return []
+        return self.catalog.search(pattern)
+    
+    @instrumented("find_backups_with_file")
+    def find_backups_with_file(self, file_path: str, base_dir: str = "backups") -> List[Dict]:
+        """
+        Поиск резервных копий, содержащих файл (по локальному каталогу)
+        
+        Если file_path - существующий локальный файл, ищутся копии с таким же
+        содержимым под любым именем; иначе - файлы с таким относительным путем.
+        
+        Args:
+            file_path: Локальный файл или путь файла внутри резервной копии
+            base_dir: Базовая директория резервных копий
+            
+        Returns:
+            Список найденных файлов с именем резервной копии (backup)
+        """
+        if not self.repo:
+            return []
+        
+        if os.path.isfile(file_path):
+            matches = self.catalog.find_by_sha(self._hash_file_cached(file_path))
+            self._hash_cache.flush()
+        else:
+            matches = self.catalog.find_by_suffix(file_path.replace(chr(92), '/'))
+        
+        prefix = f"{base_dir.strip('/')}/"
+        result = []
+        for item in matches:
+            if item["path"].startswith(prefix) and '/' in item["path"][len(prefix):]:
+                backup = prefix + item["path"][len(prefix):].split('/', 1)[0]
+                result.append(dict(item, backup=backup))
+        return result
+    
+    @instrumented("delete_file")
     def delete_file(self, cloud_path: str) -> Tuple[bool, str]:
         """
         Удаление файла из облака
@@ -384,70 +1041,1824 @@ class GitHubCloudManager:
             return False, "Репозиторий не инициализирован"
         
         try:
-            file_content = self.repo.get_contents(cloud_path)
-            self.repo.delete_file(
+            file_sha = self._get_json(self._contents_url(cloud_path))["sha"]
+            self._scheduler.call(
+                self.repo.delete_file,
                 path=cloud_path,
                 message=f"Delete: {os.path.basename(cloud_path)}",
-                sha=file_content.sha
+                sha=file_sha
             )
+            self._set_head(None)
             return True, f"Файл удален: {cloud_path}"
-        except GithubException as e:
+        except (github.GithubException, requests.HTTPError) as e:
             return False, f"Ошибка при удалении: {str(e)}"
     
-    def _get_all_files(self, contents, files: List = None):
+    def _read_snapshots(self, offline: bool = False) -> Tuple[List[Dict], Optional[bytes]]:
         """
-        Рекурсивно получить все файлы из содержимого
+        Чтение каталога снимков одним условным запросом
+        
+        Содержимое каталога хранится в кеше ответов вместе с ETag, поэтому
+        повторное чтение неизменившегося каталога (ответ 304) не расходует
+        лимит API.
         
         Args:
-            contents: Содержимое репозитория
-            files: Список файлов
+            offline: Взять каталог из кеша ответов без обращения к сети
             
         Returns:
-            Список всех файлов
+            Кортеж (записи каталога, содержимое каталога или None, если
+            каталога еще нет)
         """
-        if files is None:
-            files = []
+        url = f"{self._contents_url(snapshots.CATALOG_NAME)}?ref={quote(snapshots.SNAPSHOT_BRANCH)}"
+        
+        def fetch() -> Optional[bytes]:
+            cached = self._http_cache.get(url)
+            if offline:
+                return cached["body"].encode('utf-8') if cached else None
+            headers = {"If-None-Match": cached["etag"]} if cached else {}
+            response = self._http_session().get(url, headers=headers, timeout=HTTP_TIMEOUT)
+            if cached and response.status_code == 304:
+                return cached["body"].encode('utf-8')
+            if response.status_code == 404:
+                return None
+            response.raise_for_status()
+            if response.headers.get("ETag"):
+                self._http_cache.put(url, response.headers["ETag"], response.content.decode('utf-8'))
+            return response.content
+        
+        content = fetch() if offline else self._scheduler.call(fetch)
+        return (snapshots.parse_catalog(content) if content else []), content
+    
+    def _backup_created(self, offline: bool = False) -> Dict[str, str]:
+        """
+        Время создания резервных копий по каталогу снимков
+        
+        У директорий в API нет времени создания - оно берется из первого
+        снимка каждой копии.
+        
+        Args:
+            offline: Взять каталог из кеша ответов без обращения к сети
+            
+        Returns:
+            Словарь {директория копии: время первого снимка}
+        """
+        created = {}
+        try:
+            for entry in self._read_snapshots(offline)[0]:
+                created.setdefault(entry["cloud_dir"], entry["timestamp"])
+        except requests.HTTPError:
+            pass
+        return created
+    
+    def _record_snapshot(self, backup_info: Dict, cloud_dir: str, manifest_sha: Optional[str]):
+        """
+        Закрепление коммита копии тегом и запись снимка в каталог
         
-        if not isinstance(contents, list):
-            contents = [contents]
+        Каталог дописывается с проверкой SHA прежнего содержимого: если его
+        одновременно изменил другой клиент, запись повторяется. Ошибка
+        записи снимка не отменяет резервную копию.
         
-        for item in contents:
-            if item.type == "file":
-                files.append(item)
-            elif item.type == "dir":
+        Args:
+            backup_info: Информация о резервной копии; дополняется id снимка
+            cloud_dir: Директория в облаке
+            manifest_sha: SHA blob манифеста копии
+        """
+        if not self._head:
+            return
+        entry = snapshots.make_entry(backup_info, cloud_dir, self._head["commit"], self._head["tree"], manifest_sha)
+        message = f"Snapshot {entry['id']}: {entry['cloud_dir']}"
+        call = self._scheduler.call
+        try:
+            call(self.repo.create_git_ref, f"refs/tags/{snapshots.TAG_PREFIX}{entry['id']}", entry["commit"])
+            for attempt in range(3):
+                _, content = self._read_snapshots()
+                data = snapshots.append_entry(content or b"", entry)
                 try:
-                    sub_contents = self.repo.get_contents(item.path)
-                    self._get_all_files(sub_contents, files)
-                except GithubException:
-                    pass
+                    if content is None:
+                        # Первый снимок: ветка каталога создается без общей истории с копиями
+                        tree = call(self.repo.create_git_tree, [github.InputGitTreeElement(
+                            path=snapshots.CATALOG_NAME, mode="100644", type="blob", content=data.decode('utf-8')
+                        )])
+                        commit = call(self.repo.create_git_commit, message, tree, [])
+                        call(self.repo.create_git_ref, f"refs/heads/{snapshots.SNAPSHOT_BRANCH}", commit.sha)
+                    else:
+                        call(self.repo.update_file, snapshots.CATALOG_NAME, message, data,
+                             git_blob_sha(content), branch=snapshots.SNAPSHOT_BRANCH)
+                    break
+                except github.GithubException as e:
+                    if e.status not in (409, 422) or attempt == 2:
+                        raise
+            backup_info["snapshot"] = entry["id"]
+        except (github.GithubException, requests.HTTPError) as e:
+            print(f"{Fore.YELLOW}! Снимок не записан в каталог: {str(e)}{Style.RESET_ALL}")
+    
+    def _restore_plan_from_tree(self, cloud_dir: str,
+                                rev: Optional[str] = None) -> Tuple[Dict[str, Dict], Dict[str, Dict]]:
+        """
+        План восстановления по дереву git (для копий без манифеста)
+        
+        Args:
+            cloud_dir: Директория в облаке
+            rev: Ревизия копии (по умолчанию - ветка по умолчанию)
+            
+        Returns:
+            Кортеж (отдельные файлы {путь: элемент дерева},
+            файлы в пакетах {SHA пакета: {путь: запись индекса}})
+        """
+        # Файлы, хранящиеся блоками или дельтой, представлены индексом или объектом дельты
+        remote_files = self._get_remote_tree(cloud_dir, missing_ok=False, rev=rev)
+        files_to_restore = {}
+        for path, item in remote_files.items():
+            if not path.startswith(f"{PACK_DIR}/") and path != MANIFEST_NAME:
+                add_plan_item(files_to_restore, strip_storage_suffix(path), item)
         
-        return files
+        # Мелкие файлы из пакетов, сгруппированные по пакету. Отдельно
+        # сохраненный файл с тем же путем приоритетнее
+        packed_files = {}
+        pack_index = remote_files.get(f"{PACK_DIR}/{PACK_INDEX_NAME}")
+        if pack_index:
+            for path, entry in self._fetch_blob_json(pack_index["sha"])["files"].items():
+                if path not in files_to_restore:
+                    packed_files.setdefault(entry["pack"], {})[path] = entry
+        return files_to_restore, packed_files
     
-    def _save_backup_metadata(self, backup_info: Dict, cloud_dir: str):
+    def _restore_plan_selective(self, cloud_dir: str, path_filter: PathFilter, subtree: str = "",
+                                rev: Optional[str] = None) -> Tuple[Dict[str, Dict], Dict[str, Dict]]:
         """
-        Сохранение метаданных резервной копии
+        План восстановления части копии по деревьям git
+        
+        Дерево обходится от директории копии (или поддерева) только по
+        директориям, в которых могут быть подходящие файлы; директория,
+        внутри которой маска допускает любые пути, запрашивается одним
+        рекурсивным запросом. Манифест и содержимое файлов не скачиваются,
+        из пакетов берется только индекс.
         
         Args:
-            backup_info: Информация о резервной копии
             cloud_dir: Директория в облаке
+            path_filter: Отбор файлов по маскам
+            subtree: Поддерево копии; пути плана отсчитываются от него
+            rev: Ревизия копии (по умолчанию - ветка по умолчанию)
+            
+        Returns:
+            Кортеж (отдельные файлы {путь: элемент с path, sha и mode},
+            файлы в пакетах {SHA пакета: {путь: запись индекса}})
         """
-        metadata = {
-            "backup_dir": cloud_dir,
-            "timestamp": backup_info["timestamp"],
-            "files_count": backup_info["files_uploaded"],
-            "total_size": backup_info["total_size"],
-            "status": "success" if backup_info["success"] else "partial"
-        }
+        subtree = subtree.strip('/')
+        root = "/".join(part for part in (cloud_dir.strip('/'), subtree) if part)
+        base = f"{subtree}/" if subtree else ""
+        files_to_restore = {}
+        pack_index_sha = None
+        # Обход начинается сразу с общей директории масок: ее SHA
+        # разрешается на сервере по выражению "<ветка>:<путь>"
+        start = path_filter.common_directory()
+        if path_filter.scan_mode(start) is None:
+            return {}, {}
+        
+        def add(path: str, item: Dict):
+            nonlocal pack_index_sha
+            if not subtree and path == f"{PACK_DIR}/{PACK_INDEX_NAME}":
+                pack_index_sha = item["sha"]
+            if not subtree and (path == MANIFEST_NAME or path.startswith(f"{PACK_DIR}/")):
+                return
+            # Файлы, хранящиеся блоками или дельтой, представлены индексом или объектом дельты
+            relative_path = strip_storage_suffix(path)
+            if path_filter(relative_path):
+                add_plan_item(files_to_restore, relative_path,
+                              {"path": path, "sha": item["sha"], "mode": item["mode"]})
+        
+        def find_pack_index(listing: List[Dict]) -> Optional[str]:
+            return next((item["sha"] for item in listing if item["path"] == PACK_INDEX_NAME), None)
         
-        metadata_path = f"{cloud_dir}/metadata.json"
+        rev = rev or self.repo.default_branch
+        tree_ish = quote(f"{rev}:{'/'.join(p for p in (root, start) if p)}", safe="/:")
+        pending = [(start, f"{self.repo.url}/git/trees/{tree_ish}")]
+        while pending:
+            directory, url = pending.pop()
+            prefix = f"{directory}/" if directory else ""
+            try:
+                if path_filter.scan_mode(directory) == "all":
+                    tree = self._get_json(f"{url}?recursive=1")
+                    for path, item in self._collect_tree_files(tree, prefix).items():
+                        add(path, item)
+                    continue
+                listing = self._get_json(url)["tree"]
+            except requests.HTTPError as e:
+                # Директории из масок может не быть в копии
+                if not directory or e.response is None or e.response.status_code != 404:
+                    raise
+                continue
+            
+            for item in listing:
+                path = f"{prefix}{item['path']}"
+                if item["type"] == "blob":
+                    add(path, item)
+                elif not subtree and path == PACK_DIR:
+                    listing = self._get_json(f"{self.repo.url}/git/trees/{item['sha']}")["tree"]
+                    pack_index_sha = find_pack_index(listing)
+                elif item["type"] == "tree" and path_filter.scan_mode(path):
+                    pending.append((path, f"{self.repo.url}/git/trees/{item['sha']}"))
+        
+        # Индекс пакетов лежит в корне копии, вне обойденных директорий
+        if subtree or start:
+            packs_ish = quote(f"{rev}:{cloud_dir.strip('/')}/{PACK_DIR}", safe="/:")
+            try:
+                pack_index_sha = find_pack_index(self._get_json(f"{self.repo.url}/git/trees/{packs_ish}")["tree"])
+            except requests.HTTPError as e:
+                if e.response is None or e.response.status_code != 404:
+                    raise
+        
+        # Мелкие файлы из пакетов, сгруппированные по пакету. Отдельно
+        # сохраненный файл с тем же путем приоритетнее
+        packed_files = {}
+        if pack_index_sha:
+            for path, entry in self._fetch_blob_json(pack_index_sha)["files"].items():
+                if not path.startswith(base):
+                    continue
+                relative_path = path[len(base):]
+                if relative_path not in files_to_restore and path_filter(relative_path):
+                    packed_files.setdefault(entry["pack"], {})[relative_path] = entry
+        return files_to_restore, packed_files
+    
+    def _sync_restore_plan(self, local_restore_path: str, expected: Dict[str, Tuple[str, str]],
+                           manifest_entries: Dict[str, Dict], files_to_restore: Dict[str, Dict],
+                           packed_files: Dict[str, Dict], restore_info: Dict[str, any],
+                           delete_extra: bool, path_filter: Optional[PathFilter] = None):
+        """
+        Исключение из плана восстановления файлов, совпадающих с локальными
+        
+        У совпадающих по содержимому файлов восстанавливаются только права и
+        время изменения. План и restore_info изменяются на месте.
+        
+        Args:
+            local_restore_path: Локальный путь для восстановления
+            expected: SHA содержимого и режим файлов копии {путь: (SHA, режим)}
+            manifest_entries: Записи манифеста (пустой словарь, если манифеста нет)
+            files_to_restore: Отдельные файлы плана {путь: элемент}
+            packed_files: Файлы в пакетах {SHA пакета: {путь: запись}}
+            restore_info: Словарь с результатами восстановления
+            delete_extra: Удалять локальные файлы, которых нет в копии
+            path_filter: Отбор файлов при частичном восстановлении: остальные
+                локальные файлы не сравниваются и не удаляются
+        """
+        with self.metrics.phase("scan"):
+            file_stats = scan_files(local_restore_path)
+        local_files = {}
+        for file_path in file_stats:
+            relative_path = os.path.relpath(file_path, local_restore_path).replace(chr(92), '/')
+            if path_filter is None or path_filter(relative_path):
+                local_files[relative_path] = file_path
+        
+        candidates = {path: file_path for path, file_path in local_files.items() if path in expected}
+        hashes = self._hash_local_files(candidates, file_stats)
+        
+        unchanged = set()
+        for path in sorted(candidates):
+            blob_sha, mode = expected[path]
+            if hashes[path] != blob_sha:
+                continue
+            unchanged.add(path)
+            stat = file_stats[candidates[path]]
+            entry = manifest_entries.get(path, {"mode": mode})
+            if git_file_mode(candidates[path], stat) != mode or entry.get("mtime", stat.st_mtime) != stat.st_mtime:
+                apply_file_attributes(candidates[path], entry)
+            restore_info["files_unchanged"] += 1
+            restore_info["details"].append({
+                "file": path,
+                "status": "unchanged"
+            })
+        
+        for path in unchanged:
+            files_to_restore.pop(path, None)
+        for pack_sha in list(packed_files):
+            members = packed_files[pack_sha]
+            for path in unchanged & set(members):
+                del members[path]
+            if not members:
+                del packed_files[pack_sha]
+        
+        if not delete_extra:
+            return
+        for path in sorted(set(local_files) - set(expected)):
+            try:
+                os.remove(local_files[path])
+            except OSError as e:
+                restore_info["files_failed"] += 1
+                restore_info["details"].append({
+                    "file": path,
+                    "error": f"Ошибка при удалении: {str(e)}",
+                    "status": "failed"
+                })
+                continue
+            restore_info["files_deleted"] += 1
+            restore_info["details"].append({
+                "file": path,
+                "status": "deleted"
+            })
+            # Убираем опустевшие директории
+            directory = os.path.dirname(local_files[path])
+            while os.path.normpath(directory) != os.path.normpath(local_restore_path):
+                try:
+                    os.rmdir(directory)
+                except OSError:
+                    break
+                directory = os.path.dirname(directory)
+    
+    @timed_phase("hash")
+    def _hash_local_files(self, local_files: Dict[str, str], file_stats: Dict[str, os.stat_result],
+                          workers: Optional[int] = None) -> Dict[str, Optional[str]]:
+        """
+        SHA blob-объектов git для локальных файлов
+        
+        Неизменившиеся файлы берутся из кеша хешей, остальные хешируются в
+        пуле процессов: хеширование упирается в процессор.
+        
+        Args:
+            local_files: Файлы {путь в копии: локальный путь}
+            file_stats: Результаты stat {локальный путь: stat}
+            workers: Число процессов хеширования (по умолчанию - число ядер)
+            
+        Returns:
+            Словарь {путь в копии: SHA blob или None, если файл не читается}
+        """
+        hashes = {path: self._hash_cache.get(file_stats[file_path]) for path, file_path in local_files.items()}
+        to_hash = sorted(path for path, blob_sha in hashes.items() if blob_sha is None)
+        if not to_hash:
+            return hashes
+        
+        # Модуль пула процессов загружается долго и нужен только здесь
+        from concurrent.futures import ProcessPoolExecutor
+        
+        workers = workers or os.cpu_count() or 1
+        hashed_at = time.time()
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            hashed = list(tqdm.tqdm(
+                executor.map(try_hash_file, [local_files[path] for path in to_hash],
+                             chunksize=max(1, len(to_hash) // (workers * 4))),
+                total=len(to_hash), desc="Хеширование файлов"
+            ))
+        for path, blob_sha in zip(to_hash, hashed):
+            hashes[path] = blob_sha
+            if blob_sha is not None:
+                self._remember_hash(local_files[path], file_stats[local_files[path]], blob_sha, hashed_at)
+        self._hash_cache.flush()
+        return hashes
+    
+    def _remote_file_shas(self, cloud_dir: str) -> Dict[str, Tuple[str, str]]:
+        """
+        SHA содержимого и режим каждого файла резервной копии
+        
+        Берутся из манифеста; для копий без манифеста - из дерева git,
+        индекса пакетов и индексов блоков.
+        
+        Args:
+            cloud_dir: Директория резервной копии в облаке
+            
+        Returns:
+            Словарь {путь относительно cloud_dir: (SHA blob, режим)}
+        """
+        manifest = self._load_manifest(cloud_dir)
+        if manifest:
+            return {path: (entry["sha"], entry["mode"]) for path, entry in manifest[1].items()}
+        return self._plan_file_shas(*self._restore_plan_from_tree(cloud_dir))
+    
+    def _plan_file_shas(self, files_to_check: Dict[str, Dict],
+                        packed_files: Dict[str, Dict]) -> Dict[str, Tuple[str, str]]:
+        """
+        SHA содержимого и режим файлов плана восстановления по дереву git
+        
+        Args:
+            files_to_check: Отдельные файлы {путь: элемент дерева}
+            packed_files: Файлы в пакетах {SHA пакета: {путь: запись индекса}}
+            
+        Returns:
+            Словарь {путь относительно cloud_dir: (SHA blob, режим)}
+        """
+        result = {path: (item["sha"], item["mode"]) for path, item in files_to_check.items()}
+        
+        # Для файлов, хранящихся блоками или дельтой, SHA содержимого
+        # записан в индексе или заголовке объекта дельты. У файла с
+        # несколькими представлениями SHA неизвестен: он не совпадет с
+        # локальным, и ошибка будет выдана при восстановлении
+        def read_index(path: str) -> Dict:
+            item = files_to_check[path]
+            if item["path"].endswith(DELTA_SUFFIX):
+                return self._fetch_delta_header(item["sha"])
+            return self._fetch_blob_json(item["sha"])
+        
+        for path, item in files_to_check.items():
+            if "conflict" in item:
+                result[path] = (None, item["mode"])
+        indexed_files = [path for path, item in files_to_check.items()
+                         if item["path"].endswith(STORAGE_SUFFIXES) and "conflict" not in item]
+        for path, index in self._run_parallel(
+            read_index, indexed_files, DEFAULT_WORKERS, "Чтение индексов"
+        ):
+            result[path] = (index["sha"], files_to_check[path]["mode"])
+        for members in packed_files.values():
+            result.update({path: (entry["sha"], entry["mode"]) for path, entry in members.items()})
+        return result
+    
+    def _backup_batched(self, files_to_backup: Dict[str, os.stat_result], local_dir: str, cloud_dir: str,
+                        backup_info: Dict[str, any], incremental: bool = False,
+                        workers: int = DEFAULT_WORKERS, chunked: bool = False,
+                        packed: bool = False, journal: Optional[BackupJournal] = None,
+                        delta: bool = False, delta_base: Optional[str] = None):
+        """
+        Пакетная загрузка файлов: blob на каждый уникальный файл, затем
+        одно дерево, один коммит и одно обновление ветки
+        
+        Blob-объекты создаются параллельно в пуле потоков. Ветка обновляется
+        только на последнем шаге одним коммитом, поэтому потоки не
+        конкурируют за ее текущее состояние.
+        
+        Args:
+            files_to_backup: Локальные файлы с результатами stat {путь: stat}
+            local_dir: Локальная директория резервной копии
+            cloud_dir: Директория в облаке
+            backup_info: Словарь с результатами, заполняется на месте
+            incremental: Пропускать файлы, совпадающие с деревом в облаке
+            workers: Число параллельных потоков загрузки
+            chunked: Хранить большие файлы блоками в CHUNK_STORE_DIR
+            packed: Упаковывать мелкие файлы в пакеты в PACK_DIR
+            journal: Журнал копии; удаляется после успешного коммита
+            delta: Хранить большие файлы дельтой относительно предыдущей копии
+            delta_base: Директория предыдущей копии (None - cloud_dir)
+        """
+        remote_files = {}
+        stored_chunks = set()
         try:
-            self.upload_file(
-                None,  # Мы создаем файл напрямую
-                metadata_path,
-                "Update backup metadata"
-            )
-        except:
-            pass  # Игнорируем ошибки при сохранении метаданных
+            # Для пакетов дерево нужно всегда: по нему находятся прежний
+            # индекс и устаревшие пакеты
+            if incremental or packed:
+                remote_files = self._get_remote_tree(cloud_dir)
+            if chunked:
+                stored_chunks = {item["sha"] for item in self._get_remote_tree(CHUNK_STORE_DIR).values()}
+            # Прежний манифест: записи файлов, которые не удалось загрузить,
+            # сохраняются из него (в облаке остается их прежняя версия)
+            if incremental or packed:
+                manifest_item = remote_files.get(MANIFEST_NAME)
+                manifest = self._load_manifest(cloud_dir, manifest_item["sha"]) if manifest_item else None
+            else:
+                manifest = self._load_manifest(cloud_dir)
+            old_entries = manifest[1] if manifest else {}
+            # Файл мог сменить формат хранения: без дерева прежнее
+            # представление (блоки, дельта) не удалить. Манифест показывает,
+            # есть ли такие файлы; без манифеста проверить нельзя
+            if not (incremental or packed) and (
+                    chunked or delta or manifest is None
+                    or any("index" in entry or "delta" in entry for entry in old_entries.values())):
+                remote_files = self._get_remote_tree(cloud_dir)
+            # Версии файлов в предыдущей копии, относительно которых строятся дельты
+            delta_entries = {}
+            if delta and delta_base not in (None, cloud_dir):
+                base_manifest = self._load_manifest(delta_base)
+                delta_entries = base_manifest[1] if base_manifest else {}
+            elif delta:
+                delta_entries = old_entries
+        except (github.GithubException, requests.HTTPError) as e:
+            backup_info["message"] = f"Ошибка при получении дерева резервной копии: {str(e)}"
+            return
+        
+        # Blob с таким SHA уже есть в репозитории или был загружен прерванным
+        # запуском этой копии - повторно не загружаем
+        uploaded_blobs = {item["sha"] for item in remote_files.values()} | stored_chunks
+        if journal and journal.blobs:
+            print(f"{Fore.YELLOW}! Продолжаю прерванную копию: уже загружено {len(journal.blobs)} blob{Style.RESET_ALL}")
+            uploaded_blobs |= journal.blobs
+        pending_blobs = {}
+        blobs_lock = threading.Lock()
+        
+        def upload_once(source: Union[str, bytes], blob_sha: str):
+            # Одинаковое содержимое загружаем только один раз: пока один поток
+            # загружает blob, остальные ждут его. SHA запоминается только после
+            # успешной загрузки, чтобы не сослаться на незагруженный blob
+            with blobs_lock:
+                if blob_sha in uploaded_blobs:
+                    return
+                pending = pending_blobs.get(blob_sha)
+                if pending is None:
+                    pending = pending_blobs[blob_sha] = threading.Event()
+                    owner = True
+                else:
+                    owner = False
+            
+            if not owner:
+                pending.wait()
+                with blobs_lock:
+                    if blob_sha in uploaded_blobs:
+                        return
+                # Загрузка в другом потоке не удалась - пробуем сами
+                self._create_blob(source)
+                with blobs_lock:
+                    uploaded_blobs.add(blob_sha)
+                if journal:
+                    journal.add_blob(blob_sha)
+                return
+            
+            try:
+                self._create_blob(source)
+                with blobs_lock:
+                    uploaded_blobs.add(blob_sha)
+                if journal:
+                    journal.add_blob(blob_sha)
+            finally:
+                with blobs_lock:
+                    del pending_blobs[blob_sha]
+                pending.set()
+        
+        def backup_file(file_path: str) -> Tuple[int, Dict[str, any], Dict[str, Dict], Optional[Dict]]:
+            relative_path = os.path.relpath(file_path, os.path.dirname(local_dir))
+            tree_path = manifest_path = relative_path.replace(chr(92), '/')
+            file_size = 0
+            
+            try:
+                stat = files_to_backup[file_path]
+                mode = git_file_mode(file_path, stat)
+                file_size = stat.st_size
+                elements = {}
+                
+                if chunked and file_size > CHUNKING_THRESHOLD:
+                    # Вместо файла хранится индекс его блоков; новые блоки
+                    # загружаются по ходу разбиения. Каждый файл ссылается на
+                    # все свои блоки, которых еще нет в хранилище, даже если
+                    # их загрузил другой поток
+                    index, chunk_shas = self._build_chunk_index(file_path, upload_once)
+                    for chunk_sha in chunk_shas:
+                        if chunk_sha not in stored_chunks:
+                            chunk_path = self._chunk_store_path(chunk_sha)
+                            elements[chunk_path] = {
+                                "path": chunk_path,
+                                "mode": "100644",
+                                "type": "blob",
+                                "sha": chunk_sha
+                            }
+                    source, tree_path = index, f"{tree_path}{CHUNK_INDEX_SUFFIX}"
+                    blob_sha = git_blob_sha(index)
+                    entry = self._manifest_entry(file_path, manifest_path, stat, mode=mode,
+                                                 sha=json.loads(index)["sha"], index=blob_sha)
+                elif delta and file_size > DELTA_THRESHOLD:
+                    if file_size > 100 * 1024 * 1024:  # 100MB
+                        raise ValueError("Файл слишком большой (>100MB)")
+                    # Вместо файла хранится объект дельты; он загружается
+                    # при построении или уже есть в предыдущей копии
+                    file_sha = self._hash_file_cached(file_path, stat)
+                    blob_sha, depth = self._build_delta(file_path, file_sha,
+                                                        delta_entries.get(manifest_path), upload_once)
+                    source, tree_path = None, f"{tree_path}{DELTA_SUFFIX}"
+                    entry = self._manifest_entry(file_path, manifest_path, stat, mode=mode,
+                                                 sha=file_sha, delta=blob_sha, depth=depth)
+                else:
+                    if file_size > 100 * 1024 * 1024:  # 100MB
+                        raise ValueError("Файл слишком большой (>100MB)")
+                    # Хешируем потоково, файл отправляется только при изменении
+                    source, blob_sha = file_path, self._hash_file_cached(file_path, stat)
+                    entry = self._manifest_entry(file_path, manifest_path, stat, mode=mode, sha=blob_sha)
+                
+                if incremental:
+                    remote_item = remote_files.get(tree_path)
+                    if remote_item and remote_item["sha"] == blob_sha and remote_item["mode"] == mode:
+                        return file_size, {
+                            "file": relative_path,
+                            "size": file_size,
+                            "status": "unchanged"
+                        }, {}, entry
+                
+                if source is not None:
+                    upload_once(source, blob_sha)
+                elements[f"{cloud_dir}/{tree_path}"] = {
+                    "path": f"{cloud_dir}/{tree_path}",
+                    "mode": mode,
+                    "type": "blob",
+                    "sha": blob_sha
+                }
+                
+                # Файл сменил формат хранения - убираем прежнее представление
+                plain_path = strip_storage_suffix(tree_path)
+                for other_path in [plain_path] + [f"{plain_path}{suffix}" for suffix in STORAGE_SUFFIXES]:
+                    if other_path != tree_path and other_path in remote_files:
+                        elements[f"{cloud_dir}/{other_path}"] = {
+                            "path": f"{cloud_dir}/{other_path}",
+                            "mode": "100644",
+                            "type": "blob",
+                            "sha": None
+                        }
+                
+                return file_size, {
+                    "file": relative_path,
+                    "size": file_size,
+                    "status": "success"
+                }, elements, entry
+            except Exception as e:
+                return file_size, {
+                    "file": relative_path,
+                    "error": f"Ошибка при загрузке: {str(e)}",
+                    "status": "failed"
+                }, {}, None
+        
+        small_files = {}
+        if packed:
+            small_files = {path: stat for path, stat in files_to_backup.items()
+                           if stat.st_size < PACK_FILE_THRESHOLD}
+        regular_files = sorted(set(files_to_backup) - set(small_files))
+        
+        results = dict(self._run_parallel(backup_file, regular_files, workers, "Загрузка файлов"))
+        
+        # Итоги собираем в порядке обхода директории. Один и тот же блок
+        # может встретиться в нескольких файлах - в дерево он попадает один раз
+        tree_elements = {}
+        if small_files:
+            pack_results, pack_elements = self._backup_packs(
+                small_files, local_dir, cloud_dir, remote_files, incremental, upload_once, workers
+            )
+            results.update(pack_results)
+            tree_elements.update(pack_elements)
+        
+        manifest_entries = {}
+        for file_path in files_to_backup:
+            file_size, detail, elements, entry = results[file_path]
+            backup_info["total_size"] += file_size
+            backup_info["details"].append(detail)
+            if entry:
+                manifest_entries[entry["path"]] = entry
+            if detail["status"] == "success":
+                backup_info["files_uploaded"] += 1
+                tree_elements.update(elements)
+            elif detail["status"] == "unchanged":
+                backup_info["files_skipped"] += 1
+            else:
+                backup_info["files_failed"] += 1
+        
+        # Манифест попадает в тот же коммит, что и данные
+        manifest_entries = merge_manifest(old_entries, manifest_entries, packed)
+        manifest_sha = None
+        if tree_elements or manifest_entries != old_entries:
+            try:
+                manifest_sha = self._save_backup_metadata(backup_info, cloud_dir, manifest_entries, tree_elements)
+            except Exception as e:
+                print(f"{Fore.YELLOW}! Манифест не сохранен: {str(e)}{Style.RESET_ALL}")
+                # Прежний манифест больше не соответствует данным
+                if manifest:
+                    manifest_path = f"{cloud_dir}/{MANIFEST_NAME}"
+                    tree_elements[manifest_path] = {
+                        "path": manifest_path, "mode": "100644", "type": "blob", "sha": None
+                    }
+        
+        if tree_elements:
+            try:
+                backup_info["commit"] = self._commit_tree(
+                    list(tree_elements.values()),
+                    f"Backup: {os.path.basename(os.path.normpath(local_dir))} -> {cloud_dir}",
+                    journal
+                )
+                if journal:
+                    journal.discard()
+                self._record_snapshot(backup_info, cloud_dir, manifest_sha)
+            except (github.GithubException, requests.HTTPError) as e:
+                # Без коммита ни один файл не попал в резервную копию
+                error = f"Ошибка при создании коммита: {str(e)}"
+                for detail in backup_info["details"]:
+                    if detail["status"] == "success":
+                        detail.pop("size", None)
+                        detail["status"] = "failed"
+                        detail["error"] = error
+                backup_info["files_failed"] += backup_info["files_uploaded"]
+                backup_info["files_uploaded"] = 0
+        elif journal:
+            journal.discard()
+        
+        backup_info["success"] = backup_info["files_failed"] == 0
+        backup_info["message"] = f"Загружено {backup_info['files_uploaded']} файлов, ошибок: {backup_info['files_failed']}"
+        if incremental:
+            backup_info["message"] += f", без изменений: {backup_info['files_skipped']}"
+    
+    def _backup_packs(self, small_files: Dict[str, os.stat_result], local_dir: str, cloud_dir: str,
+                      remote_files: Dict[str, any], incremental: bool,
+                      upload_once: Callable[[bytes, str], None], workers: int
+                      ) -> Tuple[Dict[str, Tuple[int, Dict, Dict, Optional[Dict]]], Dict[str, Dict]]:
+        """
+        Упаковка мелких файлов в сжатые пакеты с общим индексом
+        
+        Пакет - сжатый zlib поток содержимого файлов подряд, индекс хранит для
+        каждого пути пакет, смещение и размер в распакованном потоке. В режиме
+        incremental пакеты, все файлы которых не изменились, сохраняются как
+        есть, а файлы остальных пакетов переупаковываются вместе с новыми.
+        
+        Args:
+            small_files: Мелкие локальные файлы с результатами stat {путь: stat}
+            local_dir: Локальная директория резервной копии
+            cloud_dir: Директория в облаке
+            remote_files: Текущее дерево резервной копии
+            incremental: Сохранять пакеты без изменений
+            upload_once: Функция загрузки blob, пропускающая уже загруженные
+            workers: Число параллельных потоков загрузки
+            
+        Returns:
+            Кортеж (результаты по файлам в формате backup_file, элементы дерева)
+        """
+        results = {}
+        index_path = f"{PACK_DIR}/{PACK_INDEX_NAME}"
+        old_entries = {}
+        if index_path in remote_files:
+            old_entries = self._fetch_blob_json(remote_files[index_path]["sha"])["files"]
+        
+        # Текущее состояние мелких файлов: путь в дереве -> (файл, путь, размер, режим, SHA)
+        current = {}
+        for file_path, stat in small_files.items():
+            relative_path = os.path.relpath(file_path, os.path.dirname(local_dir))
+            tree_path = relative_path.replace(chr(92), '/')
+            try:
+                blob_sha = self._hash_file_cached(file_path, stat) if incremental else None
+                current[tree_path] = (file_path, relative_path, stat.st_size,
+                                      git_file_mode(file_path, stat), blob_sha)
+            except OSError as e:
+                results[file_path] = (0, {
+                    "file": relative_path,
+                    "error": f"Ошибка при загрузке: {str(e)}",
+                    "status": "failed"
+                }, {}, None)
+        
+        # Пакет сохраняется, только если все его файлы на месте и не изменились
+        retained = {}
+        if incremental:
+            packs = {}
+            for path, entry in old_entries.items():
+                packs.setdefault(entry["pack"], []).append(path)
+            for pack_paths in packs.values():
+                if all(path in current and current[path][4] == old_entries[path]["sha"]
+                       and current[path][3] == old_entries[path]["mode"] for path in pack_paths):
+                    retained.update({path: old_entries[path] for path in pack_paths})
+        
+        for path in retained:
+            file_path, relative_path, file_size = current[path][:3]
+            results[file_path] = (file_size, {
+                "file": relative_path,
+                "size": file_size,
+                "status": "unchanged"
+            }, {}, self._pack_manifest_entry(file_path, path, retained[path], small_files[file_path]))
+        
+        # Остальные файлы раскладываем по пакетам в порядке путей
+        groups = []
+        group_size = 0
+        for path in sorted(set(current) - set(retained)):
+            if not groups or group_size + current[path][2] > PACK_TARGET_SIZE:
+                groups.append([])
+                group_size = 0
+            groups[-1].append(path)
+            group_size += current[path][2]
+        
+        def build_pack(group_index: int) -> Tuple[Optional[str], Dict[str, Dict], Dict[str, str]]:
+            compressor = zlib.compressobj(9)
+            pack = []
+            entries = {}
+            errors = {}
+            offset = 0
+            for path in groups[group_index]:
+                file_path, _, _, mode, _ = current[path]
+                try:
+                    with open(file_path, 'rb') as f:
+                        content = f.read()
+                except OSError as e:
+                    errors[path] = f"Ошибка при загрузке: {str(e)}"
+                    continue
+                pack.append(compressor.compress(content))
+                entries[path] = {
+                    "pack": None,
+                    "offset": offset,
+                    "size": len(content),
+                    "sha": git_blob_sha(content),
+                    "mode": mode
+                }
+                offset += len(content)
+            
+            if not entries:
+                return None, entries, errors
+            pack.append(compressor.flush())
+            pack = b"".join(pack)
+            pack_sha = git_blob_sha(pack)
+            try:
+                upload_once(pack, pack_sha)
+            except Exception as e:
+                errors.update({path: f"Ошибка при загрузке пакета: {str(e)}" for path in entries})
+                return None, {}, errors
+            for entry in entries.values():
+                entry["pack"] = pack_sha
+            return pack_sha, entries, errors
+        
+        new_entries = dict(retained)
+        new_packs = set()
+        errors = {}
+        for _, (pack_sha, entries, pack_errors) in self._run_parallel(
+            build_pack, range(len(groups)), workers, "Упаковка мелких файлов"
+        ):
+            new_entries.update(entries)
+            errors.update(pack_errors)
+            if pack_sha:
+                new_packs.add(pack_sha)
+        
+        elements = {}
+        index = json.dumps({"format": "packs-v1", "files": dict(sorted(new_entries.items()))},
+                           separators=(",", ":")).encode('utf-8')
+        index_sha = git_blob_sha(index)
+        if index_path not in remote_files or remote_files[index_path]["sha"] != index_sha:
+            try:
+                upload_once(index, index_sha)
+            except Exception as e:
+                errors.update({path: f"Ошибка при загрузке индекса пакетов: {str(e)}"
+                               for path in new_entries if path not in retained})
+                new_entries, new_packs = retained, set()
+            else:
+                elements[f"{cloud_dir}/{index_path}"] = {
+                    "path": f"{cloud_dir}/{index_path}", "mode": "100644", "type": "blob", "sha": index_sha
+                }
+        
+        for pack_sha in new_packs:
+            pack_path = f"{cloud_dir}/{PACK_DIR}/{pack_sha}.pack"
+            elements[pack_path] = {"path": pack_path, "mode": "100644", "type": "blob", "sha": pack_sha}
+        
+        # Убираем пакеты, на которые больше не ссылается индекс, и отдельные
+        # копии файлов, которые теперь хранятся в пакетах
+        if elements:
+            referenced = {f"{PACK_DIR}/{entry['pack']}.pack" for entry in new_entries.values()}
+            for path in remote_files:
+                stale_pack = path.startswith(f"{PACK_DIR}/") and path.endswith(".pack") and path not in referenced
+                if stale_pack or path in new_entries:
+                    elements[f"{cloud_dir}/{path}"] = {
+                        "path": f"{cloud_dir}/{path}", "mode": "100644", "type": "blob", "sha": None
+                    }
+        
+        for path, (file_path, relative_path, file_size, _, _) in current.items():
+            if path in errors:
+                results[file_path] = (file_size, {
+                    "file": relative_path,
+                    "error": errors[path],
+                    "status": "failed"
+                }, {}, None)
+            elif path not in retained:
+                results[file_path] = (file_size, {
+                    "file": relative_path,
+                    "size": file_size,
+                    "status": "success"
+                }, {}, self._pack_manifest_entry(file_path, path, new_entries[path], small_files[file_path]))
+        
+        return results, elements
+    
+    def _pack_manifest_entry(self, file_path: str, path: str, pack_entry: Dict,
+                             stat: Optional[os.stat_result] = None) -> Dict:
+        """Запись манифеста для файла, хранящегося в пакете"""
+        return self._manifest_entry(file_path, path, stat, size=pack_entry["size"], mode=pack_entry["mode"],
+                                    sha=pack_entry["sha"], pack=pack_entry["pack"], offset=pack_entry["offset"])
+    
+    def _extract_pack(self, pack_sha: str, members: Dict[str, Dict],
+                      local_root: str) -> Dict[str, Tuple[bool, str]]:
+        """
+        Потоковая распаковка файлов из пакета
+        
+        Пакет скачивается и распаковывается по мере получения; как только
+        извлечены все нужные файлы, остаток пакета не скачивается. Можно
+        извлекать как отдельные файлы, так и пакет целиком.
+        
+        Args:
+            pack_sha: SHA blob пакета
+            members: Записи индекса извлекаемых файлов {путь: запись}
+            local_root: Локальная директория восстановления
+            
+        Returns:
+            Словарь {путь: (успех, сообщение)}
+        """
+        results = {}
+        if self._blob_cache:
+            # Файлы, уже бывшие в кеше, берутся с диска; если в кеше все,
+            # пакет не скачивается
+            for path, entry in members.items():
+                local_path = os.path.join(local_root, *path.split('/'))
+                if self._blob_cache.copy_to(entry["sha"], local_path, entry):
+                    results[path] = (True, f"Файл восстановлен из кеша: {local_path}")
+            if len(results) == len(members):
+                return results
+        ordered = sorted(((path, entry) for path, entry in members.items() if path not in results),
+                         key=lambda item: item[1]["offset"])
+        position = 0
+        
+        def take_ready():
+            nonlocal position, buffer, buffer_start
+            while position < len(ordered):
+                path, entry = ordered[position]
+                start = entry["offset"] - buffer_start
+                end = start + entry["size"]
+                if end > len(buffer):
+                    break
+                content = buffer[start:end]
+                local_path = os.path.join(local_root, *path.split('/'))
+                if git_blob_sha(content) != entry["sha"]:
+                    results[path] = (False, f"Контрольная сумма не совпадает: {path}")
+                else:
+                    with part_file(local_path) as f:
+                        f.write(content)
+                    if self._blob_cache:
+                        self._blob_cache.add_bytes(entry["sha"], content)
+                    results[path] = (True, f"Файл скачан: {local_path}")
+                position += 1
+            
+            # Начало буфера до следующего нужного файла больше не понадобится
+            drop = len(buffer)
+            if position < len(ordered):
+                drop = min(drop, ordered[position][1]["offset"] - buffer_start)
+            buffer = buffer[drop:]
+            buffer_start += drop
+        
+        def extract():
+            # Повтор начинает распаковку заново, уже записанные файлы перезаписываются
+            nonlocal position, buffer, buffer_start
+            position, buffer, buffer_start = 0, b"", 0
+            decompressor = zlib.decompressobj()
+            url = f"{self.repo.url}/git/blobs/{pack_sha}"
+            with self.metrics.phase("download"), \
+                    self._http_session().get(url, stream=True, timeout=HTTP_TIMEOUT) as response:
+                response.raise_for_status()
+                for raw in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                    buffer += decompressor.decompress(raw)
+                    take_ready()
+                    if position == len(ordered):
+                        return
+                buffer += decompressor.flush()
+                take_ready()
+        
+        buffer = b""
+        buffer_start = 0
+        try:
+            self._scheduler.call(extract)
+            error = f"Файл не найден в пакете {pack_sha}"
+        except Exception as e:
+            error = f"Ошибка при распаковке пакета: {str(e)}"
+        
+        for path, _ in ordered[position:]:
+            results.setdefault(path, (False, error))
+        return results
+    
+    def _fetch_blob_json(self, blob_sha: str) -> Dict:
+        """
+        Скачивание blob с JSON-содержимым (индексы блоков и пакетов)
+        
+        Args:
+            blob_sha: SHA blob-объекта
+            
+        Returns:
+            Разобранный JSON
+        """
+        if self._blob_cache:
+            cached = self._blob_cache.open(blob_sha)
+            if cached:
+                with cached:
+                    return json.load(cached)
+        
+        def fetch():
+            response = self._http_session().get(f"{self.repo.url}/git/blobs/{blob_sha}", timeout=HTTP_TIMEOUT)
+            response.raise_for_status()
+            if self._blob_cache:
+                self._blob_cache.add_bytes(blob_sha, response.content)
+            return response.json()
+        
+        return self._scheduler.call(fetch)
+    
+    def _open_journal(self, local_dir: str, cloud_dir: str) -> BackupJournal:
+        """
+        Журнал резервной копии local_dir -> cloud_dir в текущем репозитории
+        
+        Args:
+            local_dir: Локальная директория
+            cloud_dir: Директория в облаке
+            
+        Returns:
+            Журнал (продолженный, если предыдущий запуск был прерван)
+        """
+        key = {
+            "repo": self.repo.full_name,
+            "branch": self.repo.default_branch,
+            "local_dir": os.path.abspath(local_dir),
+            "cloud_dir": cloud_dir
+        }
+        name = hashlib.sha1(json.dumps(key, sort_keys=True).encode('utf-8')).hexdigest()
+        return BackupJournal(os.path.join(self._cache_dir, "journals", f"{name}.jsonl"), key)
+    
+    def _create_client(self) -> github.Github:
+        """
+        Клиент PyGithub без собственных пауз и повторов
+        
+        Паузы между запросами и повторы при ошибках выполняет общий
+        планировщик, поэтому встроенные механизмы PyGithub отключены,
+        чтобы не ждать дважды.
+        
+        Returns:
+            Клиент PyGithub
+        """
+        client = github.Github(self._token, base_url=self._api_url, retry=None,
+                        seconds_between_requests=None, seconds_between_writes=None)
+        # У PyGithub нет публичных хуков запросов; соединение клиента
+        # постоянное, поэтому учет запросов подключается к его сессии requests
+        try:
+            connection = client._Github__requester._Requester__createConnection()
+            connection.session.hooks["response"].append(self._record_response)
+        except (AttributeError, KeyError, TypeError) as e:
+            # Внутреннее устройство PyGithub изменилось: запросы через PyGithub
+            # не попадут в метрики по эндпоинтам, о чем нужно знать
+            if not self._request_hook_warned:
+                self._request_hook_warned = True
+                print(f"{Fore.YELLOW}! Запросы PyGithub не учитываются в метриках: "
+                      f"{type(e).__name__}: {e}{Style.RESET_ALL}")
+        return client
+    
+    def _record_response(self, response: requests.Response, *args, **kwargs):
+        """Учет ответа API в метриках (хук сессии requests)"""
+        request = response.request
+        self.metrics.record_request(
+            request.method, request.url, response.status_code, response.elapsed.total_seconds(),
+            int(response.headers.get("Content-Length") or 0),
+            int(request.headers.get("Content-Length") or 0)
+        )
+    
+    def get_rate_budget(self) -> Dict[str, any]:
+        """
+        Остаток лимита запросов GitHub API и состояние планировщика
+        
+        Если ни один ответ с заголовками лимита еще не получен, лимит
+        запрашивается отдельно (запрос к /rate_limit не расходует лимит).
+        
+        Returns:
+            Словарь с остатком лимита, временем сброса, текущей
+            параллельностью и числом запросов, повторов и ожиданий лимита
+        """
+        if self._scheduler.remaining is None:
+            try:
+                core = self._scheduler.call(self.github.get_rate_limit).core
+                self._scheduler.update(core.remaining, core.limit, core.reset.timestamp())
+            except github.GithubException:
+                pass
+        return self._scheduler.budget()
+    
+    def _open_repo(self, key: str, info: Dict, repo=None):
+        """
+        Открытие репозитория по сведениям из RepoCache
+        
+        Args:
+            key: Ключ репозитория в RepoCache
+            info: Сведения о репозитории
+            repo: Уже полученный объект репозитория PyGithub
+        """
+        full_name = info["full_name"]
+        self.repo = _LazyRepo(info, lambda: repo or self.github.get_repo(full_name, lazy=True))
+        self._repo_key = key
+        self._head = info.get("head")
+        self._catalog = None
+    
+    def _branch_head(self, refresh: bool = False) -> Tuple[str, str]:
+        """
+        Вершина ветки по умолчанию
+        
+        Args:
+            refresh: Запросить вершину, даже если она известна
+            
+        Returns:
+            Кортеж (SHA коммита, SHA его дерева)
+        """
+        if refresh or not self._head:
+            ref = self._get_json(f"{self.repo.url}/git/ref/heads/{quote(self.repo.default_branch)}")
+            commit_sha = ref["object"]["sha"]
+            tree_sha = self._get_json(f"{self.repo.url}/git/commits/{commit_sha}")["tree"]["sha"]
+            self._set_head(commit_sha, tree_sha)
+        return self._head["commit"], self._head["tree"]
+    
+    def _set_head(self, commit_sha: Optional[str], tree_sha: Optional[str] = None):
+        """
+        Запоминание вершины ветки по умолчанию
+        
+        Args:
+            commit_sha: SHA коммита или None, если вершина изменилась
+                неизвестным образом (например, через API contents)
+            tree_sha: SHA дерева коммита
+        """
+        self._head = {"commit": commit_sha, "tree": tree_sha} if commit_sha else None
+        self._repo_cache.set_head(self._repo_key, self._head)
+    
+    def _worker_repo(self):
+        """
+        Репозиторий с отдельным клиентом для текущего потока
+        
+        Клиент живет столько же, сколько поток, поэтому его HTTP-соединение
+        (keep-alive) переиспользуется для всех запросов этого потока.
+        
+        Returns:
+            Объект репозитория PyGithub
+        """
+        full_name = self.repo.full_name
+        if getattr(self._local, "repo_name", None) != full_name:
+            self._local.repo = self._create_client().get_repo(full_name, lazy=True)
+            self._local.repo_name = full_name
+        return self._local.repo
+    
+    def _run_parallel(self, func: Callable, items: Iterable, workers: int,
+                      desc: str) -> Iterator[Tuple[any, any]]:
+        """
+        Выполнение функции для элементов в пуле потоков с общим прогресс-баром
+        
+        Функция должна сама перехватывать ошибки отдельных элементов, чтобы
+        сбой одного файла не прерывал обработку остальных.
+        
+        Args:
+            func: Функция одного аргумента
+            items: Элементы для обработки
+            workers: Максимальное число потоков
+            desc: Подпись прогресс-бара
+            
+        Returns:
+            Итератор пар (элемент, результат) в порядке завершения
+        """
+        # Фазы и запросы рабочих потоков относятся к операции вызывающего потока
+        func = self.metrics.bind(func)
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            futures = {executor.submit(func, item): item for item in items}
+            try:
+                for future in tqdm.tqdm(as_completed(futures), total=len(futures), desc=desc, disable=not futures):
+                    yield futures[future], future.result()
+            except BaseException:
+                # При прерывании (Ctrl-C) не начинаем оставшиеся элементы
+                for future in futures:
+                    future.cancel()
+                raise
+    
+    def _download_blob(self, blob_sha: str, local_path: str,
+                           attributes: Optional[Dict] = None) -> Tuple[bool, str]:
+        """
+        Скачивание blob по SHA в локальный файл (безопасно для рабочих потоков)
+        
+        Args:
+            blob_sha: SHA blob-объекта
+            local_path: Путь для сохранения локального файла
+            attributes: Права и время изменения файла (запись манифеста); в режиме
+                жестких ссылок файл берется из кеша, только если они совпадают
+            
+        Returns:
+            Кортеж (успех, сообщение)
+        """
+        try:
+            if self._blob_cache and self._blob_cache.copy_to(blob_sha, local_path, attributes):
+                return True, f"Файл восстановлен из кеша: {local_path}"
+            self._stream_to_file(f"{self.repo.url}/git/blobs/{blob_sha}", local_path)
+            if self._blob_cache:
+                # Объект кеша получает права и время файла, иначе на него
+                # нельзя будет ссылаться при следующих восстановлениях
+                if attributes:
+                    apply_file_attributes(local_path, attributes)
+                self._blob_cache.add_file(blob_sha, local_path)
+            return True, f"Файл скачан: {local_path}"
+        except requests.HTTPError as e:
+            if e.response is not None and e.response.status_code == 404:
+                return False, f"Blob не найден в облаке: {blob_sha}"
+            return False, f"Ошибка при скачивании: {str(e)}"
+        except Exception as e:
+            return False, f"Ошибка при скачивании: {str(e)}"
+    
+    def _http_session(self) -> requests.Session:
+        """
+        HTTP-сессия текущего потока для запросов в обход PyGithub
+        
+        Returns:
+            Сессия requests с авторизацией и keep-alive соединениями
+        """
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            session.headers.update({
+                "Authorization": f"token {self._token}",
+                "Accept": "application/vnd.github.raw",
+            })
+            # Заголовки лимита из каждого ответа передаются планировщику
+            session.hooks["response"].append(
+                lambda response, *args, **kwargs: self._scheduler.observe(response.headers)
+            )
+            session.hooks["response"].append(self._record_response)
+            self._local.session = session
+        return session
+    
+    def _stream_to_file(self, url: str, local_path: str) -> int:
+        """
+        Потоковое скачивание сырого содержимого в файл блоками фиксированного размера
+        
+        Args:
+            url: Адрес API, отдающий содержимое (contents или git/blobs)
+            local_path: Путь для сохранения локального файла
+            
+        Returns:
+            Число записанных байт
+        """
+        def download() -> int:
+            # Повтор начинается с чистого временного файла
+            with part_file(local_path) as f:
+                return self._stream_into(url, f)
+        
+        return self._scheduler.call(download)
+    
+    @timed_phase("download")
+    def _stream_into(self, url: str, f: BinaryIO, sha=None) -> int:
+        """
+        Потоковое скачивание сырого содержимого в открытый файл
+        
+        Args:
+            url: Адрес API, отдающий содержимое
+            f: Файл, открытый на запись в двоичном режиме
+            sha: Объект хеша, который обновляется скачанными данными
+            
+        Returns:
+            Число записанных байт
+        """
+        written = 0
+        with self._http_session().get(url, stream=True, timeout=HTTP_TIMEOUT) as response:
+            response.raise_for_status()
+            for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                f.write(chunk)
+                if sha is not None:
+                    sha.update(chunk)
+                written += len(chunk)
+        return written
+    
+    def _stream_chunk(self, url: str, f: BinaryIO, sha) -> any:
+        """
+        Дописывание блока в файл с возможностью повтора
+        
+        При повторе файл обрезается до начала блока, а хеш продолжается
+        от состояния до блока.
+        
+        Args:
+            url: Адрес API, отдающий содержимое блока
+            f: Файл, открытый на запись в двоичном режиме
+            sha: Объект хеша файла до блока (не изменяется)
+            
+        Returns:
+            Объект хеша файла с учетом блока
+        """
+        start = f.tell()
+        chunk_sha = sha.copy()
+        try:
+            self._stream_into(url, f, chunk_sha)
+        except BaseException:
+            f.seek(start)
+            f.truncate()
+            raise
+        return chunk_sha
+    
+    def _download_chunked(self, index_sha: str, local_path: str,
+                              attributes: Optional[Dict] = None) -> Tuple[bool, str]:
+        """
+        Сборка файла из блоков по индексу с потоковой записью на диск
+        
+        Args:
+            index_sha: SHA blob с индексом блоков
+            local_path: Путь для сохранения локального файла
+            attributes: Права и время изменения файла (запись манифеста); в режиме
+                жестких ссылок файл берется из кеша, только если они совпадают
+            
+        Returns:
+            Кортеж (успех, сообщение)
+        """
+        try:
+            index = self._fetch_blob_json(index_sha)
+            # Собранный файл кешируется целиком под своим SHA
+            if self._blob_cache and self._blob_cache.copy_to(index["sha"], local_path, attributes):
+                return True, f"Файл восстановлен из кеша: {local_path}"
+            
+            file_sha = hashlib.sha1(f"blob {index['size']}\0".encode('ascii'))
+            with part_file(local_path) as f:
+                for chunk_sha, chunk_size in index["chunks"]:
+                    file_sha = self._scheduler.call(
+                        self._stream_chunk, f"{self.repo.url}/git/blobs/{chunk_sha}", f, file_sha
+                    )
+                if file_sha.hexdigest() != index["sha"]:
+                    raise IOError("Контрольная сумма собранного файла не совпадает")
+            if self._blob_cache:
+                # Объект кеша получает права и время файла, иначе на него
+                # нельзя будет ссылаться при следующих восстановлениях
+                if attributes:
+                    apply_file_attributes(local_path, attributes)
+                self._blob_cache.add_file(index["sha"], local_path)
+            
+            return True, f"Файл скачан: {local_path}"
+        except requests.HTTPError as e:
+            if e.response is not None and e.response.status_code == 404:
+                return False, f"Блок не найден в облаке: {e.response.url}"
+            return False, f"Ошибка при скачивании: {str(e)}"
+        except Exception as e:
+            return False, f"Ошибка при скачивании: {str(e)}"
+    
+    def _build_chunk_index(self, file_path: str,
+                           upload_once: Callable[[bytes, str], bool]) -> Tuple[bytes, List[str]]:
+        """
+        Разбиение файла на блоки по содержимому с загрузкой новых блоков
+        
+        Args:
+            file_path: Путь к локальному файлу
+            upload_once: Функция загрузки blob, пропускающая уже загруженные
+            
+        Returns:
+            Кортеж (содержимое индекса, SHA всех блоков файла без повторов)
+        """
+        file_size = os.path.getsize(file_path)
+        file_sha = hashlib.sha1(f"blob {file_size}\0".encode('ascii'))
+        chunks = []
+        
+        with open(file_path, 'rb') as f:
+            for chunk in chunking.iter_chunks(f):
+                file_sha.update(chunk)
+                chunk_sha = git_blob_sha(chunk)
+                upload_once(chunk, chunk_sha)
+                chunks.append([chunk_sha, len(chunk)])
+        
+        index = {
+            "format": "chunked-v1",
+            "size": sum(size for _, size in chunks),
+            "sha": file_sha.hexdigest(),
+            "chunks": chunks
+        }
+        if index["size"] != file_size:
+            raise IOError("Файл изменился во время загрузки")
+        return json.dumps(index, separators=(",", ":")).encode('ascii'), list(dict.fromkeys(sha for sha, _ in chunks))
+    
+    def _download_delta(self, object_sha: str, local_path: str,
+                            attributes: Optional[Dict] = None) -> Tuple[bool, str]:
+        """
+        Сборка файла по цепочке объектов дельты с потоковой записью на диск
+        
+        Объекты цепочки скачиваются от новой версии к старой до объекта,
+        хранящего файл целиком, или до версии, которая есть в локальном
+        кеше blob, затем версии собираются в обратном порядке.
+        
+        Args:
+            object_sha: SHA blob объекта дельты
+            local_path: Путь для сохранения локального файла
+            attributes: Права и время изменения файла (запись манифеста); в режиме
+                жестких ссылок файл берется из кеша, только если они совпадают
+            
+        Returns:
+            Кортеж (успех, сообщение)
+        """
+        try:
+            os.makedirs(os.path.dirname(local_path) or ".", exist_ok=True)
+            with tempfile.TemporaryDirectory(prefix=".delta-", dir=os.path.dirname(local_path) or ".") as tmp_dir:
+                objects = []
+                base = None
+                while True:
+                    object_path = os.path.join(tmp_dir, object_sha)
+                    self._stream_to_file(f"{self.repo.url}/git/blobs/{object_sha}", object_path)
+                    with open(object_path, 'rb') as f:
+                        header = delta_encoding.read_header(f)
+                    if not objects:
+                        # Собранный файл кешируется целиком под своим SHA
+                        file_sha = header["sha"]
+                        if self._blob_cache and self._blob_cache.copy_to(file_sha, local_path, attributes):
+                            return True, f"Файл восстановлен из кеша: {local_path}"
+                    objects.append(object_path)
+                    if not header["base"]:
+                        break
+                    # Собранная прежняя версия может быть в локальном кеше
+                    base = self._blob_cache.open(header["base"]["sha"]) if self._blob_cache else None
+                    if base:
+                        break
+                    object_sha = header["base"]["object"]
+                
+                with self.metrics.phase("delta_apply"), part_file(local_path) as f:
+                    delta_encoding.rebuild(objects[::-1], f, base)
+            if self._blob_cache:
+                # Объект кеша получает права и время файла, иначе на него
+                # нельзя будет ссылаться при следующих восстановлениях
+                if attributes:
+                    apply_file_attributes(local_path, attributes)
+                self._blob_cache.add_file(file_sha, local_path)
+            
+            return True, f"Файл скачан: {local_path}"
+        except requests.HTTPError as e:
+            if e.response is not None and e.response.status_code == 404:
+                return False, f"Объект дельты не найден в облаке: {e.response.url}"
+            return False, f"Ошибка при скачивании: {str(e)}"
+        except Exception as e:
+            return False, f"Ошибка при сборке файла: {str(e)}"
+    
+    def _build_delta(self, file_path: str, file_sha: str, base_entry: Optional[Dict],
+                     upload_once: Callable[[str, str], None]) -> Tuple[str, int]:
+        """
+        Построение и загрузка объекта дельты файла
+        
+        Дельта строится по подписи версии файла в предыдущей копии (читается
+        только заголовок ее объекта). Если предыдущей версии нет, она
+        хранится не дельтой или цепочка достигла DELTA_MAX_DEPTH, файл
+        записывается целиком; неизменившийся файл ссылается на прежний объект.
+        
+        Args:
+            file_path: Путь к локальному файлу
+            file_sha: SHA blob содержимого файла
+            base_entry: Запись файла в манифесте предыдущей копии
+            upload_once: Функция загрузки blob, пропускающая уже загруженные
+            
+        Returns:
+            Кортеж (SHA blob объекта дельты, глубина цепочки)
+        """
+        base_object = base_entry.get("delta") if base_entry else None
+        if base_object and base_entry["sha"] == file_sha:
+            return base_object, base_entry["depth"]
+        
+        base = None
+        if base_object and base_entry["depth"] < DELTA_MAX_DEPTH:
+            base = self._fetch_delta_header(base_object)
+        
+        fd, tmp_path = tempfile.mkstemp(prefix="delta-", suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'wb') as out, open(file_path, 'rb') as src:
+                with self.metrics.phase("delta_encode"):
+                    header = delta_encoding.encode(src, out, base, base_object)
+            if header["sha"] != file_sha:
+                raise IOError("Файл изменился во время загрузки")
+            object_sha = hash_file(tmp_path)
+            upload_once(tmp_path, object_sha)
+        finally:
+            os.remove(tmp_path)
+        return object_sha, header["depth"]
+    
+    def _fetch_delta_header(self, object_sha: str) -> Dict:
+        """
+        Чтение заголовка объекта дельты без скачивания данных
+        
+        Args:
+            object_sha: SHA blob объекта дельты
+            
+        Returns:
+            Заголовок объекта
+        """
+        cached = self._blob_cache.open(object_sha) if self._blob_cache else None
+        if cached:
+            with cached:
+                return delta_encoding.read_header(cached)
+        
+        def fetch() -> Dict:
+            # Соединение закрывается после первой строки, данные не читаются
+            url = f"{self.repo.url}/git/blobs/{object_sha}"
+            with self._http_session().get(url, stream=True, timeout=HTTP_TIMEOUT) as response:
+                response.raise_for_status()
+                return delta_encoding.parse_header(next(response.iter_lines(chunk_size=DOWNLOAD_CHUNK_SIZE)))
+        
+        return self._scheduler.call(fetch)
+    
+    @staticmethod
+    def _chunk_store_path(chunk_sha: str) -> str:
+        """Путь блока в общем хранилище блоков"""
+        return f"{CHUNK_STORE_DIR}/{chunk_sha[:2]}/{chunk_sha}"
+    
+    @timed_phase("tree_load")
+    def _get_remote_tree(self, cloud_dir: str, missing_ok: bool = True,
+                         rev: Optional[str] = None) -> Dict[str, any]:
+        """
+        Получение всех файлов директории в облаке одним рекурсивным запросом
+        
+        SHA поддерева разрешается на сервере по выражению "<ветка>:<путь>",
+        поэтому отдельные запросы для промежуточных директорий не нужны.
+        
+        Args:
+            cloud_dir: Директория в облаке
+            missing_ok: Вернуть пустой словарь, если директории нет
+            rev: Ревизия (SHA коммита, тег или ветка); по умолчанию - ветка по умолчанию
+            
+        Returns:
+            Словарь {путь относительно cloud_dir: элемент дерева git}
+        """
+        tree_ish = quote(f"{rev or self.repo.default_branch}:{cloud_dir.strip('/')}", safe="/:")
+        try:
+            tree = self._get_json(f"{self.repo.url}/git/trees/{tree_ish}?recursive=1")
+        except requests.HTTPError as e:
+            if missing_ok and e.response is not None and e.response.status_code == 404:
+                return {}
+            raise
+        
+        return self._collect_tree_files(tree)
+    
+    def _collect_tree_files(self, tree: Dict, prefix: str = "") -> Dict[str, Dict]:
+        """
+        Сбор файлов из рекурсивного дерева с дозагрузкой при усечении
+        
+        Если GitHub усек ответ (слишком много элементов), непокрытые
+        поддеревья запрашиваются отдельно, каждое снова рекурсивно.
+        
+        Args:
+            tree: Ответ API дерева git, полученный с recursive=1
+            prefix: Префикс пути дерева относительно корня копии
+            
+        Returns:
+            Словарь {путь: элемент дерева git (path, mode, type, sha, size)}
+        """
+        if not tree.get("truncated"):
+            return {f"{prefix}{item['path']}": item for item in tree["tree"] if item["type"] == "blob"}
+        
+        # Усеченный ответ может быть неполным на любом уровне: берем верхний
+        # уровень без рекурсии и запрашиваем каждое поддерево отдельно
+        result = {}
+        for item in self._get_json(f"{self.repo.url}/git/trees/{tree['sha']}")["tree"]:
+            if item["type"] == "blob":
+                result[f"{prefix}{item['path']}"] = item
+            elif item["type"] == "tree":
+                subtree = self._get_json(f"{self.repo.url}/git/trees/{item['sha']}?recursive=1")
+                result.update(self._collect_tree_files(subtree, f"{prefix}{item['path']}/"))
+        return result
+    
+    def _get_json(self, url: str, cache: bool = True) -> any:
+        """
+        GET-запрос метаданных с условной перепроверкой по ETag
+        
+        Ответ хранится в дисковом кеше вместе с ETag; повторный запрос
+        передает If-None-Match, и при ответе 304 (не расходует лимит API)
+        тело берется из кеша. Содержимое файлов из ответа contents не
+        сохраняется и не возвращается - нужны только метаданные.
+        
+        Args:
+            url: Адрес API
+            cache: Использовать кеш ответов
+            
+        Returns:
+            Разобранный JSON ответа
+        """
+        def fetch():
+            cached = self._http_cache.get(url) if cache else None
+            headers = {"Accept": "application/vnd.github+json"}
+            if cached:
+                headers["If-None-Match"] = cached["etag"]
+            response = self._http_session().get(url, headers=headers, timeout=HTTP_TIMEOUT)
+            if cached and response.status_code == 304:
+                return cached["body"]
+            response.raise_for_status()
+            
+            body = response.json()
+            if isinstance(body, dict) and body.get("type") == "file":
+                body.pop("content", None)
+                body.pop("encoding", None)
+            if cache and response.headers.get("ETag"):
+                self._http_cache.put(url, response.headers["ETag"], body)
+            return body
+        
+        return self._scheduler.call(fetch)
+    
+    def _contents_url(self, cloud_path: str) -> str:
+        """Адрес API contents для пути в репозитории"""
+        return f"{self.repo.url}/contents/{quote(cloud_path.strip('/'))}"
+    
+    def _create_blob(self, source: Union[str, bytes]) -> str:
+        """
+        Создание blob-объекта с потоковой отправкой (безопасно для рабочих потоков)
+        
+        Args:
+            source: Путь к локальному файлу или содержимое в памяти
+            
+        Returns:
+            SHA созданного blob
+        """
+        def create() -> str:
+            # Тело открывается заново при каждом повторе
+            body = Base64JsonBody(source, {"encoding": "base64"})
+            blob = self._upload_stream("POST", f"{self.repo.url}/git/blobs", body)
+            if blob["sha"] != body.blob_sha:
+                raise IOError(f"SHA загруженного blob не совпадает: {blob['sha']} != {body.blob_sha}")
+            return blob["sha"]
+        
+        return self._scheduler.call(create)
+    
+    @timed_phase("upload")
+    def _upload_stream(self, method: str, url: str, body,
+                       fields: Optional[Dict[str, str]] = None) -> Dict:
+        """
+        JSON-запрос с содержимым файла в поле content, кодируемым по мере отправки
+        
+        Args:
+            method: HTTP-метод
+            url: Адрес API
+            body: Путь к файлу, содержимое или готовое тело Base64JsonBody
+            fields: Остальные поля JSON-объекта (если передан путь к файлу)
+            
+        Returns:
+            Ответ API в виде словаря
+        """
+        if not isinstance(body, Base64JsonBody):
+            body = Base64JsonBody(body, fields or {})
+        
+        try:
+            response = self._http_session().request(
+                method, url, data=body, timeout=HTTP_TIMEOUT,
+                headers={"Content-Type": "application/json", "Accept": "application/vnd.github+json"}
+            )
+        finally:
+            body.close()
+        response.raise_for_status()
+        return response.json()
+    
+    @timed_phase("commit")
+    def _commit_tree(self, tree_elements: List[Dict], message: str,
+                     journal: Optional[BackupJournal] = None) -> str:
+        """
+        Создание одного коммита с изменениями поверх текущей ветки по умолчанию
+        
+        Args:
+            tree_elements: Элементы дерева (path, mode, type, sha; sha=None удаляет путь)
+            message: Сообщение коммита
+            journal: Журнал копии: части дерева, созданные прерванным
+                запуском, берутся из него, новые записываются в него
+            
+        Returns:
+            SHA созданного коммита
+        """
+        call = self._scheduler.call
+        # Объекты PyGithub по SHA без запроса к API
+        make = self.github.create_from_raw_data
+        branch = self.repo.default_branch
+        ref = make(github.GitRef.GitRef, {
+            "ref": f"refs/heads/{branch}",
+            "url": f"{self.repo.url}/git/refs/heads/{quote(branch)}"
+        })
+        chunks = [tree_elements[i:i + TREE_CHUNK_SIZE] for i in range(0, len(tree_elements), TREE_CHUNK_SIZE)]
+        
+        # Сохраненная вершина может устареть, если ветку продвинул другой
+        # клиент: тогда ветка не перематывается (422) и коммит повторяется
+        # поверх актуальной вершины
+        for attempt in range(2):
+            head_sha, tree_sha = self._branch_head(refresh=attempt > 0)
+            
+            # Большие деревья создаются частями, каждая поверх предыдущей
+            start = 0
+            if journal and journal.trees:
+                for chunk in chunks:
+                    known_sha = journal.trees.get(journal.tree_key(tree_sha, chunk))
+                    if known_sha is None:
+                        break
+                    tree_sha = known_sha
+                    start += 1
+            tree = make(github.GitTree.GitTree, {"sha": tree_sha})
+            for chunk in chunks[start:]:
+                base_sha = tree.sha
+                tree = call(self.repo.create_git_tree,
+                            [github.InputGitTreeElement(**element) for element in chunk], base_tree=tree)
+                if journal:
+                    journal.add_tree(journal.tree_key(base_sha, chunk), tree.sha)
+            
+            commit = call(self.repo.create_git_commit, message, tree, [make(github.GitCommit.GitCommit, {"sha": head_sha})])
+            try:
+                call(ref.edit, commit.sha)
+            except github.GithubException as e:
+                if e.status != 422 or attempt:
+                    raise
+                continue
+            self._set_head(commit.sha, tree.sha)
+            return commit.sha
+    
+    def _hash_file_cached(self, file_path: str, stat: Optional[os.stat_result] = None) -> str:
+        """
+        SHA-1 blob-объекта git для файла с использованием кеша хешей
+        
+        Файл читается, только если его (inode, размер, mtime) нет в кеше.
+        
+        Args:
+            file_path: Путь к локальному файлу
+            stat: Результат stat файла, если уже известен
+            
+        Returns:
+            SHA blob в шестнадцатеричном виде
+        """
+        stat = stat or os.stat(file_path)
+        blob_sha = self._hash_cache.get(stat)
+        if blob_sha is None:
+            hashed_at = time.time()
+            with self.metrics.phase("hash"):
+                blob_sha = hash_file(file_path, stat.st_size)
+            self._remember_hash(file_path, stat, blob_sha, hashed_at)
+        return blob_sha
+    
+    def _remember_hash(self, file_path: str, stat: os.stat_result, blob_sha: str, hashed_at: float):
+        """Запись SHA в кеш, если файл не изменился во время хеширования"""
+        try:
+            current = os.stat(file_path)
+        except OSError:
+            return
+        if (current.st_ino, current.st_size, current.st_mtime_ns) == (stat.st_ino, stat.st_size, stat.st_mtime_ns):
+            self._hash_cache.put(stat, blob_sha, hashed_at)
+    
+    @timed_phase("manifest_save")
+    def _save_backup_metadata(self, backup_info: Dict, cloud_dir: str, entries: Dict[str, Dict],
+                              tree_elements: Dict[str, Dict]) -> str:
+        """
+        Сохранение манифеста резервной копии
+        
+        Манифест - JSON Lines: первая строка - заголовок копии, далее по
+        строке на файл (путь, размер, mtime, режим, SHA содержимого и способ
+        хранения). Blob манифеста загружается сразу, а элемент дерева
+        добавляется в tree_elements, чтобы манифест попал в один коммит с данными.
+        
+        Args:
+            backup_info: Информация о резервной копии
+            cloud_dir: Директория в облаке
+            entries: Записи файлов {путь относительно cloud_dir: запись}
+            tree_elements: Элементы дерева коммита, дополняются на месте
+            
+        Returns:
+            SHA blob манифеста
+        """
+        header = {
+            "format": MANIFEST_FORMAT,
+            "backup_dir": cloud_dir,
+            "timestamp": backup_info["timestamp"],
+            "source_dir": backup_info["source_dir"],
+            "files_count": len(entries),
+            "total_size": sum(entry["size"] for entry in entries.values()),
+            "status": "success" if backup_info["files_failed"] == 0 else "partial"
+        }
+        lines = [header] + [entries[path] for path in sorted(entries)]
+        content = "".join(json.dumps(line, ensure_ascii=False, separators=(",", ":")) + "\n" for line in lines)
+        
+        manifest_path = f"{cloud_dir}/{MANIFEST_NAME}"
+        manifest_sha = self._create_blob(content.encode('utf-8'))
+        tree_elements[manifest_path] = {
+            "path": manifest_path,
+            "mode": "100644",
+            "type": "blob",
+            "sha": manifest_sha
+        }
+        backup_info["manifest"] = manifest_path
+        return manifest_sha
+    
+    @timed_phase("manifest_load")
+    def _load_manifest(self, cloud_dir: str, manifest_sha: Optional[str] = None,
+                       rev: Optional[str] = None) -> Optional[Tuple[Dict, Dict[str, Dict]]]:
+        """
+        Чтение манифеста резервной копии (потоково, построчно)
+        
+        Args:
+            cloud_dir: Директория в облаке
+            manifest_sha: SHA blob манифеста, если уже известен
+            rev: Ревизия, в которой ищется манифест (по умолчанию - ветка по умолчанию)
+            
+        Returns:
+            Кортеж (заголовок, {путь: запись файла}) или None, если манифеста нет
+        """
+        if manifest_sha is None:
+            url = self._contents_url(f"{cloud_dir.strip('/')}/{MANIFEST_NAME}")
+            if rev:
+                url += f"?ref={quote(rev)}"
+            try:
+                manifest_sha = self._get_json(url)["sha"]
+            except requests.HTTPError as e:
+                if e.response is not None and e.response.status_code == 404:
+                    return None
+                raise
+        
+        def parse(lines: Iterator[bytes]) -> Optional[Tuple[Dict, Dict[str, Dict]]]:
+            header = json.loads(next(lines, b"{}"))
+            if header.get("format") != MANIFEST_FORMAT:
+                return None
+            entries = {}
+            for line in lines:
+                if line.strip():
+                    entry = json.loads(line)
+                    entries[entry["path"]] = entry
+            return header, entries
+        
+        cached = self._blob_cache.open(manifest_sha) if self._blob_cache else None
+        if cached:
+            with cached:
+                return parse(iter(cached))
+        
+        def fetch() -> Optional[Tuple[Dict, Dict[str, Dict]]]:
+            url = f"{self.repo.url}/git/blobs/{manifest_sha}"
+            with self._http_session().get(url, stream=True, timeout=HTTP_TIMEOUT) as response:
+                response.raise_for_status()
+                if not self._blob_cache:
+                    return parse(response.iter_lines())
+                content = response.content
+            self._blob_cache.add_bytes(manifest_sha, content)
+            return parse(iter(content.splitlines()))
+        
+        return self._scheduler.call(fetch)
+    
+    def _manifest_entry(self, file_path: str, path: str,
+                        stat: Optional[os.stat_result] = None, **fields) -> Dict:
+        """
+        Запись манифеста для локального файла
+        
+        Args:
+            file_path: Путь к локальному файлу
+            path: Путь файла относительно директории копии в облаке
+            stat: Результат stat файла, если уже известен
+            **fields: Поля записи (sha, способ хранения; size и mode заменяют значения с диска)
+            
+        Returns:
+            Запись манифеста
+        """
+        stat = stat or os.stat(file_path)
+        entry = {
+            "path": path,
+            "size": fields.pop("size", stat.st_size),
+            "mtime": stat.st_mtime,
+            "mode": fields.pop("mode", None) or git_file_mode(file_path, stat)
+        }
+        entry.update(fields)
+        return entry
     
     def get_repo_info(self) -> Dict:
         """
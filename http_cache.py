@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Дисковый кеш ответов HTTP для условных запросов (ETag)
+Ответ хранится вместе с его ETag; при повторном запросе клиент передает
+If-None-Match и при ответе 304 берет тело из кеша. Ответы 304 GitHub не
+учитывает в лимите запросов. Размер кеша ограничен, при переполнении
+удаляются давно не использованные записи (LRU)
+"""
+
+import hashlib
+import json
+import os
+import threading
+from typing import Any, Dict, Optional
+
+# Ограничение размера кеша по умолчанию
+DEFAULT_MAX_SIZE = 64 * 1024 * 1024
+
+
+class ETagCache:
+    """
+    Кеш тел ответов по URL с ETag и вытеснением LRU
+
+    Каждая запись - отдельный JSON-файл, имя которого - хеш ключа. Время
+    последнего использования хранится во времени изменения файла, поэтому
+    порядок LRU общий для всех процессов, работающих с одной директорией.
+    Запись выполняется через временный файл и атомарное переименование.
+    """
+
+    def __init__(self, directory: str, max_size: int = DEFAULT_MAX_SIZE):
+        """
+        Инициализация кеша
+
+        Args:
+            directory: Директория кеша (создается при необходимости)
+            max_size: Максимальный суммарный размер записей в байтах
+        """
+        self.directory = directory
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._size = None
+        os.makedirs(directory, exist_ok=True)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Получение записи кеша
+
+        Args:
+            key: Ключ записи (URL запроса)
+
+        Returns:
+            Словарь {"etag": ..., "body": ...} или None, если записи нет
+        """
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        if entry.get("key") != key:
+            return None
+        return entry
+
+    def put(self, key: str, etag: str, body: Any):
+        """
+        Сохранение записи кеша с вытеснением старых при переполнении
+
+        Args:
+            key: Ключ записи (URL запроса)
+            etag: ETag ответа
+            body: Тело ответа (JSON-совместимое)
+        """
+        data = json.dumps({"key": key, "etag": etag, "body": body}, separators=(",", ":")).encode('utf-8')
+        if len(data) > self.max_size:
+            return
+
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with self._lock:
+            size = self._current_size()
+            try:
+                size -= os.path.getsize(path)
+            except OSError:
+                pass
+            try:
+                with open(tmp_path, 'wb') as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+            except OSError:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                return
+            self._size = size + len(data)
+            if self._size > self.max_size:
+                self._evict()
+
+    def clear(self):
+        """Удаление всех записей кеша"""
+        with self._lock:
+            for entry in os.scandir(self.directory):
+                if entry.name.endswith(".json"):
+                    os.remove(entry.path)
+            self._size = 0
+
+    def _path(self, key: str) -> str:
+        """Путь файла записи по ключу"""
+        return os.path.join(self.directory, hashlib.sha256(key.encode('utf-8')).hexdigest() + ".json")
+
+    def _current_size(self) -> int:
+        """Суммарный размер записей (вычисляется один раз, далее поддерживается при записи)"""
+        if self._size is None:
+            self._size = sum(entry.stat().st_size for entry in os.scandir(self.directory)
+                             if entry.name.endswith(".json"))
+        return self._size
+
+    def _evict(self):
+        """Удаление давно не использованных записей до 3/4 ограничения размера"""
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".json"):
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        # Другие процессы тоже пишут в кеш, поэтому размер пересчитывается по диску
+        self._size = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if self._size <= self.max_size * 3 // 4:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            self._size -= size
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Журнал прерванных резервных копий
+Журнал хранит SHA уже загруженных blob-объектов и уже созданных частей
+дерева, поэтому повторный запуск прерванной резервной копии не загружает их
+заново и завершается одним коммитом. После успешного коммита журнал удаляется
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Dict, List
+
+JOURNAL_FORMAT = "journal-v1"
+
+# Blob-объекты, на которые не ссылается ни один коммит, могут быть удалены
+# сборщиком мусора GitHub, поэтому слишком старый журнал не используется
+MAX_AGE = 24 * 3600
+
+
+class BackupJournal:
+    """
+    Журнал одной резервной копии (JSON Lines, дописывается по мере загрузки)
+
+    Первая строка - заголовок с ключом копии и временем начала, далее по
+    строке на загруженный blob или созданную часть дерева. Безопасен для
+    использования из нескольких потоков.
+    """
+
+    def __init__(self, path: str, key: Dict):
+        """
+        Открытие журнала; существующий журнал той же копии продолжается
+
+        Args:
+            path: Путь к файлу журнала
+            key: Ключ копии (репозиторий, локальная и облачная директории)
+        """
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._path = path
+        self._lock = threading.Lock()
+        self.blobs = set()
+        self.trees: Dict[str, str] = {}
+        self.started = time.time()
+        self.resumed = self._load(key)
+
+        # Журнал переписывается целиком: так отбрасывается строка,
+        # недописанная при аварийном завершении
+        header = {"format": JOURNAL_FORMAT, "key": key, "started": self.started}
+        lines = [header] + [{"blob": sha} for sha in sorted(self.blobs)]
+        lines += [{"tree": tree_key, "sha": sha} for tree_key, sha in self.trees.items()]
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.writelines(json.dumps(line, separators=(",", ":")) + "\n" for line in lines)
+        os.replace(tmp_path, path)
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def add_blob(self, blob_sha: str):
+        """Запись загруженного blob"""
+        with self._lock:
+            self.blobs.add(blob_sha)
+            self._write({"blob": blob_sha})
+
+    def add_tree(self, tree_key: str, tree_sha: str):
+        """Запись созданной части дерева"""
+        with self._lock:
+            self.trees[tree_key] = tree_sha
+            self._write({"tree": tree_key, "sha": tree_sha})
+
+    @staticmethod
+    def tree_key(base_sha: str, elements: List[Dict]) -> str:
+        """
+        Ключ части дерева
+
+        Args:
+            base_sha: SHA дерева, поверх которого создается часть
+            elements: Элементы части дерева
+
+        Returns:
+            SHA-1 от базового дерева и элементов
+        """
+        payload = json.dumps([base_sha, elements], sort_keys=True, separators=(",", ":"))
+        return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+    def close(self):
+        """Закрытие журнала (файл остается для продолжения)"""
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+
+    def discard(self):
+        """Удаление журнала после успешного завершения копии"""
+        self.close()
+        try:
+            os.remove(self._path)
+        except FileNotFoundError:
+            pass
+
+    def _load(self, key: Dict) -> bool:
+        """Чтение существующего журнала той же копии; True, если он продолжается"""
+        try:
+            with open(self._path, 'r', encoding='utf-8') as f:
+                header = json.loads(f.readline() or "{}")
+                if (header.get("format") != JOURNAL_FORMAT or header.get("key") != key
+                        or time.time() - header.get("started", 0) > MAX_AGE):
+                    return False
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        break
+                    if "blob" in record:
+                        self.blobs.add(record["blob"])
+                    elif "tree" in record:
+                        self.trees[record["tree"]] = record["sha"]
+        except (OSError, ValueError):
+            return False
+        self.started = header["started"]
+        return True
+
+    def _write(self, record: Dict):
+        """Дописывание записи в файл (вызывается под блокировкой)"""
+        if not self._file.closed:
+            self._file.write(json.dumps(record, separators=(",", ":")) + "\n")
+            self._file.flush()
@@ -139,6 +139,15 @@ def demonstrate_backup_restore(manager: GitHubCloudManager):
     else:
         print_info("Резервные копии не найдены")
     
+    # Проверка целостности без скачивания содержимого
+    print_info("\nПроверяю целостность резервной копии...")
+    verify_result = manager.verify_backup("demo_data", "backups/full_backup_v1")
+    
+    if verify_result["success"]:
+        print_success(verify_result["message"])
+    else:
+        print_error(verify_result["message"])
+    
     # Восстановление из резервной копии
     print_info("\nНачинаю восстановление из резервной копии...")
     restore_result = manager.restore_backup("backups/full_backup_v1", "restored_data")
@@ -0,0 +1,477 @@
+#!/usr/bin/env python3
+"""
+Инструментирование операций менеджера
+Для каждой операции (backup_directory, restore_backup, upload_file и
+т.д.) собираются длительность и время по фазам (сканирование, хеширование,
+загрузка, ожидание лимита и т.д.), а для каждого эндпоинта API - число
+запросов, ошибок, время ответа и переданные байты. Планировщик добавляет
+повторы, паузы из-за лимита и остаток лимита. Результат выгружается как
+JSON-отчет или в текстовом формате Prometheus. Собственные сборщики
+(например, профилировщик) подключаются через хуки
+"""
+
+import contextvars
+import functools
+import inspect
+import json
+import os
+import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urlparse
+
+# Сколько последних запусков операций хранится в отчете
+MAX_RUNS = 100
+
+# Префикс имен метрик Prometheus
+METRIC_PREFIX = "cloud_backup"
+
+# Хук: hook(событие, данные); события - operation_start, operation_end, phase, request
+Hook = Callable[[str, Dict[str, Any]], None]
+
+# Счетчики запуска операции: запросы, ошибки, байты, повторы и паузы
+RUN_COUNTERS = ("requests", "errors", "not_modified", "bytes_in", "bytes_out", "retries", "throttled")
+
+_ENDPOINT_PATTERNS = [
+    (re.compile(r"/repos/[^/]+/[^/]+"), "/repos/{repo}"),
+    (re.compile(r"/git/(blobs|trees|commits)/.+$"), r"/git/\1/{sha}"),
+    (re.compile(r"/git/(refs?)/.+$"), r"/git/\1/{ref}"),
+    (re.compile(r"/contents/.+$"), "/contents/{path}"),
+    (re.compile(r"^/users/[^/]+"), "/users/{user}")
+]
+
+
+def endpoint_name(url: str) -> str:
+    """
+    Шаблон эндпоинта по адресу запроса (без идентификаторов и путей)
+
+    Args:
+        url: Адрес запроса
+
+    Returns:
+        Путь вида /repos/{repo}/git/blobs/{sha}
+    """
+    path = urlparse(url).path.rstrip("/") or "/"
+    for pattern, replacement in _ENDPOINT_PATTERNS:
+        path = pattern.sub(replacement, path)
+    return path
+
+
+def instrumented(name: str):
+    """
+    Декоратор метода менеджера: вызов учитывается как операция name
+
+    Успех определяется по результату: ключ success словаря, первый элемент
+    кортежа или значение bool. Вложенные вызовы (например, upload_file
+    внутри backup_directory) учитываются в операции верхнего уровня, а
+    одновременные вызовы из разных потоков или задач asyncio - отдельно.
+
+    Args:
+        name: Имя операции
+    """
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(self, *args, **kwargs):
+                with self.metrics.operation(name) as run:
+                    result = await func(self, *args, **kwargs)
+                    run["success"] = _result_success(result)
+                    return result
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            with self.metrics.operation(name) as run:
+                result = func(self, *args, **kwargs)
+                run["success"] = _result_success(result)
+                return result
+        return wrapper
+    return decorator
+
+
+def timed_phase(name: str):
+    """
+    Декоратор метода менеджера: время вызова учитывается как фаза name
+
+    Args:
+        name: Имя фазы
+    """
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(self, *args, **kwargs):
+                with self.metrics.phase(name):
+                    return await func(self, *args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            with self.metrics.phase(name):
+                return func(self, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _result_success(result: Any) -> bool:
+    """Успех операции по ее результату"""
+    if isinstance(result, dict):
+        return bool(result.get("success", True))
+    if isinstance(result, tuple) and result and isinstance(result[0], bool):
+        return result[0]
+    if isinstance(result, bool):
+        return result
+    return True
+
+
+class Metrics:
+    """
+    Сборщик метрик операций, фаз и запросов
+
+    Текущая операция хранится в contextvars, поэтому одновременные операции
+    из разных потоков и задач asyncio учитываются раздельно, а фазы и
+    запросы относятся к операции своего контекста. Рабочие потоки операции
+    должны выполняться в копии ее контекста (см. bind). Время фаз
+    суммируется по всем потокам, поэтому при параллельной работе сумма фаз
+    может превышать длительность операции. Безопасен для использования из
+    нескольких потоков.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._hooks: List[Hook] = []
+        self._current: contextvars.ContextVar[Optional[Dict[str, Any]]] = contextvars.ContextVar(
+            f"metrics_run_{id(self)}", default=None
+        )
+        self._active: List[Dict[str, Any]] = []
+        self.reset()
+
+    def reset(self):
+        """Обнуление всех накопленных метрик"""
+        with self._lock:
+            self.operations: Dict[str, Dict[str, Any]] = {}
+            self.phases: Dict[Tuple[str, str], Dict[str, float]] = {}
+            self.requests: Dict[Tuple[str, str], Dict[str, float]] = {}
+            self.counters: Dict[str, float] = {"retries": 0, "throttled": 0}
+            self.rate: Dict[str, Optional[float]] = {"remaining": None, "limit": None, "reset": None}
+            self.runs = deque(maxlen=MAX_RUNS)
+
+    def add_hook(self, hook: Hook):
+        """
+        Подключение собственного сборщика
+
+        Хук вызывается синхронно в потоке, где произошло событие, и должен
+        быть быстрым и безопасным для нескольких потоков. Исключения хука
+        не прерывают операцию.
+
+        Args:
+            hook: Функция hook(событие, данные)
+        """
+        with self._lock:
+            self._hooks.append(hook)
+
+    def remove_hook(self, hook: Hook):
+        """Отключение сборщика"""
+        with self._lock:
+            if hook in self._hooks:
+                self._hooks.remove(hook)
+
+    @contextmanager
+    def operation(self, name: str) -> Iterator[Dict[str, Any]]:
+        """
+        Учет операции верхнего уровня
+
+        Args:
+            name: Имя операции
+
+        Returns:
+            Запись запуска; вызывающий код может задать в ней success
+        """
+        if self._current.get() is not None:
+            yield {"operation": name, "success": True}
+            return
+
+        with self._lock:
+            run = {
+                "operation": name,
+                "started": datetime.now().isoformat(),
+                "success": True,
+                "_start": time.perf_counter(),
+                "_remaining": self.rate["remaining"],
+                "_overlapped": bool(self._active),
+                "phases": {}
+            }
+            run.update(dict.fromkeys(RUN_COUNTERS, 0))
+            for other in self._active:
+                other["_overlapped"] = True
+            self._active.append(run)
+        token = self._current.set(run)
+
+        self._emit("operation_start", {"operation": name})
+        try:
+            yield run
+        except BaseException:
+            run["success"] = False
+            raise
+        finally:
+            self._current.reset(token)
+            self._finish(run)
+
+    def bind(self, func: Callable) -> Callable:
+        """
+        Функция, выполняемая в контексте текущей операции
+
+        Нужна для рабочих потоков: пул потоков не переносит contextvars, и
+        без привязки фазы и запросы потока не попадут в операцию.
+
+        Args:
+            func: Функция
+
+        Returns:
+            Функция с теми же аргументами
+        """
+        context = contextvars.copy_context()
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            # Один контекст нельзя войти одновременно из нескольких потоков
+            return context.copy().run(func, *args, **kwargs)
+        return wrapper
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """
+        Учет времени фазы текущей операции
+
+        Args:
+            name: Имя фазы (scan, hash, upload, download, ...)
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_phase(name, time.perf_counter() - start)
+
+    def add_phase(self, name: str, seconds: float, count: int = 1):
+        """
+        Добавление уже измеренного времени фазы
+
+        Args:
+            name: Имя фазы
+            seconds: Время в секундах
+            count: Число измерений
+        """
+        run = self._current.get()
+        operation = run["operation"] if run else ""
+        with self._lock:
+            phase = self.phases.setdefault((operation, name), {"seconds": 0.0, "count": 0})
+            phase["seconds"] += seconds
+            phase["count"] += count
+            if run:
+                run_phase = run["phases"].setdefault(name, {"seconds": 0.0, "count": 0})
+                run_phase["seconds"] += seconds
+                run_phase["count"] += count
+        self._emit("phase", {"operation": operation, "phase": name, "seconds": seconds})
+
+    def record_request(self, method: str, url: str, status: Optional[int], seconds: float,
+                       bytes_in: int = 0, bytes_out: int = 0):
+        """
+        Учет запроса к API
+
+        Args:
+            method: HTTP-метод
+            url: Адрес запроса
+            status: Статус ответа (None - ошибка соединения)
+            seconds: Время до получения ответа
+            bytes_in: Получено байт (тело ответа)
+            bytes_out: Отправлено байт (тело запроса)
+        """
+        endpoint = endpoint_name(url)
+        run = self._current.get()
+        with self._lock:
+            if run:
+                run["requests"] += 1
+                run["bytes_in"] += bytes_in
+                run["bytes_out"] += bytes_out
+                if status is None or status >= 400:
+                    run["errors"] += 1
+                elif status == 304:
+                    run["not_modified"] += 1
+            stats = self.requests.setdefault((method, endpoint), {
+                "count": 0, "errors": 0, "not_modified": 0, "seconds": 0.0, "bytes_in": 0, "bytes_out": 0
+            })
+            stats["count"] += 1
+            stats["seconds"] += seconds
+            stats["bytes_in"] += bytes_in
+            stats["bytes_out"] += bytes_out
+            if status is None or status >= 400:
+                stats["errors"] += 1
+            elif status == 304:
+                stats["not_modified"] += 1
+        self._emit("request", {"method": method, "endpoint": endpoint, "status": status, "seconds": seconds,
+                               "bytes_in": bytes_in, "bytes_out": bytes_out})
+
+    def count(self, name: str, value: float = 1):
+        """Увеличение счетчика (retries, throttled)"""
+        run = self._current.get()
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+            if run:
+                run[name] = run.get(name, 0) + value
+
+    def observe_rate(self, remaining: int, limit: int, reset: float):
+        """Учет состояния лимита API из заголовков ответа"""
+        with self._lock:
+            self.rate = {"remaining": remaining, "limit": limit, "reset": reset}
+
+    def report(self) -> Dict[str, Any]:
+        """
+        Отчет по всем операциям с момента создания или reset()
+
+        Returns:
+            JSON-совместимый словарь
+        """
+        with self._lock:
+            totals = self._totals()
+            return {
+                "generated": datetime.now().isoformat(),
+                "operations": {name: dict(stats) for name, stats in self.operations.items()},
+                "phases": [
+                    {"operation": operation, "phase": phase, **stats}
+                    for (operation, phase), stats in sorted(self.phases.items())
+                ],
+                "requests": [
+                    {"method": method, "endpoint": endpoint, **stats}
+                    for (method, endpoint), stats in sorted(self.requests.items())
+                ],
+                "totals": totals,
+                "rate_limit": dict(self.rate),
+                "runs": list(self.runs)
+            }
+
+    def save_report(self, path: str):
+        """
+        Сохранение JSON-отчета
+
+        Args:
+            path: Путь к файлу отчета
+        """
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.report(), f, indent=2, ensure_ascii=False)
+
+    def prometheus(self) -> str:
+        """
+        Метрики в текстовом формате Prometheus (для textfile collector или /metrics)
+
+        Returns:
+            Текст метрик
+        """
+        lines = []
+
+        def metric(name: str, kind: str, help_text: str, samples: List[Tuple[Dict[str, str], float]]):
+            full_name = f"{METRIC_PREFIX}_{name}"
+            lines.append(f"# HELP {full_name} {help_text}")
+            lines.append(f"# TYPE {full_name} {kind}")
+            for labels, value in samples:
+                label_text = ",".join(f'{key}="{_escape_label(str(val))}"' for key, val in labels.items())
+                value_text = _format_value(value)
+                lines.append(f"{full_name}{{{label_text}}} {value_text}" if label_text else f"{full_name} {value_text}")
+
+        with self._lock:
+            operations = sorted(self.operations.items())
+            metric("operations_total", "counter", "Число выполненных операций",
+                   [({"operation": name, "status": status}, stats[status])
+                    for name, stats in operations for status in ("success", "failed")])
+            metric("operation_seconds_total", "counter", "Суммарная длительность операций",
+                   [({"operation": name}, stats["seconds"]) for name, stats in operations])
+            metric("phase_seconds_total", "counter", "Время фаз операций (сумма по потокам)",
+                   [({"operation": operation, "phase": phase}, stats["seconds"])
+                    for (operation, phase), stats in sorted(self.phases.items())])
+
+            requests_items = sorted(self.requests.items())
+            for name, key, help_text in (
+                ("requests_total", "count", "Число запросов к API"),
+                ("request_errors_total", "errors", "Число запросов, завершившихся ошибкой"),
+                ("requests_not_modified_total", "not_modified", "Число ответов 304 (не расходуют лимит)"),
+                ("request_seconds_total", "seconds", "Суммарное время ответа API"),
+                ("received_bytes_total", "bytes_in", "Получено байт от API"),
+                ("sent_bytes_total", "bytes_out", "Отправлено байт в API")
+            ):
+                metric(name, "counter", help_text,
+                       [({"method": method, "endpoint": endpoint}, stats[key])
+                        for (method, endpoint), stats in requests_items])
+
+            metric("retries_total", "counter", "Число повторов запросов", [({}, self.counters["retries"])])
+            metric("throttled_total", "counter", "Число ответов о превышении лимита", [({}, self.counters["throttled"])])
+            if self.rate["remaining"] is not None:
+                metric("rate_limit_remaining", "gauge", "Остаток лимита запросов API", [({}, self.rate["remaining"])])
+                metric("rate_limit_limit", "gauge", "Лимит запросов API за период", [({}, self.rate["limit"])])
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: str):
+        """
+        Атомарная запись метрик Prometheus в файл (для node_exporter textfile collector)
+
+        Args:
+            path: Путь к файлу .prom
+        """
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(self.prometheus())
+        os.replace(tmp_path, path)
+
+    def _totals(self) -> Dict[str, float]:
+        """Суммарные значения по всем эндпоинтам (вызывается под блокировкой)"""
+        totals = {"requests": 0, "errors": 0, "not_modified": 0, "bytes_in": 0, "bytes_out": 0}
+        for stats in self.requests.values():
+            totals["requests"] += stats["count"]
+            totals["errors"] += stats["errors"]
+            totals["not_modified"] += stats["not_modified"]
+            totals["bytes_in"] += stats["bytes_in"]
+            totals["bytes_out"] += stats["bytes_out"]
+        totals.update(self.counters)
+        return totals
+
+    def _finish(self, run: Dict[str, Any]):
+        """Завершение операции верхнего уровня: запись запуска и агрегатов"""
+        seconds = time.perf_counter() - run.pop("_start")
+        with self._lock:
+            self._active.remove(run)
+            remaining_before = run.pop("_remaining")
+            overlapped = run.pop("_overlapped")
+            run["seconds"] = seconds
+            # Расход лимита известен, если лимит не сбросился во время операции
+            # и одновременно с ней не шли другие операции
+            remaining = self.rate["remaining"]
+            if (not overlapped and remaining_before is not None and remaining is not None
+                    and remaining <= remaining_before):
+                run["rate_limit_used"] = remaining_before - remaining
+
+            stats = self.operations.setdefault(run["operation"], {"success": 0, "failed": 0, "seconds": 0.0})
+            stats["success" if run["success"] else "failed"] += 1
+            stats["seconds"] += seconds
+            self.runs.append(run)
+        self._emit("operation_end", dict(run))
+
+    def _emit(self, event: str, data: Dict[str, Any]):
+        """Вызов хуков"""
+        for hook in list(self._hooks):
+            try:
+                hook(event, data)
+            except Exception:
+                pass
+
+
+def _format_value(value: float) -> str:
+    """Значение метрики Prometheus (целые - без экспоненты)"""
+    if float(value).is_integer():
+        return str(int(value))
+    return f"{value:.6f}"
+
+
+def _escape_label(value: str) -> str:
+    """Экранирование значения метки Prometheus"""
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Сохраненные сведения о репозиториях резервных копий
+Найденный однажды репозиторий (ID, полное имя, адрес API, ветка по
+умолчанию) и последняя известная вершина ветки сохраняются на диске, поэтому
+короткие запуски (список копий, проверка одного файла) не тратят время и
+лимит API на поиск пользователя, репозитория и текущего коммита. Устаревшая
+вершина безопасна: ветка обновляется только перемоткой вперед, и если ее
+продвинул другой клиент, коммит повторяется поверх актуальной вершины
+"""
+
+import hashlib
+import json
+import os
+import threading
+from typing import Dict, Optional
+
+# Поля репозитория, которых достаточно для работы без запроса к API
+REPO_FIELDS = ("id", "name", "full_name", "url", "html_url", "default_branch", "private")
+
+
+class RepoCache:
+    """
+    Сведения о репозиториях в одном JSON-файле
+
+    Файл перечитывается перед каждой записью и заменяется атомарно, поэтому
+    процессы с одной директорией кешей не видят недописанный файл. Между
+    процессами блокировки нет: при одновременной записи одна из них может
+    потеряться, но потерянная запись стоит только повторного поиска
+    репозитория или вершины ветки. Безопасен для использования из
+    нескольких потоков.
+    """
+
+    def __init__(self, path: str):
+        """
+        Открытие (или создание) файла сведений
+
+        Args:
+            path: Путь к JSON-файлу
+        """
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._path = path
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(api_url: str, token: str, repo_name: str) -> str:
+        """
+        Ключ репозитория
+
+        Имя без владельца относится к пользователю токена, поэтому в ключ
+        входит отпечаток токена (сам токен не сохраняется).
+
+        Args:
+            api_url: Адрес GitHub REST API
+            token: GitHub token
+            repo_name: Имя репозитория ("name" или "owner/name")
+
+        Returns:
+            Строка ключа
+        """
+        fingerprint = hashlib.sha256(token.encode('utf-8')).hexdigest()[:16]
+        return f"{api_url} {fingerprint} {repo_name}"
+
+    def get(self, key: str) -> Optional[Dict]:
+        """
+        Сведения о репозитории
+
+        Returns:
+            Словарь с полями REPO_FIELDS и, если известна, вершиной ветки
+            head ({"commit": SHA, "tree": SHA}) или None
+        """
+        with self._lock:
+            return self._read().get(key)
+
+    def put(self, key: str, info: Dict):
+        """
+        Сохранение сведений о репозитории
+
+        Args:
+            key: Ключ репозитория
+            info: Поля репозитория (лишние поля отбрасываются)
+        """
+        entry = {field: info.get(field) for field in REPO_FIELDS}
+        if info.get("head"):
+            entry["head"] = info["head"]
+        self._update(lambda entries: entries.__setitem__(key, entry))
+
+    def set_head(self, key: str, head: Optional[Dict]):
+        """
+        Сохранение вершины ветки по умолчанию
+
+        Args:
+            key: Ключ репозитория
+            head: {"commit": SHA коммита, "tree": SHA дерева} или None,
+                если вершина неизвестна
+        """
+        def apply(entries: Dict[str, Dict]):
+            if key not in entries:
+                return
+            if head:
+                entries[key]["head"] = head
+            else:
+                entries[key].pop("head", None)
+
+        self._update(apply)
+
+    def _read(self) -> Dict[str, Dict]:
+        """Чтение файла (поврежденный или отсутствующий файл - пустой)"""
+        try:
+            with open(self._path, 'r', encoding='utf-8') as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return entries if isinstance(entries, dict) else {}
+
+    def _update(self, apply):
+        """Изменение сведений функцией apply(записи) с атомарной заменой файла"""
+        with self._lock:
+            entries = self._read()
+            apply(entries)
+            tmp_path = f"{self._path}.{os.getpid()}.tmp"
+            try:
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(entries, f, indent=2, ensure_ascii=False)
+                os.replace(tmp_path, self._path)
+            except OSError:
+                # Без сохраненных сведений репозиторий просто ищется заново
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Быстрое сканирование локальных директорий и кеш хешей файлов
+Обход выполняется через os.scandir, и результат stat каждого файла
+переиспользуется дальше (размер, режим, ключ кеша). Кеш хешей хранит SHA
+blob-объекта git по ключу (устройство, inode, размер, mtime_ns), поэтому
+неизменившиеся файлы не читаются и не хешируются повторно
+"""
+
+import os
+import sqlite3
+import threading
+from typing import Dict, Optional, Tuple
+
+# Файлы, измененные менее чем за столько секунд до хеширования, не кешируются:
+# повторное изменение в пределах той же отметки mtime было бы незаметно
+RACY_WINDOW = 2.0
+
+# Максимальное число записей кеша; при превышении удаляются самые старые
+MAX_ENTRIES = 10_000_000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS hashes (
+    dev INTEGER NOT NULL,
+    ino INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    sha TEXT NOT NULL,
+    PRIMARY KEY (dev, ino, size, mtime_ns)
+);
+"""
+
+
+def scan_files(root: str) -> Dict[str, os.stat_result]:
+    """
+    Рекурсивный обход директории с сохранением результатов stat
+
+    Порядок совпадает с os.walk: файлы директории, затем ее поддиректории.
+    Символические ссылки на директории не обходятся, недоступные элементы
+    пропускаются.
+
+    Args:
+        root: Корневая директория
+
+    Returns:
+        Словарь {путь к файлу: результат stat} в порядке обхода
+    """
+    result = {}
+    stack = [root]
+    while stack:
+        directory = stack.pop()
+        subdirs = []
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            subdirs.append(entry.path)
+                        elif entry.is_file():
+                            result[entry.path] = entry.stat()
+                    except OSError:
+                        continue
+        except OSError:
+            continue
+        stack.extend(reversed(subdirs))
+    return result
+
+
+def _cache_key(stat: os.stat_result) -> Tuple[int, int, int, int]:
+    """Ключ кеша по результату stat"""
+    return stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+
+class HashCache:
+    """
+    Постоянный кеш SHA blob-объектов по результатам stat (SQLite)
+
+    Новые записи накапливаются в памяти и записываются одной транзакцией в
+    flush(). Безопасен для использования из нескольких потоков.
+    """
+
+    def __init__(self, db_path: str):
+        """
+        Открытие (или создание) кеша
+
+        Args:
+            db_path: Путь к файлу базы SQLite
+        """
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.executescript(_SCHEMA)
+        self._pending: Dict[Tuple[int, int, int, int], str] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, stat: os.stat_result) -> Optional[str]:
+        """
+        SHA файла по результату stat
+
+        Args:
+            stat: Результат stat файла
+
+        Returns:
+            SHA blob или None, если файла с такими атрибутами нет в кеше
+        """
+        key = _cache_key(stat)
+        with self._lock:
+            sha = self._pending.get(key)
+            if sha is None:
+                row = self._db.execute(
+                    "SELECT sha FROM hashes WHERE dev = ? AND ino = ? AND size = ? AND mtime_ns = ?", key
+                ).fetchone()
+                sha = row[0] if row else None
+            if sha is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return sha
+
+    def put(self, stat: os.stat_result, sha: str, hashed_at: float):
+        """
+        Запоминание SHA файла
+
+        Args:
+            stat: Результат stat файла до хеширования
+            sha: Вычисленный SHA blob
+            hashed_at: Время начала хеширования (Unix time)
+        """
+        if stat.st_mtime_ns >= (hashed_at - RACY_WINDOW) * 1e9:
+            return
+        with self._lock:
+            self._pending[_cache_key(stat)] = sha
+
+    def flush(self):
+        """Запись накопленных записей на диск"""
+        with self._lock:
+            if not self._pending:
+                return
+            with self._db:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO hashes (dev, ino, size, mtime_ns, sha) VALUES (?, ?, ?, ?, ?)",
+                    [key + (sha,) for key, sha in self._pending.items()]
+                )
+                self._db.execute(
+                    "DELETE FROM hashes WHERE rowid <= (SELECT MAX(rowid) FROM hashes) - ?", (MAX_ENTRIES,)
+                )
+            self._pending.clear()
+
+    def close(self):
+        """Запись накопленных записей и закрытие базы"""
+        self.flush()
+        self._db.close()
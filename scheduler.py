@@ -0,0 +1,416 @@
+#!/usr/bin/env python3
+"""
+Планировщик запросов к GitHub API с учетом лимитов
+Все запросы менеджера проходят через общий планировщик: он ограничивает
+число одновременных запросов и подстраивает его под ответы сервера,
+повторяет временные ошибки с экспоненциальной задержкой и случайным
+разбросом, а также отслеживает остаток лимита по заголовкам X-RateLimit-*.
+Состояние лимита и параллельности (RateLimitState) общее с асинхронным
+менеджером, который ждет слотов в цикле событий, а не в потоках
+"""
+
+import math
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable, Dict, Mapping, Optional, Tuple
+
+# Повторов одного запроса после временной ошибки
+MAX_RETRIES = 5
+
+# Экспоненциальная задержка между повторами: база и верхняя граница (секунды)
+BACKOFF_BASE = 1.0
+BACKOFF_CAP = 60.0
+
+# Пауза при вторичном лимите без Retry-After (рекомендация GitHub - не меньше минуты)
+SECONDARY_LIMIT_DELAY = 60.0
+
+# Статусы временных ошибок сервера, которые имеет смысл повторить
+TRANSIENT_STATUSES = {500, 502, 503, 504}
+
+# Когда остаток лимита ниже этой доли, запросы равномерно распределяются
+# по времени до сброса, чтобы не упереться в лимит раньше срока
+LOW_BUDGET_RATIO = 0.1
+
+
+class RateLimitState:
+    """
+    Состояние лимита API и адаптивной параллельности
+
+    Общая часть планировщиков GitHubCloudManager (потоки) и
+    AsyncGitHubCloudManager (корутины): остаток лимита по заголовкам
+    X-RateLimit-*, общая пауза после превышения лимита, равномерное
+    распределение запросов при малом остатке и регулировка параллельности
+    по схеме AIMD: после серии успешных запросов допустимое число
+    одновременных запросов растет на единицу (до max_concurrency), а при
+    ответе о превышении лимита уменьшается вдвое. Ожидание реализует
+    владелец состояния; методы не синхронизированы, вызовы должны быть
+    сериализованы владельцем (блокировкой или циклом событий).
+    """
+
+    def __init__(self, max_concurrency: int, max_retries: int = MAX_RETRIES, metrics=None):
+        """
+        Инициализация состояния
+
+        Args:
+            max_concurrency: Максимальное число одновременных запросов
+            max_retries: Число повторов после временной ошибки
+            metrics: Сборщик метрик (metrics.Metrics) для повторов, пауз и лимита
+        """
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_retries = max_retries
+        self.metrics = metrics
+        self._concurrency = self.max_concurrency
+        self._active = 0
+        self._successes = 0
+        self._paused_until = 0.0
+        self._next_slot = 0.0
+
+        # Последнее известное состояние лимита (None - ответов с заголовками еще не было)
+        self.remaining: Optional[int] = None
+        self.limit: Optional[int] = None
+        self.reset: Optional[float] = None
+
+        self.requests = 0
+        self.retries = 0
+        self.throttled = 0
+
+    def observe(self, headers: Mapping[str, str]):
+        """
+        Учет заголовков лимита из ответа сервера
+
+        Args:
+            headers: Заголовки ответа
+        """
+        headers = {key.lower(): value for key, value in headers.items()}
+        try:
+            remaining = int(headers["x-ratelimit-remaining"])
+            limit = int(headers["x-ratelimit-limit"])
+            reset = float(headers["x-ratelimit-reset"])
+        except (KeyError, ValueError):
+            return
+
+        self.update(remaining, limit, reset)
+
+    def update(self, remaining: int, limit: int, reset: float):
+        """
+        Обновление состояния лимита
+
+        Args:
+            remaining: Остаток запросов
+            limit: Лимит запросов за период
+            reset: Время сброса лимита (Unix time)
+        """
+        if self.metrics:
+            self.metrics.observe_rate(remaining, limit, reset)
+        self.remaining, self.limit, self.reset = remaining, limit, reset
+        if remaining == 0:
+            # Лимит исчерпан - ждем его сброса
+            self.pause(reset - time.time() + 1)
+
+    def budget(self) -> Dict[str, Any]:
+        """
+        Текущее состояние лимита и планировщика
+
+        Returns:
+            Словарь с остатком лимита, временем сброса и статистикой запросов
+        """
+        return {
+            "remaining": self.remaining,
+            "limit": self.limit,
+            "reset": datetime.fromtimestamp(self.reset).isoformat() if self.reset else None,
+            "concurrency": self._concurrency,
+            "max_concurrency": self.max_concurrency,
+            "requests": self.requests,
+            "retries": self.retries,
+            "throttled": self.throttled
+        }
+
+    def wait_time(self) -> float:
+        """Время до конца общей паузы или до следующего разрешенного запроса (секунды)"""
+        return max(self._paused_until, self._next_slot) - time.monotonic()
+
+    def has_slot(self) -> bool:
+        """Есть ли свободный слот для запроса при текущей параллельности"""
+        return self._active < self._concurrency
+
+    def start_request(self):
+        """Занятие слота запросом"""
+        self._active += 1
+        self.requests += 1
+
+        # При малом остатке лимита оставшиеся запросы распределяются до сброса
+        if (self.remaining is not None and self.reset
+                and self.remaining < self.limit * LOW_BUDGET_RATIO):
+            interval = max(0.0, self.reset - time.time()) / max(1, self.remaining)
+            self._next_slot = time.monotonic() + interval
+
+    def finish_request(self, success: bool):
+        """Освобождение слота; после серии успехов параллельность растет"""
+        self._active -= 1
+        if success:
+            self._successes += 1
+            if self._successes >= self._concurrency and self._concurrency < self.max_concurrency:
+                self._concurrency += 1
+                self._successes = 0
+
+    def pause(self, delay: float):
+        """Приостановка всех запросов на delay секунд"""
+        self._paused_until = max(self._paused_until, time.monotonic() + max(0.0, delay))
+
+    def throttle(self, delay: float):
+        """Реакция на превышение лимита: пауза и снижение параллельности вдвое"""
+        self.pause(delay)
+        self._concurrency = max(1, self._concurrency // 2)
+        self._successes = 0
+        self.throttled += 1
+        if self.metrics:
+            self.metrics.count("throttled")
+
+    def retry_delay(self, status: int, headers: Mapping[str, str], text: str,
+                    attempt: int) -> Optional[float]:
+        """
+        Задержка перед повтором запроса, на который пришел ответ с ошибкой
+
+        Args:
+            status: Статус ответа
+            headers: Заголовки ответа
+            text: Текст ответа
+            attempt: Номер повтора (с нуля)
+
+        Returns:
+            Задержка в секундах или None, если ошибка не временная.
+            После превышения лимита задержка нулевая: ожидание общей паузы
+            выполняет владелец перед следующим запросом
+        """
+        if attempt >= self.max_retries:
+            return None
+        self.observe(headers)
+        delay = rate_limit_delay(status, headers, text, attempt)
+        if delay is not None:
+            self.throttle(delay)
+            return 0.0
+        if status in TRANSIENT_STATUSES:
+            return backoff_delay(attempt)
+        return None
+
+    def record_retry(self, delay: float):
+        """Учет повтора запроса и времени ожидания перед ним"""
+        self.retries += 1
+        if self.metrics:
+            self.metrics.count("retries")
+            self.metrics.add_phase("retry_backoff", delay)
+
+
+class RequestScheduler(RateLimitState):
+    """
+    Общий планировщик запросов с адаптивной параллельностью
+
+    Запросы выполняются в потоке вызывающего: перед запросом поток ждет
+    общей паузы, интервала и свободного слота (см. RateLimitState), после
+    временной ошибки запрос повторяется. Безопасен для использования из
+    нескольких потоков.
+    """
+
+    def __init__(self, max_concurrency: int, max_retries: int = MAX_RETRIES, metrics=None):
+        """
+        Инициализация планировщика
+
+        Args:
+            max_concurrency: Максимальное число одновременных запросов
+            max_retries: Число повторов после временной ошибки
+            metrics: Сборщик метрик (metrics.Metrics) для повторов, пауз и лимита
+        """
+        super().__init__(max_concurrency, max_retries, metrics)
+        self._cond = threading.Condition()
+
+    def call(self, func: Callable, *args, **kwargs) -> Any:
+        """
+        Выполнение запроса с ожиданием свободного слота и повторами
+
+        Функция должна выполнять ровно один запрос и быть безопасной для
+        повторного вызова (например, заново открывать тело запроса).
+
+        Args:
+            func: Функция, выполняющая запрос
+            *args: Позиционные аргументы функции
+            **kwargs: Именованные аргументы функции
+
+        Returns:
+            Результат функции
+        """
+        attempt = 0
+        while True:
+            self._acquire()
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                self._release(success=False)
+                delay = self._retry_delay(e, attempt)
+                if delay is None:
+                    raise
+                attempt += 1
+                with self._cond:
+                    self.record_retry(delay)
+                time.sleep(delay)
+                continue
+            self._release(success=True)
+            return result
+
+    def update(self, remaining: int, limit: int, reset: float):
+        """Обновление состояния лимита (см. RateLimitState.update) с пробуждением потоков"""
+        with self._cond:
+            super().update(remaining, limit, reset)
+            self._cond.notify_all()
+
+    def budget(self) -> Dict[str, Any]:
+        """Текущее состояние лимита и планировщика (см. RateLimitState.budget)"""
+        with self._cond:
+            return super().budget()
+
+    def _acquire(self):
+        """Ожидание паузы, интервала и свободного слота"""
+        # Время ожидания из-за лимита и из-за занятых слотов учитывается раздельно
+        rate_wait = slot_wait = 0.0
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                wait = self.wait_time()
+                if wait > 0:
+                    self._cond.wait(wait)
+                    rate_wait += time.monotonic() - now
+                elif not self.has_slot():
+                    self._cond.wait()
+                    slot_wait += time.monotonic() - now
+                else:
+                    break
+            self.start_request()
+
+        if self.metrics:
+            if rate_wait:
+                self.metrics.add_phase("rate_limit_wait", rate_wait)
+            if slot_wait:
+                self.metrics.add_phase("queue_wait", slot_wait)
+
+    def _release(self, success: bool):
+        """Освобождение слота с пробуждением ожидающих потоков"""
+        with self._cond:
+            self.finish_request(success)
+            self._cond.notify_all()
+
+    def _retry_delay(self, error: Exception, attempt: int) -> Optional[float]:
+        """
+        Задержка перед повтором запроса
+
+        Args:
+            error: Ошибка запроса
+            attempt: Номер повтора (с нуля)
+
+        Returns:
+            Задержка в секундах или None, если ошибка не временная
+        """
+        status, headers, text = _error_details(error)
+        if status is None:
+            import requests
+
+            if attempt < self.max_retries and isinstance(error, (requests.ConnectionError, requests.Timeout)):
+                return backoff_delay(attempt)
+            return None
+
+        # Пауза общая для всех потоков, поэтому ждет ее сам _acquire
+        with self._cond:
+            delay = self.retry_delay(status, headers, text, attempt)
+            self._cond.notify_all()
+        return delay
+
+
+def backoff_delay(attempt: int) -> float:
+    """
+    Экспоненциальная задержка с полным случайным разбросом
+
+    Args:
+        attempt: Номер повтора (с нуля)
+
+    Returns:
+        Задержка в секундах
+    """
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+
+
+def rate_limit_delay(status: int, headers: Mapping[str, str], text: str, attempt: int) -> Optional[float]:
+    """
+    Пауза после ответа о превышении лимита
+
+    Args:
+        status: Статус ответа
+        headers: Заголовки ответа
+        text: Текст ответа
+        attempt: Номер повтора (с нуля)
+
+    Returns:
+        Пауза в секундах или None, если ответ - не превышение лимита
+    """
+    if status not in (403, 429):
+        return None
+    headers = {key.lower(): value for key, value in headers.items()}
+    if "retry-after" in headers:
+        return _retry_after_delay(headers["retry-after"])
+    if headers.get("x-ratelimit-remaining") == "0" and "x-ratelimit-reset" in headers:
+        return float(headers["x-ratelimit-reset"]) - time.time() + 1
+    if status == 429 or "rate limit" in text.lower():
+        return SECONDARY_LIMIT_DELAY * 2 ** attempt
+    # Обычный отказ в доступе
+    return None
+
+
+def _retry_after_delay(value: str) -> float:
+    """
+    Пауза по заголовку Retry-After
+
+    Заголовок содержит число секунд или дату HTTP (RFC 9110); дата в
+    прошлом означает, что повторять можно сразу. Нераспознанное значение
+    считается вторичным лимитом без Retry-After.
+
+    Args:
+        value: Значение заголовка
+
+    Returns:
+        Пауза в секундах
+    """
+    try:
+        delay = float(value)
+    except ValueError:
+        pass
+    else:
+        return max(0.0, delay) if math.isfinite(delay) else SECONDARY_LIMIT_DELAY
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return SECONDARY_LIMIT_DELAY
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+def _error_details(error: Exception) -> Tuple[Optional[int], Mapping[str, str], str]:
+    """
+    Статус, заголовки и текст ответа из ошибки PyGithub или requests
+
+    Args:
+        error: Ошибка запроса
+
+    Returns:
+        Кортеж (статус или None, заголовки, текст ответа)
+    """
+    # PyGithub и requests загружаются долго, поэтому импортируются при
+    # первой ошибке, а не при импорте модуля
+    import requests
+    from github import GithubException
+
+    if isinstance(error, GithubException):
+        return error.status, error.headers or {}, str(error.data)
+    if isinstance(error, requests.HTTPError) and error.response is not None:
+        return error.response.status_code, error.response.headers, error.response.text
+    return None, {}, ""
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Каталог снимков резервных копий
+Каждый коммит резервной копии закрепляется легковесным тегом и
+дописывается строкой в каталог snapshots.jsonl на отдельной ветке: время,
+коммит, дерево, SHA манифеста и итоги копии. Каталог читается одним
+запросом, а восстановление на момент снимка идет прямо от его коммита, без
+обхода истории ветки. Тег не дает потерять коммит снимка, даже если
+директория копии удалена или ветка переписана
+"""
+
+import json
+from datetime import datetime
+from typing import Dict, List, Optional, Union
+
+# Ветка с каталогом снимков (не связана с историей копий)
+SNAPSHOT_BRANCH = "backup-snapshots"
+CATALOG_NAME = "snapshots.jsonl"
+
+# Префикс тегов снимков: refs/tags/snapshot/<id>
+TAG_PREFIX = "snapshot/"
+
+# Поля итогов копии, которые сохраняются в каталоге
+STAT_FIELDS = ("files_uploaded", "files_skipped", "files_failed", "total_size")
+
+
+def make_entry(backup_info: Dict, cloud_dir: str, commit_sha: str, tree_sha: str,
+               manifest_sha: Optional[str] = None) -> Dict:
+    """
+    Запись каталога о коммите резервной копии
+
+    Args:
+        backup_info: Результаты резервной копии (timestamp, source_dir, итоги)
+        cloud_dir: Директория копии в облаке
+        commit_sha: SHA коммита копии
+        tree_sha: SHA корневого дерева коммита
+        manifest_sha: SHA blob манифеста копии
+
+    Returns:
+        Запись каталога; id - имя тега снимка без префикса
+    """
+    created = datetime.fromisoformat(backup_info["timestamp"])
+    entry = {
+        "id": f"{created:%Y%m%dT%H%M%S}-{commit_sha[:7]}",
+        "timestamp": backup_info["timestamp"],
+        "cloud_dir": cloud_dir.strip('/'),
+        "source_dir": backup_info["source_dir"],
+        "commit": commit_sha,
+        "tree": tree_sha,
+        "manifest": manifest_sha
+    }
+    entry.update({field: backup_info[field] for field in STAT_FIELDS})
+    return entry
+
+
+def parse_catalog(content: bytes) -> List[Dict]:
+    """
+    Записи каталога в порядке добавления
+
+    Недописанные или поврежденные строки пропускаются.
+
+    Args:
+        content: Содержимое snapshots.jsonl
+
+    Returns:
+        Список записей
+    """
+    entries = []
+    for line in content.splitlines():
+        try:
+            entry = json.loads(line)
+        except ValueError:
+            continue
+        if isinstance(entry, dict) and "commit" in entry:
+            entries.append(entry)
+    return entries
+
+
+def append_entry(content: bytes, entry: Dict) -> bytes:
+    """
+    Содержимое каталога с дописанной записью
+
+    Args:
+        content: Текущее содержимое каталога (b"" - каталога нет)
+        entry: Новая запись
+
+    Returns:
+        Новое содержимое каталога
+    """
+    if content and not content.endswith(b"\n"):
+        content += b"\n"
+    return content + json.dumps(entry, ensure_ascii=False, separators=(",", ":")).encode('utf-8') + b"\n"
+
+
+def select(entries: List[Dict], cloud_dir: Optional[str] = None,
+           before: Optional[Union[str, datetime]] = None) -> List[Dict]:
+    """
+    Отбор снимков, от новых к старым
+
+    Args:
+        entries: Записи каталога
+        cloud_dir: Только снимки этой директории копии
+        before: Только снимки, сделанные не позже этого момента
+            (datetime или строка ISO 8601, например "2024-01-16")
+
+    Returns:
+        Список записей
+    """
+    if isinstance(before, datetime):
+        before = before.isoformat()
+    result = [
+        entry for entry in entries
+        if (cloud_dir is None or entry["cloud_dir"] == cloud_dir.strip('/'))
+        and (before is None or entry["timestamp"] <= before)
+    ]
+    return sorted(result, key=lambda entry: entry["timestamp"], reverse=True)
+
+
+def find(entries: List[Dict], snapshot: str) -> Optional[Dict]:
+    """
+    Поиск снимка по id или SHA коммита (допускается префикс от 7 символов)
+
+    Args:
+        entries: Записи каталога
+        snapshot: Id снимка или SHA его коммита
+
+    Returns:
+        Запись каталога или None
+    """
+    for entry in reversed(entries):
+        if entry["id"] == snapshot or (len(snapshot) >= 7 and entry["commit"].startswith(snapshot)):
+            return entry
+    return None
@@ -0,0 +1,26 @@
+"""Общие фикстуры проверок: fake-сервер GitHub и менеджеры поверх него"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_github import FakeGitHubServer  # noqa: E402
+from github_cloud_manager import GitHubCloudManager  # noqa: E402
+
+
+@pytest.fixture
+def server():
+    """Fake-сервер GitHub API в фоновом потоке"""
+    with FakeGitHubServer() as srv:
+        yield srv
+
+
+@pytest.fixture
+def manager(server, tmp_path):
+    """GitHubCloudManager с открытым репозиторием резервных копий"""
+    manager = GitHubCloudManager("test", cache_dir=str(tmp_path / "cache"), api_url=server.url)
+    manager.initialize_backup_repo("backups-test")
+    return manager
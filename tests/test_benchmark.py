@@ -0,0 +1,14 @@
+"""Замеры в дочерних процессах"""
+
+import benchmark
+
+
+def test_child_error_is_reported(server, tmp_path):
+    source = tmp_path / "source"
+    source.mkdir()
+    (source / "a.txt").write_text("a\n")
+
+    result = benchmark.run_scenario(server, str(tmp_path / "cache"), "backup", str(source),
+                                    "backups/bench", {"no_such_option": True}, timeout=60)
+    assert not result["success"]
+    assert "TypeError" in result["message"]
@@ -0,0 +1,64 @@
+"""Восстановление из кеша blob жесткими ссылками (blob_cache_link=True)"""
+
+import os
+
+from github_cloud_manager import GitHubCloudManager
+
+
+def test_link_keeps_per_file_attributes(server, tmp_path):
+    data = tmp_path / "data"
+    (data / "a").mkdir(parents=True)
+    (data / "b").mkdir()
+    (data / "a" / "__init__.py").write_bytes(b"")
+    (data / "b" / "__init__.py").write_bytes(b"")
+    (data / "run.sh").write_bytes(b"")
+    os.utime(data / "a" / "__init__.py", (1_600_000_000, 1_600_000_000))
+    os.utime(data / "b" / "__init__.py", (1_700_000_000, 1_700_000_000))
+    os.chmod(data / "run.sh", 0o755)
+
+    manager = GitHubCloudManager("test", cache_dir=str(tmp_path / "cache"), api_url=server.url,
+                                 blob_cache_size=1024 * 1024, blob_cache_link=True)
+    manager.initialize_backup_repo("backups-test")
+    assert manager.backup_directory(str(data), "backups/link")["success"]
+
+    # Первое восстановление заполняет кеш, второе берет файлы из него
+    for name in ("first", "second"):
+        restored = tmp_path / name / "data"
+        assert manager.restore_backup("backups/link", str(tmp_path / name))["success"]
+        assert os.stat(restored / "a" / "__init__.py").st_mtime == 1_600_000_000
+        assert os.stat(restored / "b" / "__init__.py").st_mtime == 1_700_000_000
+        assert os.stat(restored / "run.sh").st_mode & 0o111 == 0o111
+        assert not os.stat(restored / "a" / "__init__.py").st_mode & 0o111
+
+    # Файлы с разными правами или временем не делят один inode
+    second = tmp_path / "second" / "data"
+    inodes = {os.stat(second / path).st_ino for path in ("a/__init__.py", "b/__init__.py", "run.sh")}
+    assert len(inodes) == 3
+
+    # Файл с теми же правами и временем, что у объекта кеша, восстанавливается
+    # ссылкой на объект, поэтому повторные восстановления делят его inode
+    assert manager.restore_backup("backups/link", str(tmp_path / "third"))["success"]
+    third = tmp_path / "third" / "data"
+    assert any(os.stat(third / path).st_ino == os.stat(second / path).st_ino
+               for path in ("a/__init__.py", "b/__init__.py", "run.sh"))
+
+
+def test_in_place_edit_does_not_corrupt_cache(server, tmp_path):
+    data = tmp_path / "data"
+    data.mkdir()
+    (data / "db.sqlite").write_bytes(b"original content\n" * 100)
+
+    manager = GitHubCloudManager("test", cache_dir=str(tmp_path / "cache"), api_url=server.url,
+                                 blob_cache_size=1024 * 1024, blob_cache_link=True)
+    manager.initialize_backup_repo("backups-test")
+    assert manager.backup_directory(str(data), "backups/db")["success"]
+
+    # Первое восстановление скачивает файл и добавляет его в кеш
+    assert manager.restore_backup("backups/db", str(tmp_path / "out1"))["success"]
+    with open(tmp_path / "out1" / "data" / "db.sqlite", "r+b") as f:
+        f.write(b"CORRUPT!\n")
+
+    result = manager.restore_backup("backups/db", str(tmp_path / "out2"))
+    assert result["success"]
+    assert (tmp_path / "out2" / "data" / "db.sqlite").read_bytes() == b"original content\n" * 100
+    assert not manager.verify_backup(str(tmp_path / "out2" / "data"), "backups/db")["changed"]
@@ -0,0 +1,73 @@
+"""Разбиение больших файлов на блоки по содержимому"""
+
+import io
+import random
+
+import chunking
+import github_cloud_manager
+
+
+def _text(seed: int, size: int) -> bytes:
+    """Текст из случайных строк: переводы строк дают кандидатов в границы"""
+    rng = random.Random(seed)
+    lines = []
+    total = 0
+    while total < size:
+        line = "".join(rng.choice("abcdefghij ") for _ in range(rng.randint(10, 120))).encode() + b"\n"
+        lines.append(line)
+        total += len(line)
+    return b"".join(lines)[:size]
+
+
+DATA = _text(1, 2 * 1024 * 1024)
+SIZES = {"min_size": 16 * 1024, "max_size": 128 * 1024, "mask": (1 << 8) - 1}
+
+
+def test_chunks_cover_file_within_bounds():
+    chunks = list(chunking.iter_chunks(io.BytesIO(DATA), **SIZES))
+    assert b"".join(chunks) == DATA
+    assert len(chunks) > 10
+    assert all(SIZES["min_size"] <= len(chunk) <= SIZES["max_size"] for chunk in chunks[:-1])
+    assert list(chunking.iter_chunks(io.BytesIO(b""), **SIZES)) == []
+
+
+def test_periodic_data_is_cut_at_max_size():
+    data = b"x" * 100 + b"\n"
+    chunks = list(chunking.iter_chunks(io.BytesIO(data * 5000), **SIZES))
+    assert b"".join(chunks) == data * 5000
+    assert all(len(chunk) == SIZES["max_size"] for chunk in chunks[:-1])
+
+
+def test_insert_keeps_other_chunks():
+    middle = len(DATA) // 2
+    changed = DATA[:middle] + b"inserted line\n" + DATA[middle:]
+    before = set(chunking.iter_chunks(io.BytesIO(DATA), **SIZES))
+    after = list(chunking.iter_chunks(io.BytesIO(changed), **SIZES))
+    # Меняются только блоки вокруг вставки
+    assert len([chunk for chunk in after if chunk not in before]) <= 2
+
+
+def test_chunked_backup_uploads_changed_chunks(server, manager, tmp_path, monkeypatch):
+    monkeypatch.setattr(github_cloud_manager, "CHUNKING_THRESHOLD", 1024 * 1024)
+    data = tmp_path / "data"
+    data.mkdir()
+    content = _text(2, 6 * 1024 * 1024)
+    (data / "big.txt").write_bytes(content)
+    (data / "small.txt").write_bytes(b"small")
+    assert manager.backup_directory(str(data), "backups/chunks", chunked=True)["success"]
+    first = tmp_path / "first"
+    assert manager.restore_backup("backups/chunks", str(first))["success"]
+    assert (first / "data" / "big.txt").read_bytes() == content
+
+    middle = len(content) // 2
+    content = content[:middle] + b"inserted line\n" + content[middle:]
+    (data / "big.txt").write_bytes(content)
+    server.reset_stats()
+    assert manager.backup_directory(str(data), "backups/chunks", chunked=True)["success"]
+    # Новые блоки вокруг вставки, индекс и манифест
+    assert server.stats()["calls"]["POST /repos/{repo}/git/blobs"] <= 4
+
+    second = tmp_path / "second"
+    assert manager.restore_backup("backups/chunks", str(second))["success"]
+    assert (second / "data" / "big.txt").read_bytes() == content
+    assert (second / "data" / "small.txt").read_bytes() == b"small"
@@ -0,0 +1,141 @@
+"""Дельта-кодирование версий файла и восстановление цепочек дельт"""
+
+import io
+import json
+import random
+
+import pytest
+
+import delta_encoding
+import github_cloud_manager
+from backup_format import git_blob_sha
+from github_cloud_manager import GitHubCloudManager
+
+
+def _text(seed: int, size: int) -> bytes:
+    """Текст из случайных строк: переводы строк дают якоря для границ блоков"""
+    rng = random.Random(seed)
+    lines = []
+    total = 0
+    while total < size:
+        line = "".join(rng.choice("abcdefghij ") for _ in range(rng.randint(10, 120))).encode() + b"\n"
+        lines.append(line)
+        total += len(line)
+    return b"".join(lines)[:size]
+
+
+def _encode(tmp_path, name, data, base=None, base_object=None):
+    path = tmp_path / name
+    path.write_bytes(data)
+    out = io.BytesIO()
+    with open(path, 'rb') as src:
+        header = delta_encoding.encode(src, out, base, base_object)
+    out.seek(0)
+    assert delta_encoding.read_header(out) == header
+    return header, out
+
+
+def _apply(header, data, base_content):
+    out = io.BytesIO()
+    delta_encoding.apply(header, data, io.BytesIO(base_content) if base_content is not None else None, out)
+    return out.getvalue()
+
+
+BASE = _text(1, 512 * 1024)
+
+
+@pytest.mark.parametrize("name, changed", [
+    ("insert_middle", BASE[:200000] + b"inserted line\n" * 50 + BASE[200000:]),
+    ("append", BASE + _text(2, 20000)),
+    ("truncate", BASE[:300000]),
+    ("unchanged", BASE),
+])
+def test_round_trip(tmp_path, name, changed):
+    base, data = _encode(tmp_path, "v0", BASE)
+    assert base["depth"] == 0 and base["base"] is None
+    assert _apply(base, data, None) == BASE
+
+    header, data = _encode(tmp_path, "v1", changed, base, "0" * 40)
+    assert header["depth"] == 1
+    assert header["base"] == {"object": "0" * 40, "sha": base["sha"]}
+    assert header["sha"] == git_blob_sha(changed)
+    assert _apply(header, data, BASE) == changed
+    # Данными записываются только блоки вокруг изменения
+    assert header["inserted"] <= max(len(changed) - len(BASE), 0) + 2 * delta_encoding.MAX_BLOCK_SIZE
+
+
+def test_corrupted_base_is_detected(tmp_path):
+    base, _ = _encode(tmp_path, "v0", BASE)
+    header, data = _encode(tmp_path, "v1", BASE + b"tail\n", base, "0" * 40)
+    with pytest.raises(IOError):
+        _apply(header, data, BASE.replace(b"a", b"b", 1))
+
+
+def _manifest_entry(manager, tmp_path, cloud_dir, path):
+    target = tmp_path / "manifest.jsonl"
+    assert manager.download_file(f"{cloud_dir}/manifest.jsonl", str(target))[0]
+    entries = [json.loads(line) for line in target.read_text().splitlines()[1:]]
+    return next(entry for entry in entries if entry["path"] == path)
+
+
+def _versions(count):
+    """Версии файла: в каждой изменена одна строка в середине"""
+    data = BASE
+    for number in range(count):
+        yield data
+        middle = len(data) // 2
+        data = data[:middle] + f"version {number + 1}\n".encode() + data[middle:]
+
+
+@pytest.fixture
+def small_delta(monkeypatch):
+    monkeypatch.setattr(github_cloud_manager, "DELTA_THRESHOLD", 64 * 1024)
+    monkeypatch.setattr(github_cloud_manager, "DELTA_MAX_DEPTH", 3)
+
+
+def test_chain_crosses_max_depth(server, manager, tmp_path, small_delta):
+    data = tmp_path / "data"
+    data.mkdir()
+    depths = []
+    snapshots = []
+    for version in _versions(6):
+        (data / "big.txt").write_bytes(version)
+        result = manager.backup_directory(str(data), "backups/d", delta=True)
+        assert result["success"], result
+        depths.append(_manifest_entry(manager, tmp_path, "backups/d", "data/big.txt")["depth"])
+        snapshots.append((result["snapshot"], version))
+    assert depths == [0, 1, 2, 3, 0, 1]
+
+    for number, (snapshot, version) in enumerate(snapshots):
+        root = tmp_path / f"restore{number}"
+        result = manager.restore_backup("backups/d", str(root), snapshot=snapshot)
+        assert result["success"], result
+        assert (root / "data" / "big.txt").read_bytes() == version
+
+
+def test_restore_starts_from_cached_base(server, tmp_path, small_delta):
+    data = tmp_path / "data"
+    data.mkdir()
+    cached = GitHubCloudManager("test", cache_dir=str(tmp_path / "cached"), api_url=server.url,
+                                blob_cache_size=64 * 1024 * 1024)
+    cached.initialize_backup_repo("backups-test")
+    plain = GitHubCloudManager("test", cache_dir=str(tmp_path / "plain"), api_url=server.url)
+    plain.initialize_backup_repo("backups-test")
+
+    versions = list(_versions(4))
+    for version in versions[:3]:
+        (data / "big.txt").write_bytes(version)
+        assert cached.backup_directory(str(data), "backups/c", delta=True)["success"]
+    # Версия глубины 2 собирается по всей цепочке и попадает в кеш blob
+    assert cached.restore_backup("backups/c", str(tmp_path / "warm"))["success"]
+    (data / "big.txt").write_bytes(versions[3])
+    assert cached.backup_directory(str(data), "backups/c", delta=True)["success"]
+
+    def blob_reads(manager, root):
+        server.reset_stats()
+        assert manager.restore_backup("backups/c", str(root))["success"]
+        assert (root / "data" / "big.txt").read_bytes() == versions[3]
+        return server.stats()["calls"].get("GET /repos/{repo}/git/blobs/{sha}", 0)
+
+    # Без кеша скачивается вся цепочка (4 объекта), с кешем - только новый объект
+    assert blob_reads(cached, tmp_path / "from_cache") == blob_reads(plain, tmp_path / "full") - 3
@@ -0,0 +1,26 @@
+"""Продолжение прерванной резервной копии по журналу"""
+
+import github_cloud_manager
+
+
+def test_resume_reuses_blobs_and_trees(server, manager, tmp_path, monkeypatch):
+    # Дерево создается частями по два элемента: файлы и манифест попадают в разные части
+    monkeypatch.setattr(github_cloud_manager, "TREE_CHUNK_SIZE", 2)
+    data = tmp_path / "data"
+    data.mkdir()
+    for i in range(3):
+        (data / f"f{i}.txt").write_text(f"{i}\n")
+
+    # Ветка не перематывается: дерево создано, коммит копии не записан
+    server.add_fault(404, "/git/refs/heads")
+    assert not manager.backup_directory(str(data), "backups/j")["success"]
+    assert manager.list_files("backups/j") == []
+
+    server.reset_stats()
+    assert manager.backup_directory(str(data), "backups/j")["success"]
+    # Заново загружается только манифест (в нем время копии). Деревьев
+    # создается два: часть с манифестом и дерево ветки каталога снимков
+    calls = server.stats()["calls"]
+    assert calls["POST /repos/{repo}/git/blobs"] == 1
+    assert calls["POST /repos/{repo}/git/trees"] == 2
+    assert len(manager.list_files("backups/j", recursive=True)) == 4
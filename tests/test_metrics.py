@@ -0,0 +1,68 @@
+"""Учет одновременных операций в метриках"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import github
+
+from async_cloud_manager import AsyncGitHubCloudManager
+
+
+def test_concurrent_async_operations(server, manager, tmp_path):
+    for i in range(10):
+        source = tmp_path / f"f{i}.txt"
+        source.write_text(f"file {i}\n")
+        assert manager.upload_file(str(source), f"data/f{i}.txt")[0]
+
+    async def download_all(async_manager):
+        await async_manager.initialize_backup_repo("backups-test")
+        return await asyncio.gather(*(
+            async_manager.download_file(f"data/f{i}.txt", str(tmp_path / "out" / f"f{i}.txt"))
+            for i in range(10)
+        ))
+
+    async def main():
+        async with AsyncGitHubCloudManager("test", cache_dir=str(tmp_path / "async"), api_url=server.url) as m:
+            results = await download_all(m)
+            return m.metrics.report(), results
+
+    report, results = asyncio.run(main())
+    assert all(ok for ok, _ in results)
+    assert report["operations"]["download_file"]["success"] == 10
+    assert report["operations"]["download_file"]["failed"] == 0
+    runs = [run for run in report["runs"] if run["operation"] == "download_file"]
+    assert len(runs) == 10
+    assert all(run["requests"] >= 1 for run in runs)
+    assert not [phase for phase in report["phases"] if phase["operation"] == ""]
+
+
+def test_concurrent_threaded_operations(manager, tmp_path):
+    sources = []
+    for i in range(8):
+        source = tmp_path / f"t{i}.txt"
+        source.write_text(f"thread {i}\n")
+        sources.append(source)
+    manager.metrics.reset()
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        results = list(executor.map(lambda i: manager.upload_file(str(sources[i]), f"threads/t{i}.txt"),
+                                    range(len(sources))))
+
+    assert all(ok for ok, _ in results)
+    report = manager.metrics.report()
+    assert report["operations"]["upload_file"]["success"] == len(sources)
+    runs = [run for run in report["runs"] if run["operation"] == "upload_file"]
+    assert sum(run["requests"] for run in runs) == report["totals"]["requests"]
+
+
+
+def test_warns_when_pygithub_hook_is_unavailable(manager, monkeypatch, capsys):
+    # Клиент без внутренних атрибутов, к которым подключается учет запросов
+    monkeypatch.setattr(github, "Github", lambda *args, **kwargs: SimpleNamespace())
+    capsys.readouterr()
+    manager._create_client()
+    manager._create_client()
+
+    output = capsys.readouterr().out
+    assert output.count("Запросы PyGithub не учитываются в метриках") == 1
@@ -0,0 +1,32 @@
+"""Резервные копии с упаковкой мелких файлов (packed=True)"""
+
+
+def test_empty_file_sorted_first(manager, tmp_path):
+    data = tmp_path / "data"
+    data.mkdir()
+    (data / "a_empty").write_bytes(b"")
+    (data / "b.txt").write_text("hello\n")
+
+    result = manager.backup_directory(str(data), "backups/p", packed=True)
+    assert result["success"], result["message"]
+    assert result["files_failed"] == 0
+
+    restored = tmp_path / "restored"
+    result = manager.restore_backup("backups/p", str(restored))
+    assert result["success"], result["message"]
+    assert (restored / "data" / "a_empty").read_bytes() == b""
+    assert (restored / "data" / "b.txt").read_text() == "hello\n"
+
+
+def test_only_empty_files(manager, tmp_path):
+    data = tmp_path / "data"
+    data.mkdir()
+    for name in ("a", "b", "c"):
+        (data / name).write_bytes(b"")
+
+    result = manager.backup_directory(str(data), "backups/empty", packed=True)
+    assert result["success"], result["message"]
+
+    restored = tmp_path / "restored"
+    assert manager.restore_backup("backups/empty", str(restored))["success"]
+    assert sorted(p.name for p in (restored / "data").iterdir()) == ["a", "b", "c"]
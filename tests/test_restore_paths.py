@@ -0,0 +1,46 @@
+"""Пути из манифеста не выходят за директорию восстановления"""
+
+import asyncio
+import json
+
+from async_cloud_manager import AsyncGitHubCloudManager
+
+
+def _tamper_manifest(manager, tmp_path, cloud_dir):
+    """Добавление в манифест копий существующих записей с путями вне копии"""
+    source = tmp_path / "manifest.jsonl"
+    assert manager.download_file(f"{cloud_dir}/manifest.jsonl", str(source))[0]
+    lines = [json.loads(line) for line in source.read_text().splitlines()]
+    header, entries = lines[0], lines[1:]
+    for entry in list(entries):
+        for bad in ("../escaped", "/tmp/absolute", "data//empty_part"):
+            entries.append(dict(entry, path=f"{bad}-{entry['path'].rsplit('/', 1)[-1]}"))
+    source.write_text("".join(json.dumps(line) + "\n" for line in [header] + entries))
+    assert manager.upload_file(str(source), f"{cloud_dir}/manifest.jsonl")[0]
+    return len(entries) - len(lines) + 1
+
+
+def test_manifest_paths_stay_inside(server, manager, tmp_path):
+    data = tmp_path / "data"
+    data.mkdir()
+    (data / "big.txt").write_text("x" * 8192)
+    (data / "small.txt").write_text("small\n")
+    assert manager.backup_directory(str(data), "backups/t", packed=True)["success"]
+    rejected = _tamper_manifest(manager, tmp_path, "backups/t")
+
+    root = tmp_path / "restore" / "inner"
+    result = manager.restore_backup("backups/t", str(root))
+    assert result["files_restored"] == 2
+    assert result["files_failed"] == rejected
+    assert (root / "data" / "small.txt").read_text() == "small\n"
+    assert not list((tmp_path / "restore").glob("escaped*"))
+
+    async def restore_async():
+        async with AsyncGitHubCloudManager("test", cache_dir=str(tmp_path / "async"), api_url=server.url) as m:
+            await m.initialize_backup_repo("backups-test")
+            return await m.restore_backup("backups/t", str(tmp_path / "async_restore" / "inner"))
+
+    result = asyncio.run(restore_async())
+    assert result["files_restored"] == 2
+    assert result["files_failed"] == rejected
+    assert not list((tmp_path / "async_restore").glob("escaped*"))
@@ -0,0 +1,77 @@
+"""Планировщик запросов: повторы и паузы по ответам о лимите"""
+
+import asyncio
+import time
+from email.utils import formatdate
+
+from async_cloud_manager import AsyncGitHubCloudManager
+import scheduler
+from scheduler import SECONDARY_LIMIT_DELAY, RateLimitState, rate_limit_delay
+
+PAST_DATE = "Wed, 21 Oct 2015 07:28:00 GMT"
+
+
+def test_retry_after_forms():
+    assert rate_limit_delay(429, {"Retry-After": "7"}, "", 0) == 7.0
+    assert rate_limit_delay(403, {"Retry-After": PAST_DATE}, "", 0) == 0.0
+    delay = rate_limit_delay(429, {"Retry-After": formatdate(time.time() + 30, usegmt=True)}, "", 0)
+    assert 25 <= delay <= 30
+    for garbage in ("soon", "", "inf", "nan"):
+        assert rate_limit_delay(429, {"Retry-After": garbage}, "", 0) == SECONDARY_LIMIT_DELAY
+
+
+def test_retry_after_http_date(server, manager, tmp_path):
+    data = tmp_path / "data"
+    data.mkdir()
+    (data / "a.txt").write_text("a\n")
+    server.add_fault(403, "/git/refs/heads", headers={"Retry-After": PAST_DATE})
+    assert manager.backup_directory(str(data), "backups/one")["success"]
+    assert manager.get_rate_budget()["throttled"] == 1
+
+    async def backup_async():
+        async with AsyncGitHubCloudManager("test", cache_dir=str(tmp_path / "async"), api_url=server.url) as m:
+            await m.initialize_backup_repo("backups-test")
+            server.add_fault(403, "/git/refs/heads", headers={"Retry-After": PAST_DATE})
+            result = await m.backup_directory(str(data), "backups/two")
+            return result, m.get_rate_budget()
+
+    result, budget = asyncio.run(backup_async())
+    assert result["success"]
+    assert budget["throttled"] == 1
+    # Асинхронный менеджер снижает параллельность так же, как синхронный
+    assert budget["concurrency"] < budget["max_concurrency"]
+    assert not server.store.faults
+
+
+def test_transient_error_is_retried(server, manager, tmp_path, monkeypatch):
+    monkeypatch.setattr(scheduler, "BACKOFF_BASE", 0.01)
+    data = tmp_path / "data"
+    data.mkdir()
+    (data / "a.txt").write_text("a\n")
+    server.add_fault(502, "/git/refs/heads")
+    assert manager.backup_directory(str(data), "backups/one")["success"]
+    budget = manager.get_rate_budget()
+    assert budget["retries"] == 1
+    # Ошибка сервера не считается превышением лимита
+    assert budget["throttled"] == 0
+    assert not server.store.faults
+
+
+def test_rate_limit_state_aimd_and_pacing():
+    state = RateLimitState(8)
+    state.throttle(0)
+    assert state.budget()["concurrency"] == 4
+    for _ in range(4):
+        state.start_request()
+        state.finish_request(success=True)
+    assert state.budget()["concurrency"] == 5
+
+    # При малом остатке лимита запросы распределяются до сброса
+    state.update(10, 5000, time.time() + 100)
+    assert state.wait_time() <= 0
+    state.start_request()
+    assert 5 < state.wait_time() <= 10
+
+    # Исчерпанный лимит - пауза до сброса
+    state.update(0, 5000, time.time() + 30)
+    assert state.wait_time() > 29
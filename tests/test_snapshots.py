@@ -0,0 +1,108 @@
+"""Каталог снимков резервных копий"""
+
+import asyncio
+from datetime import datetime
+
+import snapshots
+from async_cloud_manager import AsyncGitHubCloudManager
+
+
+def test_list_backups_uses_conditional_requests(server, manager, tmp_path):
+    data = tmp_path / "data"
+    data.mkdir()
+    (data / "a.txt").write_text("a\n")
+    assert manager.backup_directory(str(data), "backups/one")["success"]
+
+    backups = manager.list_backups()
+    assert backups[0]["created"] != "Unknown"
+
+    used = server.store.rate_used
+    for _ in range(5):
+        assert manager.list_backups() == backups
+    assert server.store.rate_used == used
+
+
+def test_list_backups_offline_created(manager, tmp_path):
+    data = tmp_path / "data"
+    data.mkdir()
+    (data / "a.txt").write_text("a\n")
+    assert manager.backup_directory(str(data), "backups/one")["success"]
+    assert manager.refresh_catalog()["success"]
+
+    offline = manager.list_backups(offline=True)
+    assert [backup["path"] for backup in offline] == ["backups/one"]
+    assert offline == manager.list_backups()
+
+
+def test_async_catalog_uses_conditional_requests(server, manager, tmp_path):
+    data = tmp_path / "data"
+    data.mkdir()
+    (data / "a.txt").write_text("a\n")
+    assert manager.backup_directory(str(data), "backups/one")["success"]
+
+    async def list_twice(cache_dir):
+        async with AsyncGitHubCloudManager("test", cache_dir=str(cache_dir), api_url=server.url) as m:
+            await m.initialize_backup_repo("backups-test")
+            spent = []
+            for _ in range(2):
+                used = server.store.rate_used
+                listed = await m.list_snapshots()
+                spent.append(server.store.rate_used - used)
+            return listed, spent
+
+    expected = manager.list_snapshots()
+    listed, spent = asyncio.run(list_twice(tmp_path / "async"))
+    assert listed == expected
+    assert spent == [1, 0]
+    # Каталог, прочитанный синхронным менеджером, уже есть в общем кеше ответов
+    listed, spent = asyncio.run(list_twice(tmp_path / "cache"))
+    assert listed == expected
+    assert spent == [0, 0]
+
+
+def test_catalog_functions():
+    first = {"id": "20240101T000000-aaaaaaa", "commit": "a" * 40, "cloud_dir": "backups/one",
+             "timestamp": "2024-01-01T00:00:00"}
+    second = dict(first, id="20240201T000000-bbbbbbb", commit="b" * 40, timestamp="2024-02-01T00:00:00")
+    other = dict(first, id="20240301T000000-ccccccc", commit="c" * 40, cloud_dir="backups/two",
+                 timestamp="2024-03-01T00:00:00")
+
+    content = snapshots.append_entry(b"", first)
+    # Недописанная строка после сбоя не мешает следующим записям
+    content = snapshots.append_entry(content + b'{"id": "broken', second)
+    content = snapshots.append_entry(content + b"[1, 2]\n", other)
+    entries = snapshots.parse_catalog(content)
+    assert entries == [first, second, other]
+
+    assert snapshots.select(entries) == [other, second, first]
+    assert snapshots.select(entries, "/backups/one/") == [second, first]
+    assert snapshots.select(entries, before="2024-01-16") == [first]
+    assert snapshots.select(entries, before=datetime(2024, 2, 1)) == [second, first]
+
+    assert snapshots.find(entries, second["id"]) == second
+    assert snapshots.find(entries, "c" * 7) == other
+    assert snapshots.find(entries, "c" * 6) is None
+    assert snapshots.find(entries, "missing") is None
+
+
+def test_restore_snapshot(server, manager, tmp_path):
+    data = tmp_path / "data"
+    data.mkdir()
+    (data / "a.txt").write_text("first\n")
+    first = manager.backup_directory(str(data), "backups/one")
+    (data / "a.txt").write_text("second\n")
+    (data / "b.txt").write_text("new\n")
+    assert manager.backup_directory(str(data), "backups/one")["success"]
+
+    listed = manager.list_snapshots("backups/one")
+    assert len(listed) == 2 and listed[1]["id"] == first["snapshot"]
+
+    for snapshot in (first["snapshot"], listed[1]["commit"][:7]):
+        root = tmp_path / snapshot
+        result = manager.restore_backup("backups/one", str(root), snapshot=snapshot)
+        assert result["success"] and result["snapshot"] == first["snapshot"]
+        assert (root / "data" / "a.txt").read_text() == "first\n"
+        assert not (root / "data" / "b.txt").exists()
+
+    result = manager.restore_backup("backups/one", str(tmp_path / "missing"), snapshot="missing")
+    assert not result["success"]
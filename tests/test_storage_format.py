@@ -0,0 +1,89 @@
+"""Смена формата хранения файла между копиями"""
+
+import asyncio
+
+import github_cloud_manager
+from async_cloud_manager import AsyncGitHubCloudManager
+
+
+def _tree_paths(manager, cloud_dir):
+    return {item["path"] for item in manager.list_files(cloud_dir, recursive=True)}
+
+
+def _assert_plain(manager, tmp_path, cloud_dir, expected):
+    paths = _tree_paths(manager, cloud_dir)
+    assert f"{cloud_dir}/data/big.bin" in paths
+    assert not [path for path in paths if path.endswith((".chunkindex", ".delta"))]
+
+    root = tmp_path / "selective"
+    result = manager.restore_backup(cloud_dir, str(root), include=["data/big.bin"])
+    assert result["success"], result
+    assert (root / "data" / "big.bin").read_bytes() == expected
+
+
+def test_chunked_then_plain_removes_index(manager, tmp_path, monkeypatch):
+    monkeypatch.setattr(github_cloud_manager, "CHUNKING_THRESHOLD", 64 * 1024)
+    data = tmp_path / "data"
+    data.mkdir()
+    (data / "big.bin").write_bytes(bytes(range(256)) * 1024)
+    assert manager.backup_directory(str(data), "backups/c", chunked=True)["success"]
+    assert "backups/c/data/big.bin.chunkindex" in _tree_paths(manager, "backups/c")
+
+    changed = b"changed" + bytes(range(256)) * 1024
+    (data / "big.bin").write_bytes(changed)
+    assert manager.backup_directory(str(data), "backups/c")["success"]
+    _assert_plain(manager, tmp_path, "backups/c", changed)
+
+
+def test_delta_then_plain_async_removes_delta(server, manager, tmp_path):
+    data = tmp_path / "data"
+    data.mkdir()
+    (data / "big.bin").write_bytes(b"a" * (2 * 1024 * 1024))
+    assert manager.backup_directory(str(data), "backups/d", delta=True)["success"]
+    assert "backups/d/data/big.bin.delta" in _tree_paths(manager, "backups/d")
+
+    changed = b"b" * (2 * 1024 * 1024)
+    (data / "big.bin").write_bytes(changed)
+
+    async def backup_async():
+        async with AsyncGitHubCloudManager("test", cache_dir=str(tmp_path / "async"), api_url=server.url) as m:
+            await m.initialize_backup_repo("backups-test")
+            return await m.backup_directory(str(data), "backups/d")
+
+    assert asyncio.run(backup_async())["success"]
+    _assert_plain(manager, tmp_path, "backups/d", changed)
+
+
+def test_several_storage_forms_fail_the_file(server, manager, tmp_path):
+    data = tmp_path / "data"
+    data.mkdir()
+    (data / "big.bin").write_bytes(b"plain\n")
+    (data / "other.txt").write_text("other\n")
+    assert manager.backup_directory(str(data), "backups/x")["success"]
+    stray = tmp_path / "stray.chunkindex"
+    stray.write_text("{}")
+    assert manager.upload_file(str(stray), "backups/x/data/big.bin.chunkindex")[0]
+    assert manager.delete_file("backups/x/manifest.jsonl")[0]
+
+    def check(result, root):
+        assert result["files_failed"] == 1
+        failed = [detail for detail in result["details"] if detail["status"] == "failed"]
+        assert failed[0]["file"] == "data/big.bin"
+        assert "data/big.bin.chunkindex" in failed[0]["error"]
+        assert not (root / "data" / "big.bin").exists()
+        assert (root / "data" / "other.txt").read_text() == "other\n"
+
+    root = tmp_path / "tree"
+    check(manager.restore_backup("backups/x", str(root)), root)
+    root = tmp_path / "selective"
+    check(manager.restore_backup("backups/x", str(root), include=["data/*"]), root)
+    root = tmp_path / "sync"
+    check(manager.restore_backup("backups/x", str(root), sync=True), root)
+
+    async def restore_async(root):
+        async with AsyncGitHubCloudManager("test", cache_dir=str(tmp_path / "async"), api_url=server.url) as m:
+            await m.initialize_backup_repo("backups-test")
+            return await m.restore_backup("backups/x", str(root))
+
+    root = tmp_path / "async_tree"
+    check(asyncio.run(restore_async(root)), root)